@@ -0,0 +1,149 @@
+# core/benchmarks/__init__.py
+"""
+Benchmarks de servicios contra la base de datos configurada.
+
+Cada escenario recibe la cantidad de líneas y devuelve una `Medicion`.
+El comando `python manage.py benchmark` corre cada medición dentro de una
+transacción que se revierte al final, así que no deja datos en la BD.
+"""
+
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+ESCENARIOS = {}
+
+# Sentencias de control de transacción que no cuentan como round trips
+# del servicio (las genera transaction.atomic anidado).
+_CONTROL = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+@dataclass
+class Medicion:
+    lineas: int
+    consultas: int
+    segundos: float
+    # Pico de memoria Python (solo en escenarios medidos con medir_memoria)
+    memoria_kb: float | None = None
+    # Tamaño del archivo generado (solo en escenarios de exportación)
+    salida_kb: float | None = None
+
+
+def escenario(nombre: str):
+    """Registra una función de benchmark bajo `nombre`."""
+
+    def deco(fn):
+        ESCENARIOS[nombre] = fn
+        return fn
+
+    return deco
+
+
+def medir(lineas: int, fn, *args, **kwargs) -> Medicion:
+    """
+    Ejecuta fn(*args, **kwargs) contando las sentencias SQL enviadas
+    (sin savepoints) y el tiempo de pared.
+    """
+    with CaptureQueriesContext(connection) as ctx:
+        t0 = time.perf_counter()
+        fn(*args, **kwargs)
+        segundos = time.perf_counter() - t0
+
+    consultas = sum(
+        1 for q in ctx.captured_queries if not q["sql"].lstrip().startswith(_CONTROL)
+    )
+    return Medicion(lineas=lineas, consultas=consultas, segundos=segundos)
+
+
+def medir_memoria(lineas: int, fn, *args, **kwargs) -> Medicion:
+    """
+    Como `medir`, más el pico de memoria asignada por Python durante la
+    llamada (tracemalloc; el tiempo medido incluye su sobrecosto).
+    """
+    tracemalloc.start()
+    try:
+        m = medir(lineas, fn, *args, **kwargs)
+        _actual, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    m.memoria_kb = pico / 1024
+    return m
+
+
+def crear_datos_prueba(productos: int, stock: Decimal = Decimal("1000000")) -> dict:
+    """
+    Crea usuario, cliente, bodega y `productos` productos con existencia.
+    Pensado para correr dentro de la transacción revertida del benchmark.
+    """
+    sufijo = uuid.uuid4().hex[:10]
+
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO usuario (username, nombre, password_hash, activo)
+            VALUES (%s, %s, %s, 1)
+            """,
+            [f"bench-{sufijo}", "Benchmark", "-"],
+        )
+        username = f"bench-{sufijo}"
+        cur.execute("SELECT LAST_INSERT_ID()")
+        usuario_id = int(cur.fetchone()[0])
+
+        cur.execute(
+            "INSERT INTO cliente (nombre, estado) VALUES (%s, 'ACTIVO')",
+            [f"Cliente bench {sufijo}"],
+        )
+        cur.execute("SELECT LAST_INSERT_ID()")
+        cliente_id = int(cur.fetchone()[0])
+
+        cur.execute(
+            "INSERT INTO bodega (nombre, activo) VALUES (%s, 1)",
+            [f"Bodega bench {sufijo}"],
+        )
+        cur.execute("SELECT LAST_INSERT_ID()")
+        bodega_id = int(cur.fetchone()[0])
+
+        cur.executemany(
+            """
+            INSERT INTO producto (sku, nombre, requiere_serie, costo_ref, precio_base, activo)
+            VALUES (%s, %s, 0, %s, %s, 1)
+            """,
+            [
+                (f"B{sufijo}-{i}", f"Producto bench {i}", "5.00", "10.00")
+                for i in range(productos)
+            ],
+        )
+        cur.execute(
+            "SELECT id FROM producto WHERE sku LIKE %s ORDER BY id",
+            [f"B{sufijo}-%"],
+        )
+        producto_ids = [int(r[0]) for r in cur.fetchall()]
+
+        cur.executemany(
+            """
+            INSERT INTO existencia (producto_id, bodega_id, cantidad, reservado)
+            VALUES (%s, %s, %s, 0)
+            """,
+            [(pid, bodega_id, stock) for pid in producto_ids],
+        )
+
+    return {
+        "username": username,
+        "usuario_id": usuario_id,
+        "cliente_id": cliente_id,
+        "bodega_id": bodega_id,
+        "producto_ids": producto_ids,
+    }
+
+
+def items_pedido(producto_ids, cantidad="1", precio="10.00") -> list:
+    """Una línea de pedido por producto, en el formato del serializer."""
+    return [
+        {"producto_id": pid, "cantidad": cantidad, "precio_unitario": precio}
+        for pid in producto_ids
+    ]
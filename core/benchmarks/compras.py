@@ -0,0 +1,188 @@
+# core/benchmarks/compras.py
+import uuid
+
+from django.db import connection
+from django.utils import timezone
+
+from core.benchmarks import crear_datos_prueba, escenario, medir, medir_memoria
+from core.models import Compra, Usuario
+from core.services import bulk_export_service
+from core.services.purchase_export_service import PurchaseExportService
+from core.services.purchase_service import PurchaseService
+
+# Líneas de detalle por compra en los datos de prueba
+DETALLES_POR_COMPRA = 10
+
+# Filas por INSERT al generar datos (evita paquetes gigantes)
+_LOTE_INSERT = 10000
+
+
+def crear_compras_prueba(lineas: int) -> dict:
+    """
+    Crea un proveedor y compras con DETALLES_POR_COMPRA líneas cada una
+    hasta sumar `lineas` detalles. Devuelve {proveedor_id, bodega_id, ...}.
+    """
+    datos = crear_datos_prueba(DETALLES_POR_COMPRA)
+    sufijo = uuid.uuid4().hex[:10]
+    compras = max(lineas // DETALLES_POR_COMPRA, 1)
+    ahora = timezone.now()
+
+    with connection.cursor() as cur:
+        cur.execute(
+            "INSERT INTO proveedor (nombre, estado) VALUES (%s, 'ACTIVO')",
+            [f"Proveedor bench {sufijo}"],
+        )
+        cur.execute("SELECT LAST_INSERT_ID()")
+        proveedor_id = int(cur.fetchone()[0])
+
+        for inicio in range(0, compras, _LOTE_INSERT):
+            cur.executemany(
+                """
+                INSERT INTO compra (proveedor_id, bodega_id, fecha, no_documento, total, usuario_id, estado)
+                VALUES (%s, %s, %s, %s, %s, %s, 'REGISTRADA')
+                """,
+                [
+                    (
+                        proveedor_id,
+                        datos["bodega_id"],
+                        ahora,
+                        f"B{sufijo}-{n}",
+                        "100.00",
+                        datos["usuario_id"],
+                    )
+                    for n in range(inicio, min(inicio + _LOTE_INSERT, compras))
+                ],
+            )
+        cur.execute(
+            "SELECT id FROM compra WHERE proveedor_id = %s ORDER BY id",
+            [proveedor_id],
+        )
+        compra_ids = [int(r[0]) for r in cur.fetchall()]
+
+        detalles = [
+            (compra_id, pid, "1.0000", "10.0000", "10.00")
+            for compra_id in compra_ids
+            for pid in datos["producto_ids"]
+        ]
+        for inicio in range(0, len(detalles), _LOTE_INSERT):
+            cur.executemany(
+                """
+                INSERT INTO compra_detalle (compra_id, producto_id, cantidad, costo_unit, subtotal)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                detalles[inicio : inicio + _LOTE_INSERT],
+            )
+
+    return dict(datos, proveedor_id=proveedor_id, compra_ids=compra_ids)
+
+
+@escenario("compras.exportar")
+def bench_exportar_excel(lineas: int):
+    """
+    Sentencias, tiempo y pico de memoria de generar_excel para `lineas`
+    líneas de detalle. Para el tamaño de producción:
+        python manage.py benchmark compras.exportar --lineas 10000 100000 1000000
+    """
+    datos = crear_compras_prueba(lineas)
+    qs = Compra.objects.filter(proveedor_id=datos["proveedor_id"])
+    return medir_memoria(lineas, PurchaseExportService.generar_excel, qs)
+
+
+class _ContadorBytes:
+    """Destino que solo cuenta los bytes escritos."""
+
+    def __init__(self):
+        self.total = 0
+
+    def write(self, datos):
+        self.total += len(datos)
+
+
+def _bench_formato(formato: str, lineas: int):
+    datos = crear_compras_prueba(lineas)
+    destino = _ContadorBytes()
+    m = medir_memoria(
+        lineas,
+        bulk_export_service.exportar_a_archivo,
+        "compras",
+        formato,
+        {"proveedor_id": datos["proveedor_id"]},
+        destino,
+    )
+    m.salida_kb = destino.total / 1024
+    return m
+
+
+@escenario("compras.csv")
+def bench_exportar_csv(lineas: int):
+    """
+    Throughput de la exportación CSV (gzip) de líneas de compra:
+        python manage.py benchmark compras.csv compras.jsonl compras.parquet \
+            --lineas 100000 1000000
+    """
+    return _bench_formato("csv", lineas)
+
+
+@escenario("compras.jsonl")
+def bench_exportar_jsonl(lineas: int):
+    return _bench_formato("jsonl", lineas)
+
+
+@escenario("compras.parquet")
+def bench_exportar_parquet(lineas: int):
+    """Requiere pyarrow."""
+    return _bench_formato("parquet", lineas)
+
+
+def _proveedor_prueba() -> int:
+    with connection.cursor() as cur:
+        cur.execute(
+            "INSERT INTO proveedor (nombre, estado) VALUES (%s, 'ACTIVO')",
+            [f"Proveedor bench {uuid.uuid4().hex[:10]}"],
+        )
+        cur.execute("SELECT LAST_INSERT_ID()")
+        return int(cur.fetchone()[0])
+
+
+@escenario("compras.registrar")
+def bench_registrar_compra(lineas: int):
+    """
+    Sentencias de registrar_compra con `lineas` productos distintos; deben
+    mantenerse planas (solo suben de a una por cada LOTE_INVENTARIO líneas):
+        python manage.py benchmark compras.registrar --lineas 10 100 1000 5000
+    """
+    datos = crear_datos_prueba(lineas)
+    data = {
+        "proveedor_id": _proveedor_prueba(),
+        "bodega_id": datos["bodega_id"],
+        "no_documento": f"BR-{uuid.uuid4().hex[:12]}",
+        "items": [
+            {"producto_id": pid, "cantidad": "2", "costo_unit": "5.5000"}
+            for pid in datos["producto_ids"]
+        ],
+    }
+    usuario = Usuario.objects.get(pk=datos["usuario_id"])
+    return medir(lineas, PurchaseService.registrar_compra, data, usuario)
+
+
+@escenario("compras.anular")
+def bench_anular_compra(lineas: int):
+    """
+    Sentencias de anular_compra (guard de existencias, INSERT ... SELECT de
+    movimientos inversos y UPDATE con JOIN): no dependen de las líneas.
+    """
+    datos = crear_datos_prueba(lineas)
+    usuario = Usuario.objects.get(pk=datos["usuario_id"])
+    compra = PurchaseService.registrar_compra(
+        {
+            "proveedor_id": _proveedor_prueba(),
+            "bodega_id": datos["bodega_id"],
+            "no_documento": f"BA-{uuid.uuid4().hex[:12]}",
+            "items": [
+                {"producto_id": pid, "cantidad": "2", "costo_unit": "5.5000"}
+                for pid in datos["producto_ids"]
+            ],
+        },
+        usuario,
+    )
+    return medir(lineas, PurchaseService.anular_compra, compra.id, usuario)
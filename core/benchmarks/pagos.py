@@ -0,0 +1,102 @@
+# core/benchmarks/pagos.py
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+
+from core.benchmarks import crear_datos_prueba, escenario, medir
+from core.services.amortization_service import generar_planes
+from core.services.payment_service import registrar_pago_automatico
+
+
+def crear_cuotas_prueba(datos: dict, cuotas: int) -> list:
+    """
+    Crea una venta al crédito con un acuerdo de `cuotas` cuotas mensuales
+    de 100.00 (10.00 de interés) para el cliente de `datos`.
+    """
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO venta (fecha, cliente_id, usuario_id, bodega_id, tipo_pago, total, estado)
+            VALUES (NOW(), %s, %s, %s, 'CREDITO', %s, 'EMITIDA')
+            """,
+            [
+                datos["cliente_id"],
+                datos["usuario_id"],
+                datos["bodega_id"],
+                Decimal("100.00") * cuotas,
+            ],
+        )
+        cur.execute("SELECT LAST_INSERT_ID()")
+        venta_id = int(cur.fetchone()[0])
+
+        cur.execute(
+            """
+            INSERT INTO acuerdopago (venta_id, tipo, capital, interes_anual, cuotas, periodicidad, fecha_inicio, mora_diaria, estado)
+            VALUES (%s, 'FRANCES', %s, 12.000, %s, 'MENSUAL', %s, 0.0010, 'ACTIVO')
+            """,
+            [venta_id, Decimal("90.00") * cuotas, cuotas, date.today()],
+        )
+        cur.execute("SELECT LAST_INSERT_ID()")
+        acuerdo_id = int(cur.fetchone()[0])
+
+        inicio = date.today() - timedelta(days=30 * cuotas)
+        cur.executemany(
+            """
+            INSERT INTO cuota (acuerdo_id, no_cuota, fecha_venc, capital_prog, interes_prog, total_prog, saldo_cuota, estado)
+            VALUES (%s, %s, %s, 90.00, 10.00, 100.00, 100.00, 'PENDIENTE')
+            """,
+            [
+                (acuerdo_id, n, inicio + timedelta(days=30 * n))
+                for n in range(1, cuotas + 1)
+            ],
+        )
+        cur.execute(
+            "SELECT id FROM cuota WHERE acuerdo_id = %s ORDER BY no_cuota",
+            [acuerdo_id],
+        )
+        return [int(r[0]) for r in cur.fetchall()]
+
+
+@escenario("pagos.automatico")
+def bench_pago_automatico(lineas: int):
+    """
+    Sentencias y latencia de registrar_pago_automatico cuando el pago cubre
+    `lineas` cuotas completas (más media cuota, para cortar a mitad).
+    """
+    datos = crear_datos_prueba(1)
+    crear_cuotas_prueba(datos, lineas + 1)
+    return medir(
+        lineas,
+        registrar_pago_automatico,
+        cliente_id=datos["cliente_id"],
+        metodo="EFECTIVO",
+        monto_total=Decimal("100.00") * lineas + Decimal("50.00"),
+        referencia=f"bench-{uuid.uuid4().hex[:8]}",
+        usuario_id=datos["usuario_id"],
+    )
+
+
+@escenario("pagos.planes")
+def bench_generar_planes(lineas: int):
+    """
+    Sentencias y tiempo de generar_planes al regenerar (cambio de tasa)
+    `lineas` acuerdos de 12 cuotas.
+    """
+    datos = crear_datos_prueba(1)
+    for _ in range(lineas):
+        crear_cuotas_prueba(datos, 12)
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            SELECT a.id FROM acuerdopago a
+            JOIN venta v ON v.id = a.venta_id
+            WHERE v.cliente_id = %s
+            """,
+            [datos["cliente_id"]],
+        )
+        acuerdo_ids = [int(r[0]) for r in cur.fetchall()]
+    return medir(
+        lineas, generar_planes, acuerdo_ids=acuerdo_ids, interes_anual=Decimal("18")
+    )
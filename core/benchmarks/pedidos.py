@@ -0,0 +1,30 @@
+# core/benchmarks/pedidos.py
+from core.benchmarks import crear_datos_prueba, escenario, items_pedido, medir
+from core.services.order_service import confirmar_pedido, crear_pedido
+
+
+@escenario("pedidos.crear")
+def bench_crear_pedido(lineas: int):
+    """Round trips de crear_pedido según la cantidad de líneas."""
+    datos = crear_datos_prueba(lineas)
+    return medir(
+        lineas,
+        crear_pedido,
+        cliente_id=datos["cliente_id"],
+        bodega_id=datos["bodega_id"],
+        items=items_pedido(datos["producto_ids"]),
+        username=datos["username"],
+    )
+
+
+@escenario("pedidos.confirmar")
+def bench_confirmar_pedido(lineas: int):
+    """Sentencias de confirmar_pedido (locks + descuento + kardex)."""
+    datos = crear_datos_prueba(lineas)
+    pedido_id = crear_pedido(
+        cliente_id=datos["cliente_id"],
+        bodega_id=datos["bodega_id"],
+        items=items_pedido(datos["producto_ids"]),
+        username=datos["username"],
+    )
+    return medir(lineas, confirmar_pedido, pedido_id, datos["username"])
@@ -0,0 +1,27 @@
+# core/benchmarks/ventas.py
+from core.benchmarks import crear_datos_prueba, escenario, medir
+from core.services.reservation_service import crear_pedido_con_reserva
+from core.services.sales_service import confirm_order_to_invoice
+
+
+@escenario("ventas.facturar")
+def bench_facturar_pedido(lineas: int):
+    """Sentencias de confirm_order_to_invoice sobre un pedido reservado."""
+    datos = crear_datos_prueba(lineas)
+    pedido_id = crear_pedido_con_reserva(
+        cliente_id=datos["cliente_id"],
+        usuario_id=datos["usuario_id"],
+        bodega_id=datos["bodega_id"],
+        items=[
+            {"producto_id": pid, "cantidad": 1, "precio_unit": "10.00"}
+            for pid in datos["producto_ids"]
+        ],
+    )
+    return medir(
+        lineas,
+        confirm_order_to_invoice,
+        pedido_id=pedido_id,
+        usuario_id=datos["usuario_id"],
+        tipo_pago="CONTADO",
+        total=10.0 * lineas,
+    )
@@ -0,0 +1,31 @@
+# core/management/commands/actualizar_cartera_aging.py
+from django.core.management.base import BaseCommand
+
+from core.services.cartera_service import reconstruir_snapshot, rollover_aging
+
+
+class Command(BaseCommand):
+    help = (
+        "Job diario del snapshot de cartera: mueve de bucket las cuotas que "
+        "cruzaron una frontera de días vencidos. Con --reconstruir copia toda "
+        "la vista v_cartera_aging (carga inicial o reparación). Correr después "
+        "de medianoche UTC: la vista usa CURDATE() de la sesión (+00:00)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reconstruir", action="store_true")
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=3,
+            help="Días extra a revisar por si se perdieron corridas.",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["reconstruir"]:
+            n = reconstruir_snapshot()
+            self.stdout.write(self.style.SUCCESS(f"Snapshot reconstruido: {n} cuotas."))
+            return
+
+        n = rollover_aging(dias=opts["dias"])
+        self.stdout.write(self.style.SUCCESS(f"Cuotas que cambiaron de bucket: {n}."))
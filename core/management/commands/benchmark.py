@@ -0,0 +1,65 @@
+# core/management/commands/benchmark.py
+import importlib
+import pkgutil
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+import core.benchmarks
+from core.benchmarks import ESCENARIOS
+
+
+def _cargar_escenarios():
+    for mod in pkgutil.iter_modules(core.benchmarks.__path__):
+        importlib.import_module(f"core.benchmarks.{mod.name}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide sentencias SQL y tiempo de los servicios por cantidad de líneas. "
+        "Cada corrida se revierte; no deja datos en la BD."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "escenarios",
+            nargs="*",
+            help="Escenarios a correr (por defecto, todos). Ej: pedidos.crear",
+        )
+        parser.add_argument(
+            "--lineas",
+            nargs="+",
+            type=int,
+            default=[10, 100, 1000],
+            help="Cantidades de líneas a medir.",
+        )
+        parser.add_argument(
+            "--listar", action="store_true", help="Solo lista los escenarios."
+        )
+
+    def handle(self, *args, **opts):
+        _cargar_escenarios()
+
+        if opts["listar"]:
+            for nombre in sorted(ESCENARIOS):
+                self.stdout.write(nombre)
+            return
+
+        nombres = opts["escenarios"] or sorted(ESCENARIOS)
+        desconocidos = [n for n in nombres if n not in ESCENARIOS]
+        if desconocidos:
+            raise CommandError(f"Escenarios desconocidos: {', '.join(desconocidos)}")
+
+        for nombre in nombres:
+            self.stdout.write(self.style.MIGRATE_HEADING(nombre))
+            self.stdout.write(f"{'lineas':>8} {'sentencias':>11} {'ms':>10}")
+            for lineas in opts["lineas"]:
+                with transaction.atomic():
+                    m = ESCENARIOS[nombre](lineas)
+                    transaction.set_rollback(True)
+                linea = f"{m.lineas:>8} {m.consultas:>11} {m.segundos * 1000:>10.1f}"
+                if m.memoria_kb is not None:
+                    linea += f" {m.memoria_kb:>10.0f} KB"
+                if m.salida_kb is not None:
+                    linea += f" {m.salida_kb:>10.0f} KB archivo"
+                self.stdout.write(linea)
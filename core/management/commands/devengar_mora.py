@@ -0,0 +1,45 @@
+# core/management/commands/devengar_mora.py
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.mora_service import LOTE_MORA, devengar_mora
+
+
+class Command(BaseCommand):
+    help = (
+        "Devenga la mora diaria de las cuotas vencidas (job nocturno). "
+        "Idempotente por fecha: si se interrumpe, la siguiente corrida sigue "
+        "desde el último lote confirmado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fecha", help="Fecha a devengar (AAAA-MM-DD); por defecto hoy."
+        )
+        parser.add_argument("--lote", type=int, default=LOTE_MORA)
+
+    def handle(self, *args, **opts):
+        fecha = None
+        if opts["fecha"]:
+            try:
+                fecha = date.fromisoformat(opts["fecha"])
+            except ValueError:
+                raise CommandError("--fecha debe tener formato AAAA-MM-DD.")
+
+        t0 = time.perf_counter()
+        lotes = cuotas = 0
+        for m in devengar_mora(fecha=fecha, lote=opts["lote"]):
+            lotes += 1
+            cuotas += m["cuotas"]
+            self.stdout.write(
+                f"ids={m['desde_id']}..{m['hasta_id']} cuotas={m['cuotas']} "
+                f"monto={m['monto']} ms={m['ms']:.0f}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Lotes: {lotes}, cuotas con mora: {cuotas}, "
+                f"ms={(time.perf_counter() - t0) * 1000:.0f}"
+            )
+        )
@@ -0,0 +1,68 @@
+# core/management/commands/generar_planes_pago.py
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.amortization_service import (
+    LOTE_ACUERDOS,
+    generar_planes,
+    proyectar_planes,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera (o regenera) el plan de cuotas de los acuerdos de pago. "
+        "Con --dry-run escribe los planes proyectados (JSON lines) sin guardar. "
+        "Los acuerdos con pagos aplicados o mora devengada no se regeneran."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--acuerdos", nargs="+", type=int, help="Ids de acuerdo a procesar."
+        )
+        parser.add_argument(
+            "--estado",
+            help="Procesar todos los acuerdos con este estado (ej. ACTIVO).",
+        )
+        parser.add_argument(
+            "--interes-anual",
+            help="Nueva tasa anual (%%) a aplicar; sin ella se usa la del acuerdo.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--lote", type=int, default=LOTE_ACUERDOS)
+
+    def handle(self, *args, **opts):
+        if not opts["acuerdos"] and not opts["estado"]:
+            raise CommandError("Indique --acuerdos o --estado.")
+
+        interes_anual = None
+        if opts["interes_anual"] is not None:
+            try:
+                interes_anual = Decimal(opts["interes_anual"])
+            except InvalidOperation:
+                raise CommandError("--interes-anual debe ser un número.")
+
+        filtros = {
+            "acuerdo_ids": opts["acuerdos"],
+            "estado": opts["estado"],
+            "interes_anual": interes_anual,
+            "lote": opts["lote"],
+        }
+
+        if opts["dry_run"]:
+            for plan in proyectar_planes(**filtros):
+                self.stdout.write(json.dumps(plan, default=str))
+            return
+
+        res = generar_planes(**filtros)
+        for acuerdo_id, error in sorted(res["errores"].items()):
+            self.stderr.write(f"Acuerdo {acuerdo_id}: {error}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Acuerdos: {res['acuerdos']}, cuotas: {res['cuotas']}, "
+                f"omitidos con pagos o mora: {len(res['con_movimientos'])}, "
+                f"con error: {len(res['errores'])}."
+            )
+        )
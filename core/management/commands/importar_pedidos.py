@@ -0,0 +1,53 @@
+# core/management/commands/importar_pedidos.py
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.order_import_service import IMPORT_LOTE_PEDIDOS, importar_pedidos
+from core.services.order_service import PedidoError
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa pedidos desde un archivo CSV o JSON lines en streaming. "
+        "Escribe un resultado por pedido (JSON lines) en --reporte o stdout."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del archivo (o - para stdin).")
+        parser.add_argument(
+            "--usuario", required=True, help="username de la tabla usuario."
+        )
+        parser.add_argument("--formato", choices=["csv", "jsonl"])
+        parser.add_argument("--reporte", help="Archivo de salida del reporte.")
+        parser.add_argument("--lote", type=int, default=IMPORT_LOTE_PEDIDOS)
+
+    def handle(self, *args, **opts):
+        ruta = opts["archivo"]
+        formato = opts["formato"] or ("jsonl" if ruta.endswith(".jsonl") else "csv")
+
+        entrada = (
+            sys.stdin if ruta == "-" else open(ruta, encoding="utf-8-sig", newline="")
+        )
+        salida = open(opts["reporte"], "w") if opts["reporte"] else self.stdout
+        ok = errores = 0
+        try:
+            resultados = importar_pedidos(
+                entrada, formato, opts["usuario"], lote=opts["lote"]
+            )
+            for res in resultados:
+                if res["ok"]:
+                    ok += 1
+                else:
+                    errores += 1
+                salida.write(json.dumps(res, default=str) + "\n")
+        except PedidoError as e:
+            raise CommandError(str(e))
+        finally:
+            if entrada is not sys.stdin:
+                entrada.close()
+            if salida is not self.stdout:
+                salida.close()
+
+        self.stderr.write(f"Pedidos importados: {ok}, con error: {errores}")
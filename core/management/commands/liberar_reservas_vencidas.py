@@ -0,0 +1,35 @@
+# core/management/commands/liberar_reservas_vencidas.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.services.reservation_service import LOTE_VENCIDAS, liberar_reservas_vencidas
+
+
+class Command(BaseCommand):
+    help = (
+        "Libera reservas de stock y series vencidas (vence_el) y devuelve los "
+        "pedidos a ABIERTO. Por defecto hace una pasada (para cron); con "
+        "--loop corre indefinidamente cada --intervalo segundos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=LOTE_VENCIDAS)
+        parser.add_argument("--loop", action="store_true")
+        parser.add_argument(
+            "--intervalo", type=int, default=60, help="Segundos entre pasadas."
+        )
+
+    def handle(self, *args, **opts):
+        while True:
+            t0 = time.perf_counter()
+            res = liberar_reservas_vencidas(lote=opts["lote"])
+            self.stdout.write(
+                f"stock={res['stock']} series={res['series']} "
+                f"pedidos_reabiertos={res['pedidos']} lotes={res['lotes']} "
+                f"lag_max_s={res['lag_max_s']:.0f} "
+                f"ms={(time.perf_counter() - t0) * 1000:.0f}"
+            )
+            if not opts["loop"]:
+                return
+            time.sleep(opts["intervalo"])
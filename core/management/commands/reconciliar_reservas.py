@@ -0,0 +1,42 @@
+# core/management/commands/reconciliar_reservas.py
+from django.core.management.base import BaseCommand
+
+from core.services.reservation_service import reconciliar_reservado
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica existencia.reservado contra las reservas ACTIVAS de "
+        "ReservaStock y, con --corregir, ajusta las diferencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bodega", type=int, help="Limitar a una bodega.")
+        parser.add_argument(
+            "--corregir",
+            action="store_true",
+            help="Ajusta el contador al valor esperado.",
+        )
+
+    def handle(self, *args, **opts):
+        diferencias = reconciliar_reservado(
+            corregir=opts["corregir"], bodega_id=opts["bodega"]
+        )
+        for d in diferencias:
+            self.stdout.write(
+                f"producto={d['producto_id']} bodega={d['bodega_id']} "
+                f"reservado={d['reservado']} esperado={d['esperado']}"
+            )
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("Sin diferencias."))
+        elif opts["corregir"]:
+            self.stdout.write(
+                self.style.WARNING(f"{len(diferencias)} diferencia(s) corregidas.")
+            )
+        else:
+            self.stdout.write(
+                self.style.ERROR(
+                    f"{len(diferencias)} diferencia(s). Use --corregir para ajustar."
+                )
+            )
@@ -0,0 +1,33 @@
+# core/management/commands/reconstruir_resumen_compras.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.purchase_rollup_service import reconstruir_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenera los rollups diarios de compras (compra_resumen_dia y "
+        "compra_producto_dia) desde compra / compra_detalle. Con --desde solo "
+        "regenera a partir de ese día local."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Primer día a regenerar (AAAA-MM-DD).")
+
+    def handle(self, *args, **opts):
+        desde = None
+        if opts["desde"]:
+            try:
+                desde = date.fromisoformat(opts["desde"])
+            except ValueError:
+                raise CommandError("--desde debe tener formato AAAA-MM-DD.")
+
+        res = reconstruir_rollups(desde=desde)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rollups regenerados: {res['resumen']} filas de resumen, "
+                f"{res['producto']} filas por producto."
+            )
+        )
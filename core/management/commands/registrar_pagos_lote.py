@@ -0,0 +1,60 @@
+# core/management/commands/registrar_pagos_lote.py
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.serializers.payment_serializers import validar_registros_pago
+from core.services.payment_batch_service import (
+    LECTORES,
+    LOTE_PAGOS,
+    registrar_pagos_lote,
+)
+from core.services.payment_service import PaymentError, obtener_usuario_id
+
+
+class Command(BaseCommand):
+    help = (
+        "Registra pagos desde un archivo CSV o JSON lines (estado de cuenta "
+        "del banco, cierre de POS). Escribe un resultado por pago (JSON lines) "
+        "en --reporte o stdout."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del archivo (o - para stdin).")
+        parser.add_argument(
+            "--usuario", required=True, help="username de la tabla usuario."
+        )
+        parser.add_argument("--formato", choices=sorted(LECTORES))
+        parser.add_argument("--reporte", help="Archivo de salida del reporte.")
+        parser.add_argument("--lote", type=int, default=LOTE_PAGOS)
+
+    def handle(self, *args, **opts):
+        ruta = opts["archivo"]
+        formato = opts["formato"] or ("jsonl" if ruta.endswith(".jsonl") else "csv")
+        try:
+            usuario_id = obtener_usuario_id(opts["usuario"])
+        except PaymentError as e:
+            raise CommandError(str(e))
+
+        entrada = (
+            sys.stdin if ruta == "-" else open(ruta, encoding="utf-8-sig", newline="")
+        )
+        salida = open(opts["reporte"], "w") if opts["reporte"] else self.stdout
+        ok = errores = 0
+        try:
+            registros = validar_registros_pago(LECTORES[formato](entrada), usuario_id)
+            resultados = registrar_pagos_lote(registros, usuario_id, lote=opts["lote"])
+            for res in resultados:
+                if res["ok"]:
+                    ok += 1
+                else:
+                    errores += 1
+                salida.write(json.dumps(res, default=str) + "\n")
+        finally:
+            if entrada is not sys.stdin:
+                entrada.close()
+            if salida is not self.stdout:
+                salida.close()
+
+        self.stderr.write(f"Pagos registrados: {ok}, con error: {errores}")
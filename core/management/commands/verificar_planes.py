@@ -0,0 +1,28 @@
+# core/management/commands/verificar_planes.py
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.explain_service import revisar_planes
+
+
+class Command(BaseCommand):
+    help = (
+        "Corre EXPLAIN sobre las consultas críticas (core/services/"
+        "explain_service.py) y falla si alguna no usa su índice o cae en "
+        "full scan o filesort. Correr contra una BD con datos representativos: "
+        "en tablas casi vacías el optimizador puede preferir un full scan."
+    )
+
+    def handle(self, *args, **opts):
+        fallas = 0
+        for nombre, filas, problemas in revisar_planes():
+            indices = ", ".join(str(f.get("key")) for f in filas)
+            if problemas:
+                fallas += 1
+                self.stdout.write(self.style.ERROR(f"FALLA {nombre} [{indices}]"))
+                for p in problemas:
+                    self.stdout.write(f"    {p}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"OK    {nombre} [{indices}]"))
+
+        if fallas:
+            raise CommandError(f"{fallas} consulta(s) sin plan por índice.")
@@ -254,6 +254,42 @@ class VCarteraAging(models.Model):
         verbose_name_plural = "Cartera Aging"
 
 
+## Snapshot de cartera (core/sql/004_cartera_aging_snapshot.sql)
+class CarteraAgingSnapshot(models.Model):
+    cuota_id = models.BigIntegerField(primary_key=True)
+    cliente_id = models.IntegerField()
+    cliente = models.CharField(max_length=150)
+    fecha_venc = models.DateField()
+    saldo = models.DecimalField(max_digits=12, decimal_places=2)
+    bucket = models.CharField(max_length=10)
+
+    class Meta:
+        managed = False
+        db_table = "cartera_aging_snapshot"
+
+
+class CarteraAgingBucket(models.Model):
+    bucket = models.CharField(primary_key=True, max_length=10)
+    saldo = models.DecimalField(max_digits=14, decimal_places=2)
+    cuotas = models.IntegerField()
+
+    class Meta:
+        managed = False
+        db_table = "cartera_aging_bucket"
+
+
+class CarteraAgingCliente(models.Model):
+    cliente_id = models.IntegerField(primary_key=True)
+    cliente = models.CharField(max_length=150)
+    total_deuda = models.DecimalField(max_digits=14, decimal_places=2)
+    total_vencido = models.DecimalField(max_digits=14, decimal_places=2)
+    cuotas = models.IntegerField()
+
+    class Meta:
+        managed = False
+        db_table = "cartera_aging_cliente"
+
+
 ## fase 4 modelos de compras
 class Proveedor(models.Model):
     id = models.AutoField(primary_key=True)
@@ -307,6 +343,37 @@ class CompraDetalle(models.Model):
         db_table = "compra_detalle"
 
 
+class CompraResumenDia(models.Model):
+    """Rollup diario de compras; ver core/sql/006_compra_resumen_dia.sql."""
+
+    id = models.BigAutoField(primary_key=True)
+    fecha = models.DateField()
+    proveedor = models.ForeignKey("Proveedor", models.DO_NOTHING)
+    bodega = models.ForeignKey("Bodega", models.DO_NOTHING)
+    estado = models.CharField(max_length=10)
+    compras = models.IntegerField()
+    total = models.DecimalField(max_digits=16, decimal_places=2)
+
+    class Meta:
+        managed = False
+        db_table = "compra_resumen_dia"
+
+
+class CompraProductoDia(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    fecha = models.DateField()
+    proveedor = models.ForeignKey("Proveedor", models.DO_NOTHING)
+    bodega = models.ForeignKey("Bodega", models.DO_NOTHING)
+    producto = models.ForeignKey("Producto", models.DO_NOTHING)
+    estado = models.CharField(max_length=10)
+    cantidad = models.DecimalField(max_digits=18, decimal_places=4)
+    costo = models.DecimalField(max_digits=16, decimal_places=2)
+
+    class Meta:
+        managed = False
+        db_table = "compra_producto_dia"
+
+
 class MovimientoInventario(models.Model):
     id = models.BigAutoField(primary_key=True)
     fecha = models.DateTimeField()
@@ -18,11 +18,39 @@ class PedidoItemsReplaceSerializer(serializers.Serializer):
     items = PedidoItemSerializer(many=True)
 
 
+class PedidoItemPatchSerializer(serializers.Serializer):
+    producto_id = serializers.IntegerField()
+    # Nueva cantidad total del producto; 0 lo elimina del pedido
+    cantidad = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    precio_unitario = serializers.DecimalField(
+        max_digits=12, decimal_places=2, required=False
+    )
+
+
+class PedidoItemsPatchSerializer(serializers.Serializer):
+    items = PedidoItemPatchSerializer(many=True)
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("Debes enviar al menos un cambio.")
+        ids = [it["producto_id"] for it in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                "Cada producto_id puede venir una sola vez."
+            )
+        return value
+
+
 class PedidoListFilterSerializer(serializers.Serializer):
     cliente_id = serializers.IntegerField(required=False)
+    bodega_id = serializers.IntegerField(required=False)
     estado = serializers.ChoiceField(
         required=False,
         choices=["ABIERTO", "RESERVADO", "FACTURADO", "CANCELADO"],
     )
     fecha_desde = serializers.DateField(required=False)
     fecha_hasta = serializers.DateField(required=False)
+    cursor = serializers.CharField(required=False, allow_blank=False)
+    limit = serializers.IntegerField(
+        required=False, min_value=1, max_value=500, default=100
+    )
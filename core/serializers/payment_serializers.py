@@ -5,6 +5,7 @@ from rest_framework import serializers
 
 from core.models import Pago, AplicacionPago
 from core.services.payment_service import (
+    registrar_pago_automatico,
     registrar_pago_con_aplicaciones,
     PaymentError,
 )
@@ -116,7 +117,11 @@ class PagoCreateSerializer(serializers.Serializer):
     # Por ahora viene en el body; más adelante se puede sacar del usuario autenticado
     usuario_id = serializers.IntegerField()
 
-    aplicaciones = AplicacionPagoInputSerializer(many=True)
+    # true → el servidor reparte monto_total sobre las cuotas del cliente
+    # (más antiguas primero; mora → interés → capital) y no se envían aplicaciones
+    aplicar_automatico = serializers.BooleanField(required=False, default=False)
+
+    aplicaciones = AplicacionPagoInputSerializer(many=True, required=False)
 
     def validate(self, attrs):
         """
@@ -126,6 +131,19 @@ class PagoCreateSerializer(serializers.Serializer):
         aplicaciones = attrs.get("aplicaciones", [])
         monto_total = attrs.get("monto_total")
 
+        if attrs.get("aplicar_automatico"):
+            if aplicaciones:
+                raise serializers.ValidationError(
+                    {
+                        "aplicaciones": "No se envían aplicaciones cuando aplicar_automatico = true."
+                    }
+                )
+            return attrs
+        if "aplicaciones" not in attrs:
+            raise serializers.ValidationError(
+                {"aplicaciones": "Es requerido si aplicar_automatico no es true."}
+            )
+
         suma = sum(Decimal(str(a["monto"])) for a in aplicaciones)
         if monto_total is not None and suma != monto_total:
             raise serializers.ValidationError(
@@ -139,9 +157,20 @@ class PagoCreateSerializer(serializers.Serializer):
         return attrs
 
     def create(self, validated_data):
-        aplicaciones_data = validated_data.pop("aplicaciones")
+        aplicaciones_data = validated_data.pop("aplicaciones", [])
 
         try:
+            if validated_data.get("aplicar_automatico"):
+                return registrar_pago_automatico(
+                    cliente_id=validated_data["cliente_id"],
+                    metodo=validated_data["metodo"],
+                    monto_total=validated_data["monto_total"],
+                    referencia=validated_data.get("referencia"),
+                    usuario_id=validated_data["usuario_id"],
+                    es_deposito_inicial=validated_data.get(
+                        "es_deposito_inicial", False
+                    ),
+                )
             pago = registrar_pago_con_aplicaciones(
                 cliente_id=validated_data["cliente_id"],
                 metodo=validated_data["metodo"],
@@ -157,6 +186,25 @@ class PagoCreateSerializer(serializers.Serializer):
         return pago
 
 
+def validar_registros_pago(registros, usuario_id: int):
+    """
+    Valida cada registro de un lote de pagos (core/services/
+    payment_batch_service.py) con PagoCreateSerializer, como POST /pagos/.
+    Generador: deja en `data` los datos validados o, si no son válidos, los
+    errores en `error`; el lote los reporta sin detener el resto.
+    """
+    for registro in registros:
+        if not registro.get("error"):
+            serializer = PagoCreateSerializer(
+                data=dict(registro["data"], usuario_id=usuario_id)
+            )
+            if serializer.is_valid():
+                registro = dict(registro, data=serializer.validated_data)
+            else:
+                registro = dict(registro, error=serializer.errors)
+        yield registro
+
+
 ## Endpoints de consulta de pagos
 class PagoSerializer(serializers.ModelSerializer):
     aplicaciones = AplicacionPagoSerializer(
@@ -39,6 +39,31 @@ class CompraDetalleSerializer(serializers.ModelSerializer):
         ]
 
 
+class CompraListSerializer(serializers.ModelSerializer):
+    """Compra sin líneas de detalle (listados livianos: ?detalles=false)."""
+
+    proveedor_nombre = serializers.CharField(source="proveedor.nombre", read_only=True)
+    bodega_nombre = serializers.CharField(source="bodega.nombre", read_only=True)
+    usuario_username = serializers.CharField(source="usuario.username", read_only=True)
+
+    class Meta:
+        model = Compra
+        fields = [
+            "id",
+            "proveedor_id",
+            "proveedor_nombre",
+            "bodega_id",
+            "bodega_nombre",
+            "fecha",
+            "no_documento",
+            "total",
+            "usuario_id",
+            "usuario_username",
+            "estado",
+            "observaciones",
+        ]
+
+
 class CompraSerializer(serializers.ModelSerializer):
     proveedor_nombre = serializers.CharField(source="proveedor.nombre", read_only=True)
     bodega_nombre = serializers.CharField(source="bodega.nombre", read_only=True)
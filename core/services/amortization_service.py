@@ -0,0 +1,323 @@
+# core/services/amortization_service.py
+"""
+Generación de planes de pago (tabla de cuotas) para Acuerdopago.
+
+- tipo FRANCES: cuota fija; el interés de cada periodo se calcula sobre el
+  saldo y el capital es la diferencia.
+- tipo FLAT: interés total = capital * tasa * cuotas, repartido en partes
+  iguales igual que el capital.
+- periodicidad SEMANAL (7 días), QUINCENAL (15 días) o MENSUAL (mismo día
+  de cada mes, ajustado al último día si no existe).
+
+Los acuerdos se procesan por lotes de LOTE_ACUERDOS: lectura, borrado e
+inserción de cuotas son sentencias por lote, no por acuerdo. Los factores
+de cuota y las fechas se calculan una vez por combinación de parámetros.
+"""
+
+import calendar
+import logging
+import time
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+from django.db import connection, transaction
+
+from core.services.cartera_service import refrescar_cuotas
+
+logger = logging.getLogger(__name__)
+
+LOTE_ACUERDOS = 500
+
+TIPOS = ("FRANCES", "FLAT")
+PERIODOS_POR_ANIO = {"SEMANAL": 52, "QUINCENAL": 24, "MENSUAL": 12}
+DIAS_PERIODO = {"SEMANAL": 7, "QUINCENAL": 15}
+
+_CENTAVO = Decimal("0.01")
+
+
+class AmortizacionError(Exception):
+    pass
+
+
+def _redondear(valor: Decimal) -> Decimal:
+    return valor.quantize(_CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def _sumar_meses(fecha: date, meses: int) -> date:
+    mes = fecha.month - 1 + meses
+    anio, mes = fecha.year + mes // 12, mes % 12 + 1
+    return date(anio, mes, min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+@lru_cache(maxsize=4096)
+def _tasa_periodo(interes_anual: Decimal, periodicidad: str) -> Decimal:
+    return interes_anual / Decimal(100) / PERIODOS_POR_ANIO[periodicidad]
+
+
+@lru_cache(maxsize=4096)
+def _factor_cuota(tasa: Decimal, n: int) -> Decimal:
+    """Cuota fija por unidad de capital (sistema francés)."""
+    if tasa == 0:
+        return Decimal(1) / n
+    return tasa / (1 - (1 + tasa) ** -n)
+
+
+@lru_cache(maxsize=4096)
+def _fechas(fecha_inicio: date, periodicidad: str, n: int) -> tuple:
+    if periodicidad == "MENSUAL":
+        return tuple(_sumar_meses(fecha_inicio, k) for k in range(1, n + 1))
+    dias = DIAS_PERIODO[periodicidad]
+    return tuple(fecha_inicio + timedelta(days=dias * k) for k in range(1, n + 1))
+
+
+def calcular_plan(
+    *,
+    tipo: str,
+    capital: Decimal,
+    interes_anual: Decimal,
+    cuotas: int,
+    periodicidad: str,
+    fecha_inicio: date,
+) -> list:
+    """
+    Devuelve las cuotas del plan como tuplas
+    (no_cuota, fecha_venc, capital_prog, interes_prog, total_prog).
+    La última cuota absorbe las diferencias de redondeo.
+    """
+    if tipo not in TIPOS:
+        raise AmortizacionError(f"Tipo de acuerdo no soportado: {tipo!r}.")
+    if periodicidad not in PERIODOS_POR_ANIO:
+        raise AmortizacionError(f"Periodicidad no soportada: {periodicidad!r}.")
+    if not cuotas or cuotas <= 0:
+        raise AmortizacionError("El acuerdo debe tener al menos una cuota.")
+    capital = Decimal(str(capital))
+    if capital <= 0:
+        raise AmortizacionError("El capital debe ser mayor que cero.")
+
+    tasa = _tasa_periodo(Decimal(str(interes_anual)), periodicidad)
+    fechas = _fechas(fecha_inicio, periodicidad, cuotas)
+    plan = []
+
+    if tipo == "FRANCES":
+        cuota_fija = _redondear(capital * _factor_cuota(tasa, cuotas))
+        saldo = capital
+        for k, fecha in enumerate(fechas, start=1):
+            interes = _redondear(saldo * tasa)
+            abono = saldo if k == cuotas else min(cuota_fija - interes, saldo)
+            saldo -= abono
+            plan.append((k, fecha, abono, interes, abono + interes))
+        return plan
+
+    # FLAT
+    interes_total = _redondear(capital * tasa * cuotas)
+    abono = _redondear(capital / cuotas)
+    interes = _redondear(interes_total / cuotas)
+    for k, fecha in enumerate(fechas, start=1):
+        if k == cuotas:
+            abono = capital - abono * (cuotas - 1)
+            interes = interes_total - interes * (cuotas - 1)
+        plan.append((k, fecha, abono, interes, abono + interes))
+    return plan
+
+
+# ---------------------------------------------------------------------
+# Lectura de acuerdos por lotes (keyset por id)
+# ---------------------------------------------------------------------
+_COLUMNAS_ACUERDO = (
+    "id, tipo, capital, interes_anual, cuotas, periodicidad, fecha_inicio"
+)
+
+
+def _marcas(ids) -> str:
+    return ", ".join(["%s"] * len(ids))
+
+
+def _lotes_de_acuerdos(acuerdo_ids=None, estado=None, lote=LOTE_ACUERDOS):
+    """Produce listas de ids de acuerdo, de a `lote`, en orden de id."""
+    if acuerdo_ids is not None:
+        ids = sorted({int(i) for i in acuerdo_ids})
+        for inicio in range(0, len(ids), lote):
+            yield ids[inicio : inicio + lote]
+        return
+
+    ultimo = 0
+    while True:
+        sql = "SELECT id FROM acuerdopago WHERE id > %s"
+        params = [ultimo]
+        if estado:
+            sql += " AND estado = %s"
+            params.append(estado)
+        sql += " ORDER BY id LIMIT %s"
+        params.append(lote)
+        with connection.cursor() as cur:
+            cur.execute(sql, params)
+            ids = [int(r[0]) for r in cur.fetchall()]
+        if not ids:
+            return
+        yield ids
+        ultimo = ids[-1]
+
+
+def _leer_acuerdos(cur, ids, for_update=False) -> list:
+    sql = (
+        f"SELECT {_COLUMNAS_ACUERDO} FROM acuerdopago "
+        f"WHERE id IN ({_marcas(ids)}) ORDER BY id"
+    )
+    if for_update:
+        sql += " FOR UPDATE"
+    cur.execute(sql, ids)
+    return cur.fetchall()
+
+
+def _plan_de_fila(fila, interes_anual=None) -> list:
+    _id, tipo, capital, tasa, cuotas, periodicidad, fecha_inicio = fila
+    return calcular_plan(
+        tipo=tipo,
+        capital=capital,
+        interes_anual=tasa if interes_anual is None else interes_anual,
+        cuotas=cuotas,
+        periodicidad=periodicidad,
+        fecha_inicio=fecha_inicio,
+    )
+
+
+def proyectar_planes(
+    acuerdo_ids=None, estado=None, interes_anual=None, lote=LOTE_ACUERDOS
+):
+    """
+    Dry-run: genera (en streaming) el plan proyectado de cada acuerdo sin
+    escribir nada. `interes_anual` simula un cambio de tasa.
+    Produce {acuerdo_id, cuotas: [...]} o {acuerdo_id, error}.
+    """
+    for ids in _lotes_de_acuerdos(acuerdo_ids, estado, lote):
+        with connection.cursor() as cur:
+            filas = _leer_acuerdos(cur, ids)
+        for fila in filas:
+            try:
+                plan = _plan_de_fila(fila, interes_anual)
+            except AmortizacionError as e:
+                yield {"acuerdo_id": fila[0], "error": str(e)}
+                continue
+            yield {
+                "acuerdo_id": fila[0],
+                "cuotas": [
+                    {
+                        "no_cuota": no,
+                        "fecha_venc": fecha,
+                        "capital_prog": cap,
+                        "interes_prog": inte,
+                        "total_prog": total,
+                    }
+                    for no, fecha, cap, inte, total in plan
+                ],
+            }
+
+
+@transaction.atomic
+def _generar_lote(ids: list, interes_anual=None) -> dict:
+    """
+    Regenera las cuotas de un lote de acuerdos con un número fijo de
+    sentencias. Los acuerdos con alguna cuota con pagos aplicados o mora
+    devengada no se tocan (se reportan en `con_movimientos`): borrar esas
+    cuotas dejaría aplicacionpago y mora_devengo apuntando a cuotas que
+    ya no existen.
+    """
+    res = {"acuerdos": 0, "cuotas": 0, "con_movimientos": [], "errores": {}}
+    with connection.cursor() as cur:
+        filas = _leer_acuerdos(cur, ids, for_update=True)
+
+        cur.execute(
+            f"""
+            SELECT DISTINCT c.acuerdo_id
+            FROM cuota c
+            WHERE c.acuerdo_id IN ({_marcas(ids)})
+              AND (
+                  EXISTS (SELECT 1 FROM aplicacionpago ap WHERE ap.cuota_id = c.id)
+                  OR EXISTS (SELECT 1 FROM mora_devengo m WHERE m.cuota_id = c.id)
+              )
+            """,
+            ids,
+        )
+        con_movimientos = {int(r[0]) for r in cur.fetchall()}
+        res["con_movimientos"] = sorted(con_movimientos)
+
+        nuevas = []
+        regenerar = []
+        for fila in filas:
+            if fila[0] in con_movimientos:
+                continue
+            try:
+                plan = _plan_de_fila(fila, interes_anual)
+            except AmortizacionError as e:
+                res["errores"][fila[0]] = str(e)
+                continue
+            regenerar.append(fila[0])
+            nuevas.extend(
+                (fila[0], no, fecha, cap, inte, total, total)
+                for no, fecha, cap, inte, total in plan
+            )
+        if not regenerar:
+            return res
+
+        cur.execute(
+            f"SELECT id FROM cuota WHERE acuerdo_id IN ({_marcas(regenerar)})",
+            regenerar,
+        )
+        anteriores = [int(r[0]) for r in cur.fetchall()]
+        if anteriores:
+            cur.execute(
+                f"DELETE FROM cuota WHERE acuerdo_id IN ({_marcas(regenerar)})",
+                regenerar,
+            )
+        if interes_anual is not None:
+            cur.execute(
+                f"UPDATE acuerdopago SET interes_anual = %s WHERE id IN ({_marcas(regenerar)})",
+                [interes_anual, *regenerar],
+            )
+        cur.executemany(
+            """
+            INSERT INTO cuota (acuerdo_id, no_cuota, fecha_venc, capital_prog, interes_prog, total_prog, saldo_cuota, estado)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 'PENDIENTE')
+            """,
+            nuevas,
+        )
+        cur.execute(
+            f"SELECT id FROM cuota WHERE acuerdo_id IN ({_marcas(regenerar)})",
+            regenerar,
+        )
+        creadas = [int(r[0]) for r in cur.fetchall()]
+
+    refrescar_cuotas(anteriores + creadas)
+    res["acuerdos"] = len(regenerar)
+    res["cuotas"] = len(nuevas)
+    return res
+
+
+def generar_planes(
+    acuerdo_ids=None, estado=None, interes_anual=None, lote=LOTE_ACUERDOS
+) -> dict:
+    """
+    Genera (o regenera) y guarda el plan de cuotas de los acuerdos indicados,
+    o de todos los que tengan `estado`. Con `interes_anual` aplica además un
+    cambio de tasa. Cada lote va en su propia transacción.
+    """
+    total = {"acuerdos": 0, "cuotas": 0, "con_movimientos": [], "errores": {}}
+    for ids in _lotes_de_acuerdos(acuerdo_ids, estado, lote):
+        t0 = time.perf_counter()
+        res = _generar_lote(ids, interes_anual)
+        logger.info(
+            "planes de pago lote=%s..%s acuerdos=%s cuotas=%s con_movimientos=%s errores=%s ms=%.0f",
+            ids[0],
+            ids[-1],
+            res["acuerdos"],
+            res["cuotas"],
+            len(res["con_movimientos"]),
+            len(res["errores"]),
+            (time.perf_counter() - t0) * 1000,
+        )
+        total["acuerdos"] += res["acuerdos"]
+        total["cuotas"] += res["cuotas"]
+        total["con_movimientos"].extend(res["con_movimientos"])
+        total["errores"].update(res["errores"])
+    return total
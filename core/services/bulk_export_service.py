@@ -0,0 +1,394 @@
+# core/services/bulk_export_service.py
+"""
+Exportaciones masivas para BI: compras, ventas, pedidos y kardex en CSV
+(gzip), JSON lines o Parquet (columnar).
+
+Cada fuente es un queryset de líneas de detalle con sus filtros; cada
+formato es un escritor que recibe bloques de filas y produce bytes. Las
+filas se leen por bloques de BLOQUE_FILAS con paginación por id (JOINs en
+una sola consulta por bloque), así que la salida puede ir directo a un
+StreamingHttpResponse o a un archivo sin cargar todo en memoria.
+
+Los filtros se validan y el queryset se arma al llamar a exportar(), antes
+de producir el primer byte: un filtro inválido es ExportFormatError (400)
+y no un archivo cortado a medias con status 200.
+"""
+
+import csv
+import io
+import json
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import models
+from django.db.models import Q
+
+from core.models import CompraDetalle, MovimientoInventario, Pedidodetalle, Ventadetalle
+from core.services.date_range import filtrar_rango
+from core.services.purchase_export_service import PurchaseExportService
+
+try:  # Parquet es opcional: requiere pyarrow (requirements-parquet.txt)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None
+
+BLOQUE_FILAS = 5000
+
+
+class ExportFormatError(Exception):
+    pass
+
+
+# ---------------------------------------------------------------------
+# Fuentes
+# ---------------------------------------------------------------------
+@dataclass(frozen=True)
+class Fuente:
+    modelo: type  # modelo de las líneas (tipos de las columnas)
+    filtrar: object  # fn(params) -> QuerySet de líneas
+    columnas: tuple  # (nombre en el archivo, lookup del ORM)
+    filtros: tuple  # parámetros aceptados (forman la llave de los trabajos)
+
+
+# ---------------------------------------------------------------------
+# Filtros: validados y en forma canónica (como FiltroCompras.desde_params)
+# ---------------------------------------------------------------------
+def _filtro(nombre: str, valor) -> str:
+    """Valor canónico (texto): *_id entero, fecha_* ISO, el resto en mayúsculas."""
+    valor = str(valor).strip()
+    if nombre.endswith("_id"):
+        try:
+            return str(int(valor))
+        except ValueError:
+            raise ExportFormatError(f"{nombre}: Debe ser un número entero.")
+    if nombre.startswith("fecha_"):
+        try:
+            return date.fromisoformat(valor).isoformat()
+        except ValueError:
+            raise ExportFormatError(f"{nombre}: Formato esperado: AAAA-MM-DD.")
+    return valor.upper()
+
+
+def normalizar_filtros(recurso: str, params) -> dict:
+    """
+    Filtros presentes de la fuente, validados y canónicos ("05" → "5",
+    "registrada" → "REGISTRADA"). Los demás parámetros se ignoran.
+    """
+    filtros = {}
+    for nombre in FUENTES[recurso].filtros:
+        valor = params.get(nombre)
+        if valor not in (None, "") and str(valor).strip():
+            filtros[nombre] = _filtro(nombre, valor)
+    return filtros
+
+
+def _rango_fechas(qs, campo: str, params):
+    return filtrar_rango(
+        qs, campo, params.get("fecha_desde"), params.get("fecha_hasta")
+    )
+
+
+def _filtrar_compras(params):
+    compras = PurchaseExportService.filtrar_compras(params).order_by()
+    return CompraDetalle.objects.filter(compra_id__in=compras.values("id"))
+
+
+def _filtrar_ventas(params):
+    qs = Ventadetalle.objects.all()
+    if params.get("cliente_id"):
+        qs = qs.filter(venta__cliente_id=params["cliente_id"])
+    if params.get("bodega_id"):
+        qs = qs.filter(venta__bodega_id=params["bodega_id"])
+    if params.get("estado"):
+        qs = qs.filter(venta__estado=params["estado"].upper())
+    return _rango_fechas(qs, "venta__fecha", params)
+
+
+def _filtrar_pedidos(params):
+    qs = Pedidodetalle.objects.all()
+    if params.get("cliente_id"):
+        qs = qs.filter(pedido__cliente_id=params["cliente_id"])
+    if params.get("bodega_id"):
+        qs = qs.filter(pedido__bodega_id=params["bodega_id"])
+    if params.get("estado"):
+        qs = qs.filter(pedido__estado=params["estado"].upper())
+    return _rango_fechas(qs, "pedido__fecha", params)
+
+
+def _filtrar_kardex(params):
+    qs = MovimientoInventario.objects.all()
+    if params.get("producto_id"):
+        qs = qs.filter(producto_id=params["producto_id"])
+    if params.get("bodega_id"):
+        b = params["bodega_id"]
+        qs = qs.filter(Q(bodega_origen_id=b) | Q(bodega_destino_id=b))
+    if params.get("tipo"):
+        qs = qs.filter(tipo=params["tipo"].upper())
+    return _rango_fechas(qs, "fecha", params)
+
+
+_FILTROS_FECHA = ("fecha_desde", "fecha_hasta")
+
+FUENTES = {
+    "compras": Fuente(
+        modelo=CompraDetalle,
+        filtrar=_filtrar_compras,
+        columnas=(
+            ("compra_id", "compra_id"),
+            ("fecha", "compra__fecha"),
+            ("proveedor_id", "compra__proveedor_id"),
+            ("proveedor", "compra__proveedor__nombre"),
+            ("bodega_id", "compra__bodega_id"),
+            ("bodega", "compra__bodega__nombre"),
+            ("no_documento", "compra__no_documento"),
+            ("estado", "compra__estado"),
+            ("producto_id", "producto_id"),
+            ("producto", "producto__nombre"),
+            ("cantidad", "cantidad"),
+            ("costo_unit", "costo_unit"),
+            ("subtotal", "subtotal"),
+        ),
+        filtros=("proveedor_id", "bodega_id", "estado", *_FILTROS_FECHA),
+    ),
+    "ventas": Fuente(
+        modelo=Ventadetalle,
+        filtrar=_filtrar_ventas,
+        columnas=(
+            ("venta_id", "venta_id"),
+            ("fecha", "venta__fecha"),
+            ("cliente_id", "venta__cliente_id"),
+            ("cliente", "venta__cliente__nombre"),
+            ("bodega_id", "venta__bodega_id"),
+            ("tipo_pago", "venta__tipo_pago"),
+            ("estado", "venta__estado"),
+            ("producto_id", "producto_id"),
+            ("producto", "producto__nombre"),
+            ("cantidad", "cantidad"),
+            ("precio_unit", "precio_unit"),
+            ("impuesto", "impuesto"),
+            ("descuento", "descuento"),
+        ),
+        filtros=("cliente_id", "bodega_id", "estado", *_FILTROS_FECHA),
+    ),
+    "pedidos": Fuente(
+        modelo=Pedidodetalle,
+        filtrar=_filtrar_pedidos,
+        columnas=(
+            ("pedido_id", "pedido_id"),
+            ("fecha", "pedido__fecha"),
+            ("cliente_id", "pedido__cliente_id"),
+            ("cliente", "pedido__cliente__nombre"),
+            ("bodega_id", "pedido__bodega_id"),
+            ("estado", "pedido__estado"),
+            ("producto_id", "producto_id"),
+            ("producto", "producto__nombre"),
+            ("cantidad", "cantidad"),
+            ("precio_unitario", "precio_unitario"),
+            ("subtotal", "subtotal"),
+        ),
+        filtros=("cliente_id", "bodega_id", "estado", *_FILTROS_FECHA),
+    ),
+    "kardex": Fuente(
+        modelo=MovimientoInventario,
+        filtrar=_filtrar_kardex,
+        columnas=(
+            ("movimiento_id", "id"),
+            ("fecha", "fecha"),
+            ("tipo", "tipo"),
+            ("producto_id", "producto_id"),
+            ("producto", "producto__nombre"),
+            ("bodega_origen_id", "bodega_origen_id"),
+            ("bodega_destino_id", "bodega_destino_id"),
+            ("cantidad", "cantidad"),
+            ("costo_unit", "costo_unit"),
+            ("referencia", "referencia"),
+            ("compra_id", "compra_id"),
+        ),
+        filtros=("producto_id", "bodega_id", "tipo", *_FILTROS_FECHA),
+    ),
+}
+
+
+def queryset(recurso: str, params):
+    """Líneas de la fuente con los filtros validados (ExportFormatError si no)."""
+    return FUENTES[recurso].filtrar(normalizar_filtros(recurso, params))
+
+
+def bloques(recurso: str, qs, tam: int = BLOQUE_FILAS):
+    """
+    Produce listas de tuplas (en el orden de `columnas`) de a `tam` filas
+    de `qs` (ver queryset()), paginando por id: una consulta con JOINs por
+    bloque.
+    """
+    qs = qs.order_by("id")
+    lookups = ["id", *(lookup for _nombre, lookup in FUENTES[recurso].columnas)]
+    ultimo = 0
+    while True:
+        filas = list(qs.filter(id__gt=ultimo).values_list(*lookups)[:tam])
+        if not filas:
+            return
+        ultimo = filas[-1][0]
+        yield [fila[1:] for fila in filas]
+
+
+# ---------------------------------------------------------------------
+# Formatos: cada escritor recibe (recurso, bloques) y produce bytes
+# ---------------------------------------------------------------------
+def _texto(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+def _nombres(recurso: str) -> list:
+    return [nombre for nombre, _lookup in FUENTES[recurso].columnas]
+
+
+def _csv_gzip(recurso, bloques_filas):
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = cabecera gzip
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(_nombres(recurso))
+    for filas in bloques_filas:
+        writer.writerows([[_texto(v) for v in fila] for fila in filas])
+        yield gz.compress(buffer.getvalue().encode("utf-8"))
+        buffer.seek(0)
+        buffer.truncate()
+    yield gz.compress(buffer.getvalue().encode("utf-8"))
+    yield gz.flush()
+
+
+def _json_default(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f"No serializable: {type(valor).__name__}")
+
+
+def _jsonl(recurso, bloques_filas):
+    columnas = _nombres(recurso)
+    for filas in bloques_filas:
+        yield "".join(
+            json.dumps(dict(zip(columnas, fila)), default=_json_default) + "\n"
+            for fila in filas
+        ).encode("utf-8")
+
+
+class _SalidaDrenable(io.RawIOBase):
+    """Archivo de solo escritura que entrega lo escrito al drenarlo."""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._partes.append(bytes(b))
+        return len(b)
+
+    def drenar(self) -> bytes:
+        datos, self._partes = b"".join(self._partes), []
+        return datos
+
+
+def _campo(modelo, lookup: str):
+    """Campo del modelo al que llega `lookup` ("compra__proveedor__nombre")."""
+    *relaciones, nombre = lookup.split("__")
+    for relacion in relaciones:
+        modelo = modelo._meta.get_field(relacion).related_model
+    return modelo._meta.get_field(nombre)
+
+
+def _tipo_arrow(campo):
+    if campo.is_relation:
+        campo = campo.target_field
+    if isinstance(campo, (models.AutoField, models.IntegerField)):
+        return pa.int64()
+    if isinstance(campo, models.DecimalField):
+        return pa.decimal128(campo.max_digits, campo.decimal_places)
+    if isinstance(campo, models.DateTimeField):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(campo, models.DateField):
+        return pa.date32()
+    if isinstance(campo, models.BooleanField):
+        return pa.bool_()
+    return pa.string()
+
+
+def esquema_parquet(recurso: str):
+    """
+    Esquema fijo desde los campos del modelo: no depende de los valores del
+    primer bloque (columnas nulas, precisión de los decimales).
+    """
+    fuente = FUENTES[recurso]
+    return pa.schema(
+        [
+            pa.field(nombre, _tipo_arrow(_campo(fuente.modelo, lookup)))
+            for nombre, lookup in fuente.columnas
+        ]
+    )
+
+
+def _parquet(recurso, bloques_filas):
+    """Un row group por bloque, todos con el esquema de la fuente."""
+    schema = esquema_parquet(recurso)
+    salida = _SalidaDrenable()
+    writer = pq.ParquetWriter(salida, schema, compression="snappy")
+    try:
+        for filas in bloques_filas:
+            datos = {c: [f[i] for f in filas] for i, c in enumerate(schema.names)}
+            writer.write_table(pa.Table.from_pydict(datos, schema=schema))
+            yield salida.drenar()
+    finally:
+        writer.close()
+    yield salida.drenar()
+
+
+@dataclass(frozen=True)
+class Formato:
+    escribir: object  # fn(recurso, bloques) -> iterable de bytes
+    extension: str
+    content_type: str
+
+
+FORMATOS = {
+    "csv": Formato(_csv_gzip, "csv.gz", "application/gzip"),
+    "jsonl": Formato(_jsonl, "jsonl", "application/x-ndjson"),
+    "parquet": Formato(_parquet, "parquet", "application/vnd.apache.parquet"),
+}
+
+
+def validar(recurso: str, formato: str) -> None:
+    if recurso not in FUENTES:
+        raise ExportFormatError(
+            f"Recurso no soportado: {recurso!r} (use {', '.join(sorted(FUENTES))})."
+        )
+    if formato not in FORMATOS:
+        raise ExportFormatError(
+            f"Formato no soportado: {formato!r} (use {', '.join(sorted(FORMATOS))})."
+        )
+    if formato == "parquet" and pa is None:
+        raise ExportFormatError(
+            "El formato parquet requiere instalar pyarrow (requirements-parquet.txt)."
+        )
+
+
+def exportar(recurso: str, formato: str, params, tam: int = BLOQUE_FILAS):
+    """
+    Valida formato y filtros y arma el queryset (ExportFormatError si algo
+    no es válido); devuelve el generador de bytes del archivo completo
+    (para streaming o disco).
+    """
+    validar(recurso, formato)
+    qs = queryset(recurso, params)
+    return FORMATOS[formato].escribir(recurso, bloques(recurso, qs, tam))
+
+
+def exportar_a_archivo(recurso: str, formato: str, params, destino) -> None:
+    for parte in exportar(recurso, formato, params):
+        destino.write(parte)
@@ -0,0 +1,216 @@
+# core/services/cartera_service.py
+"""
+Mantenimiento del snapshot de cartera (aging) y sus totales.
+
+La fuente de verdad sigue siendo la vista v_cartera_aging; estas tablas
+guardan una copia por cuota y los totales por bucket y por cliente para
+que el dashboard responda con consultas de costo constante.
+Ver core/sql/004_cartera_aging_snapshot.sql.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ("0-AL-DIA", "1-30", "31-60", "61-90", ">90")
+BUCKETS_VENCIDOS = BUCKETS[1:]
+
+# Cuotas por sentencia IN (...) al refrescar
+LOTE_CUOTAS = 1000
+
+# Mismo cálculo de bucket que v_cartera_aging (usa CURDATE() igual que la vista)
+_SQL_BUCKET = """
+    CASE
+        WHEN DATEDIFF(CURDATE(), fecha_venc) <= 0 THEN '0-AL-DIA'
+        WHEN DATEDIFF(CURDATE(), fecha_venc) <= 30 THEN '1-30'
+        WHEN DATEDIFF(CURDATE(), fecha_venc) <= 60 THEN '31-60'
+        WHEN DATEDIFF(CURDATE(), fecha_venc) <= 90 THEN '61-90'
+        ELSE '>90'
+    END
+"""
+
+
+def _marcas(ids) -> str:
+    return ", ".join(["%s"] * len(ids))
+
+
+def _refrescar_lote(cur, ids: list) -> int:
+    """
+    Sincroniza un lote de cuotas del snapshot con la vista y aplica la
+    diferencia (nuevo - anterior) a los totales por bucket y por cliente.
+    Devuelve cuántas cuotas cambiaron.
+    """
+    cur.execute(
+        f"""
+        SELECT cuota_id, cliente_id, cliente, saldo, bucket
+        FROM cartera_aging_snapshot
+        WHERE cuota_id IN ({_marcas(ids)})
+        FOR UPDATE
+        """,
+        ids,
+    )
+    antes = {r[0]: r for r in cur.fetchall()}
+
+    cur.execute(
+        f"""
+        SELECT cuota_id, cliente_id, cliente, fecha_venc, saldo, bucket
+        FROM v_cartera_aging
+        WHERE cuota_id IN ({_marcas(ids)})
+        """,
+        ids,
+    )
+    despues = {r[0]: r for r in cur.fetchall()}
+
+    # (saldo, cuotas) por bucket; [nombre, deuda, vencido, cuotas] por cliente
+    delta_bucket = {}
+    delta_cliente = {}
+
+    def acumular(cliente_id, cliente, saldo, bucket, signo):
+        saldo = Decimal(str(saldo)) * signo
+        b = delta_bucket.setdefault(bucket, [Decimal("0.00"), 0])
+        b[0] += saldo
+        b[1] += signo
+        c = delta_cliente.setdefault(
+            cliente_id, [cliente, Decimal("0.00"), Decimal("0.00"), 0]
+        )
+        c[0] = cliente
+        c[1] += saldo
+        if bucket in BUCKETS_VENCIDOS:
+            c[2] += saldo
+        c[3] += signo
+
+    cambiadas = []
+    for cuota_id in ids:
+        viejo, nuevo = antes.get(cuota_id), despues.get(cuota_id)
+        if viejo and nuevo and (viejo[3], viejo[4]) == (nuevo[4], nuevo[5]):
+            continue
+        cambiadas.append(cuota_id)
+        if viejo:
+            acumular(viejo[1], viejo[2], viejo[3], viejo[4], -1)
+        if nuevo:
+            acumular(nuevo[1], nuevo[2], nuevo[4], nuevo[5], 1)
+
+    if not cambiadas:
+        return 0
+
+    borrar = [i for i in cambiadas if i in antes]
+    if borrar:
+        cur.execute(
+            f"DELETE FROM cartera_aging_snapshot WHERE cuota_id IN ({_marcas(borrar)})",
+            borrar,
+        )
+    insertar = [despues[i] for i in cambiadas if i in despues]
+    if insertar:
+        cur.executemany(
+            """
+            INSERT INTO cartera_aging_snapshot (cuota_id, cliente_id, cliente, fecha_venc, saldo, bucket)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            insertar,
+        )
+
+    # Orden fijo (bucket / cliente_id) para que dos pagos no se bloqueen en cruz
+    cur.executemany(
+        """
+        INSERT INTO cartera_aging_bucket (bucket, saldo, cuotas)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE saldo = saldo + VALUES(saldo), cuotas = cuotas + VALUES(cuotas)
+        """,
+        [(b, d[0], d[1]) for b, d in sorted(delta_bucket.items())],
+    )
+    cur.executemany(
+        """
+        INSERT INTO cartera_aging_cliente (cliente_id, cliente, total_deuda, total_vencido, cuotas)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            cliente = VALUES(cliente),
+            total_deuda = total_deuda + VALUES(total_deuda),
+            total_vencido = total_vencido + VALUES(total_vencido),
+            cuotas = cuotas + VALUES(cuotas)
+        """,
+        [(cid, *d) for cid, d in sorted(delta_cliente.items())],
+    )
+    return len(cambiadas)
+
+
+@transaction.atomic
+def refrescar_cuotas(cuota_ids) -> int:
+    """
+    Actualiza el snapshot para las cuotas indicadas (pagos aplicados,
+    cuotas nuevas, mora, etc.). Las cuotas que salen de la vista (pagadas)
+    se eliminan del snapshot. Devuelve cuántas cambiaron.
+    """
+    ids = sorted({int(i) for i in cuota_ids})
+    cambiadas = 0
+    with connection.cursor() as cur:
+        for inicio in range(0, len(ids), LOTE_CUOTAS):
+            cambiadas += _refrescar_lote(cur, ids[inicio : inicio + LOTE_CUOTAS])
+    return cambiadas
+
+
+def rollover_aging(dias: int = 3) -> int:
+    """
+    Job diario: mueve de bucket las cuotas cuyo vencimiento cruzó una
+    frontera (1, 31, 61 o 91 días). Solo revisa cuotas con fecha_venc en
+    los últimos 91 + `dias` días (rango por índice); `dias` cubre corridas
+    perdidas. Devuelve cuántas cuotas cambiaron.
+    """
+    with connection.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT cuota_id
+            FROM cartera_aging_snapshot
+            WHERE fecha_venc BETWEEN CURDATE() - INTERVAL %s DAY
+                                 AND CURDATE() - INTERVAL 1 DAY
+              AND bucket <> {_SQL_BUCKET}
+            """,
+            [91 + int(dias)],
+        )
+        ids = [r[0] for r in cur.fetchall()]
+
+    cambiadas = refrescar_cuotas(ids) if ids else 0
+    logger.info("cartera_aging rollover revisadas=%s cambiadas=%s", len(ids), cambiadas)
+    return cambiadas
+
+
+def _reconstruir_agregados(cur):
+    cur.execute("DELETE FROM cartera_aging_bucket")
+    cur.execute("""
+        INSERT INTO cartera_aging_bucket (bucket, saldo, cuotas)
+        SELECT bucket, SUM(saldo), COUNT(*)
+        FROM cartera_aging_snapshot
+        GROUP BY bucket
+        """)
+    cur.execute("DELETE FROM cartera_aging_cliente")
+    cur.execute("""
+        INSERT INTO cartera_aging_cliente (cliente_id, cliente, total_deuda, total_vencido, cuotas)
+        SELECT cliente_id,
+               MAX(cliente),
+               SUM(saldo),
+               SUM(CASE WHEN bucket <> '0-AL-DIA' THEN saldo ELSE 0 END),
+               COUNT(*)
+        FROM cartera_aging_snapshot
+        GROUP BY cliente_id
+        """)
+
+
+@transaction.atomic
+def reconstruir_snapshot() -> int:
+    """
+    Copia completa de v_cartera_aging al snapshot y recalcula los totales.
+    Para la carga inicial o para reparar diferencias.
+    """
+    with connection.cursor() as cur:
+        cur.execute("DELETE FROM cartera_aging_snapshot")
+        cur.execute("""
+            INSERT INTO cartera_aging_snapshot (cuota_id, cliente_id, cliente, fecha_venc, saldo, bucket)
+            SELECT cuota_id, cliente_id, cliente, fecha_venc, saldo, bucket
+            FROM v_cartera_aging
+            """)
+        filas = cur.rowcount
+        _reconstruir_agregados(cur)
+    logger.info("cartera_aging reconstruido cuotas=%s", filas)
+    return filas
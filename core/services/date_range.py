@@ -0,0 +1,69 @@
+# core/services/date_range.py
+"""
+Filtro de rango de fechas sargable.
+
+Los filtros fecha_desde / fecha_hasta de la API son días locales
+(TIME_ZONE, America/Guatemala). `fecha__date__gte` los compara con
+DATE(CONVERT_TZ(fecha, ...)), que envuelve la columna en una función y
+obliga a MySQL a recorrer toda la tabla. Aquí el día se convierte en
+límites datetime semiabiertos en UTC:
+
+    fecha >= medianoche local de desde  AND  fecha < medianoche local de hasta + 1
+
+que comparan la columna tal cual y usan el índice por fecha.
+"""
+
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def _como_fecha(valor):
+    """date, datetime o 'AAAA-MM-DD' → date / datetime; inválido o vacío → None."""
+    if isinstance(valor, (date, datetime)):
+        return valor
+    try:
+        return parse_date(valor or "")
+    except ValueError:
+        return None
+
+
+def inicio_del_dia(fecha):
+    """
+    Convierte un date (día local) en el datetime UTC de su medianoche;
+    los datetime se devuelven tal cual.
+    """
+    if isinstance(fecha, datetime):
+        return fecha
+    local = timezone.make_aware(datetime.combine(fecha, time.min))
+    return local.astimezone(dt_timezone.utc)
+
+
+def limites(desde=None, hasta=None):
+    """
+    Devuelve (inicio, fin) para el rango [inicio, fin): inicio es la
+    medianoche local de `desde` y fin la del día siguiente a `hasta`.
+    Cualquiera de los dos es None si no vino o no es una fecha válida.
+    """
+    desde, hasta = _como_fecha(desde), _como_fecha(hasta)
+    inicio = inicio_del_dia(desde) if desde else None
+    fin = None
+    if hasta:
+        if isinstance(hasta, datetime):
+            hasta = timezone.localdate(hasta)
+        fin = inicio_del_dia(hasta + timedelta(days=1))
+    return inicio, fin
+
+
+def filtrar_rango(qs, campo: str, desde=None, hasta=None):
+    """
+    Aplica fecha_desde / fecha_hasta (días locales, incluidos ambos) sobre
+    el DateTimeField `campo` (puede atravesar relaciones: "venta__fecha").
+    """
+    inicio, fin = limites(desde, hasta)
+    if inicio:
+        qs = qs.filter(**{f"{campo}__gte": inicio})
+    if fin:
+        qs = qs.filter(**{f"{campo}__lt": fin})
+    return qs
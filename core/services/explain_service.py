@@ -0,0 +1,149 @@
+# core/services/explain_service.py
+"""
+Chequeos de plan (EXPLAIN de MySQL) de las consultas críticas:
+- listar_pedidos con paginación por cursor (core/sql/001_pedido_indices.sql);
+- filtros fecha_desde / fecha_hasta de compras y kardex
+  (core/sql/007_fecha_indices.sql), que además deben ser range scan.
+
+Cada chequeo es (nombre, tabla, índice esperado, función que devuelve las
+filas de EXPLAIN). Los corren core/tests/test_planes.py (solo con MySQL) y
+el comando verificar_planes contra una BD con datos reales.
+"""
+
+from datetime import date, datetime
+
+from django.db import connection
+
+from core.models import MovimientoInventario
+from core.services.date_range import filtrar_rango
+from core.services.order_service import _codificar_cursor, explain_listar_pedidos
+from core.services.purchase_filter_service import FiltroCompras
+
+
+def explain_queryset(qs) -> list:
+    """Filas de EXPLAIN para el SQL que generaría el queryset."""
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cur:
+        cur.execute("EXPLAIN " + sql, params)
+        cols = [c[0] for c in cur.description]
+        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+
+def _compras(**params):
+    return explain_queryset(FiltroCompras.desde_params(params).queryset())
+
+
+def _kardex(producto_id, desde, hasta):
+    qs = MovimientoInventario.objects.filter(producto_id=producto_id)
+    return explain_queryset(
+        filtrar_rango(qs, "fecha", desde, hasta).order_by("fecha", "id")
+    )
+
+
+PLANES = [
+    (
+        "pedidos: sin filtros",
+        "pedido",
+        "idx_pedido_fecha_id",
+        lambda: explain_listar_pedidos(),
+    ),
+    (
+        "pedidos: cliente",
+        "pedido",
+        "idx_pedido_cliente_fecha",
+        lambda: explain_listar_pedidos(cliente_id=1),
+    ),
+    (
+        "pedidos: bodega",
+        "pedido",
+        "idx_pedido_bodega_fecha",
+        lambda: explain_listar_pedidos(bodega_id=1),
+    ),
+    (
+        "pedidos: estado",
+        "pedido",
+        "idx_pedido_estado_fecha",
+        lambda: explain_listar_pedidos(estado="ABIERTO"),
+    ),
+    (
+        "pedidos: rango de fechas",
+        "pedido",
+        "idx_pedido_fecha_id",
+        lambda: explain_listar_pedidos(
+            fecha_desde=date(2025, 1, 1), fecha_hasta=date(2025, 1, 31)
+        ),
+    ),
+    (
+        "pedidos: cliente + fechas + cursor",
+        "pedido",
+        "idx_pedido_cliente_fecha",
+        lambda: explain_listar_pedidos(
+            cliente_id=1,
+            fecha_desde=date(2025, 1, 1),
+            cursor=_codificar_cursor(datetime(2025, 6, 1), 1000),
+        ),
+    ),
+]
+
+# Filtros por fecha (core/services/date_range.py): además de no caer en full
+# scan ni filesort, la tabla principal debe leerse con un range scan.
+PLANES_RANGO = [
+    (
+        "compras: rango de fechas",
+        "compra",
+        "idx_compra_fecha_id",
+        lambda: _compras(fecha_desde="2025-01-01", fecha_hasta="2025-01-31"),
+    ),
+    (
+        "compras: proveedor + fechas",
+        "compra",
+        "idx_compra_proveedor_fecha",
+        lambda: _compras(
+            proveedor_id=1, fecha_desde="2025-01-01", fecha_hasta="2025-01-31"
+        ),
+    ),
+    (
+        "compras: bodega + fechas",
+        "compra",
+        "idx_compra_bodega_fecha",
+        lambda: _compras(
+            bodega_id=1, fecha_desde="2025-01-01", fecha_hasta="2025-01-31"
+        ),
+    ),
+    (
+        "kardex: producto + fechas",
+        "movimientoinventario",
+        "idx_movinv_producto_fecha",
+        lambda: _kardex(1, "2025-01-01", "2025-01-31"),
+    ),
+]
+
+
+def problemas_del_plan(filas, tabla, indice, rango=False) -> list:
+    """
+    Full scan (type=ALL) o filesort en cualquier tabla del plan; `tabla`
+    debe leerse por `indice` y, con rango=True, con un range scan.
+    """
+    problemas = []
+    for fila in filas:
+        if fila.get("type") == "ALL":
+            problemas.append(f"{fila.get('table')}: full scan (type=ALL)")
+        if "filesort" in (fila.get("Extra") or ""):
+            problemas.append(f"{fila.get('table')}: Using filesort")
+
+    principal = next((f for f in filas if f.get("table") == tabla), None)
+    if principal is None:
+        return problemas + [f"{tabla}: no aparece en el plan"]
+    if principal.get("key") != indice:
+        problemas.append(f"{tabla}: usa {principal.get('key')}, se esperaba {indice}")
+    if rango and principal.get("type") != "range":
+        problemas.append(f"{tabla}: sin range scan (type={principal.get('type')})")
+    return problemas
+
+
+def revisar_planes():
+    """Produce (nombre, filas de EXPLAIN, problemas) por cada chequeo."""
+    for planes, rango in ((PLANES, False), (PLANES_RANGO, True)):
+        for nombre, tabla, indice, explain in planes:
+            filas = explain()
+            yield nombre, filas, problemas_del_plan(filas, tabla, indice, rango)
@@ -0,0 +1,261 @@
+# core/services/export_job_service.py
+"""
+Trabajos de exportación en segundo plano (sin broker externo).
+
+- El id del trabajo es un hash de (recurso, formato, filtros normalizados):
+  pedir la misma exportación dos veces devuelve el mismo trabajo, y el
+  mismo archivo mientras no pasen EXPORT_TTL_SEGUNDOS desde que terminó.
+- Un ThreadPoolExecutor local (EXPORT_WORKERS hilos por proceso) genera el
+  archivo en EXPORT_DIR. El estado se guarda en un .json junto al archivo,
+  así que cualquier worker de gunicorn puede consultarlo y servirlo.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from core.services import bulk_export_service
+from core.services.purchase_export_service import PurchaseExportService
+from core.services.purchase_filter_service import FiltroCompras, ids_compras
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = "PENDIENTE"
+PROCESANDO = "PROCESANDO"
+LISTO = "LISTO"
+ERROR = "ERROR"
+
+_ID_VALIDO = re.compile(r"[0-9a-f]{32}")
+
+
+class ExportJobError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Exportador:
+    generar: object  # fn(filtros: dict, destino: archivo binario) -> None
+    extension: str
+    content_type: str
+    filtros: tuple  # parámetros que forman parte de la llave del trabajo
+    # fn(params) -> dict canónico de filtros; ExportFormatError si no son
+    # válidos (se rechazan al encolar, no en el worker)
+    normalizar: object
+
+
+def _compras_xlsx(filtros, destino):
+    filtro = FiltroCompras.desde_params(filtros)
+    PurchaseExportService.generar_excel(
+        filtro.queryset(), destino, ids=ids_compras(filtro)
+    )
+
+
+_FILTROS_COMPRAS = ("proveedor_id", "bodega_id", "estado", "fecha_desde", "fecha_hasta")
+
+EXPORTADORES = {
+    ("compras", "xlsx"): Exportador(
+        generar=_compras_xlsx,
+        extension="xlsx",
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filtros=_FILTROS_COMPRAS,
+        normalizar=partial(bulk_export_service.normalizar_filtros, "compras"),
+    ),
+}
+
+# CSV (gzip), JSON lines y Parquet de compras, ventas, pedidos y kardex
+for _recurso, _fuente in bulk_export_service.FUENTES.items():
+    for _formato, _fmt in bulk_export_service.FORMATOS.items():
+        EXPORTADORES[(_recurso, _formato)] = Exportador(
+            generar=partial(bulk_export_service.exportar_a_archivo, _recurso, _formato),
+            extension=_fmt.extension,
+            content_type=_fmt.content_type,
+            filtros=_fuente.filtros,
+            normalizar=partial(bulk_export_service.normalizar_filtros, _recurso),
+        )
+
+
+# ---------------------------------------------------------------------
+# Almacenamiento del estado (un .json por trabajo)
+# ---------------------------------------------------------------------
+def _directorio() -> Path:
+    d = Path(settings.EXPORT_DIR)
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _ruta_estado(job_id: str) -> Path:
+    return _directorio() / f"{job_id}.json"
+
+
+def ruta_archivo(estado: dict) -> Path:
+    return _directorio() / estado["archivo"]
+
+
+def obtener_estado(job_id: str) -> dict | None:
+    if not _ID_VALIDO.fullmatch(job_id or ""):
+        return None
+    try:
+        return json.loads(_ruta_estado(job_id).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _guardar_estado(estado: dict) -> None:
+    ruta = _ruta_estado(estado["id"])
+    tmp = ruta.parent / f"{ruta.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp.write_text(json.dumps(estado))
+    os.replace(tmp, ruta)
+
+
+def _vigente(estado: dict | None, ahora: float) -> bool:
+    """True si el trabajo se puede reutilizar en lugar de lanzar otro."""
+    if not estado:
+        return False
+    if estado["estado"] == LISTO:
+        return (
+            ahora - estado["terminado"] < settings.EXPORT_TTL_SEGUNDOS
+            and ruta_archivo(estado).exists()
+        )
+    if estado["estado"] in (PENDIENTE, PROCESANDO):
+        # Si el proceso que lo generaba murió, se relanza pasado el timeout
+        return ahora - estado["creado"] < settings.EXPORT_TIMEOUT_SEGUNDOS
+    return False
+
+
+# ---------------------------------------------------------------------
+# Cola
+# ---------------------------------------------------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.EXPORT_WORKERS, thread_name_prefix="export"
+            )
+        return _pool
+
+
+def clave_trabajo(recurso: str, formato: str, filtros: dict) -> str:
+    canonico = json.dumps(
+        {"recurso": recurso, "formato": formato, "filtros": filtros},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonico.encode()).hexdigest()[:32]
+
+
+def encolar(recurso: str, formato: str, params) -> dict:
+    """
+    Encola la exportación (o reutiliza una igual en curso o terminada) y
+    devuelve su estado: {id, estado, recurso, formato, filtros, ...}.
+    """
+    exportador = EXPORTADORES.get((recurso, formato))
+    if exportador is None:
+        raise ExportJobError(f"Exportación no soportada: {recurso} / {formato}.")
+    if formato in bulk_export_service.FORMATOS:
+        try:
+            bulk_export_service.validar(recurso, formato)
+        except bulk_export_service.ExportFormatError as e:
+            raise ExportJobError(str(e))
+
+    try:
+        filtros = exportador.normalizar(params)
+    except bulk_export_service.ExportFormatError as e:
+        raise ExportJobError(str(e))
+    job_id = clave_trabajo(recurso, formato, filtros)
+    ahora = time.time()
+
+    estado = obtener_estado(job_id)
+    if _vigente(estado, ahora):
+        return estado
+
+    # Candado entre procesos para no lanzar dos veces el mismo trabajo
+    candado = _directorio() / f"{job_id}.lock"
+    try:
+        fd = os.open(candado, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return obtener_estado(job_id) or {"id": job_id, "estado": PENDIENTE}
+    try:
+        estado = obtener_estado(job_id)
+        if _vigente(estado, ahora):
+            return estado
+        estado = {
+            "id": job_id,
+            "estado": PENDIENTE,
+            "recurso": recurso,
+            "formato": formato,
+            "filtros": filtros,
+            "archivo": f"{job_id}.{exportador.extension}",
+            "creado": ahora,
+            "terminado": None,
+            "bytes": None,
+            "error": None,
+        }
+        _guardar_estado(estado)
+    finally:
+        os.close(fd)
+        os.unlink(candado)
+
+    _executor().submit(_ejecutar, estado, exportador)
+    purgar_vencidos()
+    return estado
+
+
+def _ejecutar(estado: dict, exportador: Exportador) -> None:
+    t0 = time.perf_counter()
+    estado = dict(estado, estado=PROCESANDO)
+    _guardar_estado(estado)
+    final = ruta_archivo(estado)
+    tmp = final.with_suffix(final.suffix + ".tmp")
+    try:
+        with open(tmp, "wb") as destino:
+            exportador.generar(estado["filtros"], destino)
+        os.replace(tmp, final)
+        estado.update(estado=LISTO, terminado=time.time(), bytes=final.stat().st_size)
+        logger.info(
+            "exportación %s %s/%s bytes=%s ms=%.0f",
+            estado["id"],
+            estado["recurso"],
+            estado["formato"],
+            estado["bytes"],
+            (time.perf_counter() - t0) * 1000,
+        )
+    except Exception as e:
+        logger.exception("exportación %s falló", estado["id"])
+        tmp.unlink(missing_ok=True)
+        estado.update(estado=ERROR, terminado=time.time(), error=str(e))
+    finally:
+        # El hilo abre su propia conexión a la BD; se cierra al terminar
+        connections.close_all()
+    _guardar_estado(estado)
+
+
+def purgar_vencidos() -> int:
+    """Borra archivos y estados terminados hace más de EXPORT_TTL_SEGUNDOS."""
+    ahora = time.time()
+    borrados = 0
+    for ruta in _directorio().glob("*.json"):
+        estado = obtener_estado(ruta.stem)
+        if not estado or estado["estado"] not in (LISTO, ERROR):
+            continue
+        if ahora - estado["terminado"] < settings.EXPORT_TTL_SEGUNDOS:
+            continue
+        ruta_archivo(estado).unlink(missing_ok=True)
+        ruta.unlink(missing_ok=True)
+        borrados += 1
+    return borrados
@@ -2,7 +2,7 @@
 from decimal import Decimal
 from django.utils import timezone
 from django.db import transaction, connection
-
+from rest_framework.exceptions import ValidationError
 
 from core.models import (
     MovimientoInventario,
@@ -14,6 +14,9 @@ from core.models import (
     Venta,
 )
 
+# Filas por sentencia en las escrituras masivas (bulk_create / upsert)
+LOTE_INVENTARIO = 1000
+
 
 @transaction.atomic
 def ingreso_inventario(*, bodega_destino_id: int, items: list, usuario_id: int):
@@ -120,60 +123,172 @@ class InventoryService:
 
         return movimiento
 
-    ## revertir_compra
+    ## registrar_entradas_compra
     @staticmethod
     @transaction.atomic
-    def revertir_compra(
+    def registrar_entradas_compra(
         *,
         compra: Compra,
+        lineas: list,
         usuario: Usuario,
-    ):
+    ) -> None:
         """
-        Reversa total de la compra:
-        - Por cada movimiento de tipo COMPRA ligado a esta compra,
-          crea un movimiento inverso (tipo AJUSTE, salida de bodega_destino)
-        - Resta existencias en la tabla existencia.
+        Versión por lotes de registrar_entrada_compra para toda la compra.
+        `lineas` es una lista de (producto_id, cantidad, costo_unit).
 
-        Asume que NO se valida si habrá existencias negativas (eso puede agregarse después).
+        - Movimientos COMPRA con bulk_create (LOTE_INVENTARIO por INSERT)
+        - Existencias con un INSERT ... ON DUPLICATE KEY UPDATE por lote de
+          productos (cantidades sumadas por producto, en orden de id para
+          tomar los locks siempre en el mismo orden)
         """
+        referencia = f"COMPRA #{compra.id} DOC: {compra.no_documento}"
+        MovimientoInventario.objects.bulk_create(
+            [
+                MovimientoInventario(
+                    fecha=compra.fecha,
+                    tipo="COMPRA",
+                    bodega_origen=None,
+                    bodega_destino_id=compra.bodega_id,
+                    producto_id=producto_id,
+                    cantidad=cantidad,
+                    costo_unit=costo_unit,
+                    referencia=referencia,
+                    usuario=usuario,
+                    compra=compra,
+                )
+                for producto_id, cantidad, costo_unit in lineas
+            ],
+            batch_size=LOTE_INVENTARIO,
+        )
 
-        # Traer todos los movimientos de inventario asociados a la compra
-        movimientos = MovimientoInventario.objects.filter(compra=compra, tipo="COMPRA")
-
-        for mov in movimientos:
-            bodega = mov.bodega_destino
-            producto = mov.producto
-            cantidad = Decimal(mov.cantidad)
-
-            if bodega is None:
-                # Por seguridad, si no hay bodega_destino, lo saltamos
-                continue
-
-            # 1. Crear movimiento inverso (salida)
-            MovimientoInventario.objects.create(
-                fecha=timezone.now(),
-                tipo="AJUSTE",  # usamos AJUSTE como reversa de COMPRA
-                bodega_origen=bodega,
-                bodega_destino=None,
-                producto=producto,
-                cantidad=cantidad * Decimal("-1"),  # cantidad negativa
-                costo_unit=mov.costo_unit,
-                referencia=f"ANULACION COMPRA #{compra.id} DOC: {compra.no_documento}",
-                usuario=usuario,
-                compra=compra,
-            )
+        por_producto = {}
+        for producto_id, cantidad, _costo in lineas:
+            por_producto[producto_id] = por_producto.get(
+                producto_id, Decimal("0")
+            ) + Decimal(cantidad)
+
+        filas = [
+            (producto_id, compra.bodega_id, por_producto[producto_id])
+            for producto_id in sorted(por_producto)
+        ]
+        with connection.cursor() as cur:
+            for inicio in range(0, len(filas), LOTE_INVENTARIO):
+                # mysqlclient arma un solo INSERT multi-fila por lote
+                cur.executemany(
+                    """
+                    INSERT INTO existencia (producto_id, bodega_id, cantidad, reservado)
+                    VALUES (%s, %s, %s, 0)
+                    ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad)
+                    """,
+                    filas[inicio : inicio + LOTE_INVENTARIO],
+                )
 
-            # 2. Actualizar existencias (restar la cantidad)
-            try:
-                existencia = Existencia.objects.get(producto=producto, bodega=bodega)
-            except Existencia.DoesNotExist:
-                # Si no existe registro de existencia, no hay nada que restar
-                continue
+    ## revertir_compra
+    @staticmethod
+    @transaction.atomic
+    def revertir_compra(
+        *,
+        compra: Compra,
+        usuario: Usuario,
+        permitir_negativo: bool = False,
+    ) -> int:
+        """
+        Reversa total de la compra, en sentencias set-based:
+        - Un INSERT ... SELECT crea, por cada movimiento COMPRA ligado a la
+          compra, el movimiento inverso (tipo AJUSTE, salida de bodega_destino)
+        - Un UPDATE con JOIN resta de existencia lo comprado por producto
+
+        Antes de escribir, salvo permitir_negativo=True, bloquea las
+        existencias afectadas y valida que a ninguna le falte disponible
+        (cantidad - reservado): la reversa no puede dejar cantidad bajo lo
+        reservado por pedidos. Si hay productos ya consumidos o reservados
+        los reporta todos juntos en un solo error.
+        Los productos sin registro de existencia se omiten (no hay nada que
+        restar). Devuelve la cantidad de movimientos revertidos.
+        """
+        # Lo comprado por (producto, bodega): base del guard y del UPDATE
+        comprado = """
+            SELECT producto_id, bodega_destino_id, SUM(cantidad) AS cantidad
+            FROM movimientoinventario
+            WHERE compra_id = %s AND tipo = 'COMPRA'
+              AND bodega_destino_id IS NOT NULL
+            GROUP BY producto_id, bodega_destino_id
+        """
 
-            existencia.cantidad = (Decimal(existencia.cantidad) - cantidad).quantize(
-                Decimal("0.0001")
+        with connection.cursor() as cur:
+            if not permitir_negativo:
+                cur.execute(
+                    f"""
+                    SELECT e.producto_id, e.bodega_id, e.cantidad, e.reservado,
+                           t.cantidad
+                    FROM ({comprado}) t
+                    JOIN existencia e
+                      ON e.producto_id = t.producto_id
+                     AND e.bodega_id = t.bodega_destino_id
+                    ORDER BY e.producto_id, e.bodega_id
+                    FOR UPDATE
+                    """,
+                    [compra.id],
+                )
+                faltantes = [
+                    {
+                        "producto_id": int(producto_id),
+                        "bodega_id": int(bodega_id),
+                        "existencia": str(existencia),
+                        "reservado": str(reservado),
+                        "revertir": str(revertir),
+                    }
+                    for producto_id, bodega_id, existencia, reservado, revertir in (
+                        cur.fetchall()
+                    )
+                    if Decimal(existencia) - Decimal(reservado) < Decimal(revertir)
+                ]
+                if faltantes:
+                    raise ValidationError(
+                        {
+                            "detail": (
+                                "No se puede anular la compra: las existencias de "
+                                f"{len(faltantes)} producto(s) quedarían negativas "
+                                "o por debajo de lo reservado."
+                            ),
+                            "faltantes": faltantes,
+                        }
+                    )
+
+            # 1. Movimientos inversos (salida) en una sola sentencia
+            cur.execute(
+                """
+                INSERT INTO movimientoinventario
+                    (fecha, tipo, bodega_origen_id, bodega_destino_id, producto_id,
+                     cantidad, costo_unit, referencia, usuario_id, compra_id)
+                SELECT %s, 'AJUSTE', m.bodega_destino_id, NULL, m.producto_id,
+                       -m.cantidad, m.costo_unit, %s, %s, m.compra_id
+                FROM movimientoinventario m
+                WHERE m.compra_id = %s AND m.tipo = 'COMPRA'
+                  AND m.bodega_destino_id IS NOT NULL
+                """,
+                [
+                    timezone.now(),
+                    f"ANULACION COMPRA #{compra.id} DOC: {compra.no_documento}",
+                    usuario.id,
+                    compra.id,
+                ],
             )
-            existencia.save(update_fields=["cantidad"])
+            revertidos = cur.rowcount
+
+            # 2. Restar existencias (una fila por producto y bodega)
+            cur.execute(
+                f"""
+                UPDATE existencia e
+                JOIN ({comprado}) t
+                  ON e.producto_id = t.producto_id
+                 AND e.bodega_id = t.bodega_destino_id
+                SET e.cantidad = e.cantidad - t.cantidad
+                """,
+                [compra.id],
+            )
+
+        return revertidos
 
     ## registrar_salida_venta
     @staticmethod
@@ -0,0 +1,173 @@
+# core/services/mora_service.py
+"""
+Devengo diario de mora sobre cuotas vencidas.
+
+Por cada cuota vencida con saldo se devenga
+    mora = ROUND(LEAST(saldo_cuota, total_prog) * acuerdopago.mora_diaria, 2)
+y se suma a saldo_cuota (la base excluye la mora ya devengada, así que no
+se cobra mora sobre mora). registrar_pago_automatico reconoce esa parte del
+saldo como MORA y la cubre primero.
+
+Las cuotas se recorren por rangos de id (LOTE_MORA por transacción) con
+sentencias set-based. Idempotencia:
+- mora_devengo tiene PK (cuota_id, fecha): una fecha nunca se devenga dos
+  veces sobre la misma cuota;
+- solo se suman a saldo_cuota las filas con aplicado = 0, que se marcan en
+  la misma sentencia: volver a correr una fecha (p. ej. reiniciando su
+  mora_corrida) no suma otra vez la mora ya aplicada;
+- mora_corrida guarda el último id procesado de cada fecha en la misma
+  transacción del lote: si el proceso se cae, la siguiente corrida sigue
+  desde ahí; si la fecha ya terminó, no hace nada.
+Ver core/sql/005_mora_devengo.sql.
+"""
+
+import logging
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.services.cartera_service import refrescar_cuotas
+
+logger = logging.getLogger(__name__)
+
+LOTE_MORA = 5000
+
+
+def _iniciar_corrida(fecha):
+    """Crea (si no existe) la corrida de la fecha. Devuelve True si ya terminó."""
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            INSERT IGNORE INTO mora_corrida (fecha, ultimo_id, iniciada)
+            VALUES (%s, 0, %s)
+            """,
+            [fecha, timezone.now()],
+        )
+        cur.execute("SELECT terminada FROM mora_corrida WHERE fecha = %s", [fecha])
+        return cur.fetchone()[0] is not None
+
+
+@transaction.atomic
+def _devengar_lote(fecha, lote: int):
+    """
+    Procesa el siguiente rango de ids de la corrida. Devuelve las métricas
+    del lote o None si ya no quedan cuotas.
+    """
+    t0 = time.perf_counter()
+    with connection.cursor() as cur:
+        # La fila de la corrida serializa a dos procesos sobre la misma fecha
+        cur.execute(
+            "SELECT ultimo_id FROM mora_corrida WHERE fecha = %s FOR UPDATE",
+            [fecha],
+        )
+        desde = int(cur.fetchone()[0])
+
+        cur.execute(
+            """
+            SELECT MAX(id) FROM (
+                SELECT id FROM cuota WHERE id > %s ORDER BY id LIMIT %s
+            ) t
+            """,
+            [desde, lote],
+        )
+        hasta = cur.fetchone()[0]
+        if hasta is None:
+            cur.execute(
+                "UPDATE mora_corrida SET terminada = %s WHERE fecha = %s",
+                [timezone.now(), fecha],
+            )
+            return None
+        hasta = int(hasta)
+
+        cur.execute(
+            """
+            INSERT IGNORE INTO mora_devengo (cuota_id, fecha, base, monto)
+            SELECT c.id, %s, LEAST(c.saldo_cuota, c.total_prog),
+                   ROUND(LEAST(c.saldo_cuota, c.total_prog) * a.mora_diaria, 2)
+            FROM cuota c
+            JOIN acuerdopago a ON a.id = c.acuerdo_id
+            WHERE c.id > %s AND c.id <= %s
+              AND c.fecha_venc < %s
+              AND c.saldo_cuota > 0
+              AND c.estado <> 'PAGADA'
+              AND a.mora_diaria > 0
+              AND ROUND(LEAST(c.saldo_cuota, c.total_prog) * a.mora_diaria, 2) > 0
+            """,
+            [fecha, desde, hasta, fecha],
+        )
+        devengadas = cur.rowcount
+
+        monto = 0
+        cuota_ids = []
+        if devengadas:
+            # Solo lo que aún no se sumó (las filas de este lote): las de
+            # una corrida anterior de la fecha ya están en saldo_cuota
+            cur.execute(
+                """
+                SELECT cuota_id, monto FROM mora_devengo
+                WHERE fecha = %s AND cuota_id > %s AND cuota_id <= %s
+                  AND aplicado = 0
+                """,
+                [fecha, desde, hasta],
+            )
+            filas = cur.fetchall()
+            cuota_ids = [int(r[0]) for r in filas]
+            monto = sum(r[1] for r in filas)
+            cur.execute(
+                """
+                UPDATE cuota c
+                JOIN mora_devengo m ON m.cuota_id = c.id AND m.fecha = %s
+                SET c.saldo_cuota = c.saldo_cuota + m.monto, m.aplicado = 1
+                WHERE m.cuota_id > %s AND m.cuota_id <= %s AND m.aplicado = 0
+                """,
+                [fecha, desde, hasta],
+            )
+
+        cur.execute(
+            """
+            UPDATE mora_corrida
+            SET ultimo_id = %s, cuotas = cuotas + %s, monto = monto + %s
+            WHERE fecha = %s
+            """,
+            [hasta, devengadas, monto, fecha],
+        )
+
+    if cuota_ids:
+        refrescar_cuotas(cuota_ids)
+
+    return {
+        "desde_id": desde + 1,
+        "hasta_id": hasta,
+        "cuotas": devengadas,
+        "monto": monto,
+        "ms": (time.perf_counter() - t0) * 1000,
+    }
+
+
+def devengar_mora(fecha=None, lote: int = LOTE_MORA):
+    """
+    Devenga la mora de `fecha` (por defecto, hoy en la zona del sistema).
+    Generador: produce las métricas de cada lote (rango de ids, cuotas
+    devengadas, monto, ms). Si la fecha ya se devengó completa, no produce
+    nada.
+    """
+    fecha = fecha or timezone.localdate()
+    if _iniciar_corrida(fecha):
+        logger.info("mora fecha=%s ya devengada", fecha)
+        return
+
+    while True:
+        metricas = _devengar_lote(fecha, lote)
+        if metricas is None:
+            return
+        logger.info(
+            "mora fecha=%s ids=%s..%s cuotas=%s monto=%s ms=%.0f",
+            fecha,
+            metricas["desde_id"],
+            metricas["hasta_id"],
+            metricas["cuotas"],
+            metricas["monto"],
+            metricas["ms"],
+        )
+        yield metricas
@@ -0,0 +1,315 @@
+# core/services/order_import_service.py
+"""
+Importación masiva de pedidos (EDI / CSV / JSON lines).
+
+El archivo se procesa en streaming, por lotes de IMPORT_LOTE_PEDIDOS
+pedidos: la memoria depende del tamaño del lote y del catálogo de la
+bodega, no del tamaño del archivo.
+"""
+
+import csv
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from core.services.order_service import (
+    PedidoError,
+    StockError,
+    _cantidades_por_producto,
+    _get_usuario_id,
+    _normalizar_items,
+    _validar_stock,
+)
+
+IMPORT_LOTE_PEDIDOS = 500
+
+COLUMNAS_CSV = (
+    "ref",
+    "cliente_id",
+    "bodega_id",
+    "producto_id",
+    "cantidad",
+    "precio_unitario",
+)
+
+
+# ---------------------------------------------------------------------
+# Lectores: cada uno produce dicts {ref, linea, cliente_id, bodega_id, items}
+# ---------------------------------------------------------------------
+def leer_csv(archivo):
+    """
+    Una fila por línea de pedido; las filas consecutivas con la misma `ref`
+    forman un pedido (cliente_id y bodega_id se toman de la primera fila).
+    """
+    lector = csv.DictReader(archivo)
+    faltan = [c for c in COLUMNAS_CSV if c not in (lector.fieldnames or [])]
+    if faltan:
+        raise PedidoError(f"Columnas faltantes en el CSV: {', '.join(faltan)}.")
+
+    actual = None
+    for n, fila in enumerate(lector, start=2):
+        ref = (fila["ref"] or "").strip()
+        if actual is None or actual["ref"] != ref:
+            if actual is not None:
+                yield actual
+            actual = {
+                "ref": ref,
+                "linea": n,
+                "cliente_id": fila["cliente_id"],
+                "bodega_id": fila["bodega_id"],
+                "items": [],
+            }
+        actual["items"].append(
+            {
+                "producto_id": fila["producto_id"],
+                "cantidad": fila["cantidad"],
+                "precio_unitario": fila["precio_unitario"],
+            }
+        )
+    if actual is not None:
+        yield actual
+
+
+def leer_jsonl(archivo):
+    """
+    Un pedido por línea:
+    {"ref": "...", "cliente_id": 1, "bodega_id": 1, "items": [{...}, ...]}
+    """
+    for n, linea in enumerate(archivo, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            data = json.loads(linea, parse_float=Decimal)
+        except ValueError as e:
+            yield {"ref": None, "linea": n, "error": f"JSON inválido: {e}"}
+            continue
+        if not isinstance(data, dict):
+            yield {"ref": None, "linea": n, "error": "Se esperaba un objeto JSON."}
+            continue
+        yield {
+            "ref": str(data.get("ref") or ""),
+            "linea": n,
+            "cliente_id": data.get("cliente_id"),
+            "bodega_id": data.get("bodega_id"),
+            "items": data.get("items") or [],
+        }
+
+
+LECTORES = {"csv": leer_csv, "jsonl": leer_jsonl}
+
+
+# ---------------------------------------------------------------------
+# Procesamiento por lotes
+# ---------------------------------------------------------------------
+class _SnapshotExistencias:
+    """
+    Existencias por bodega leídas UNA vez por importación
+    (una consulta por bodega, no por pedido ni por línea).
+    """
+
+    def __init__(self):
+        self._por_bodega = {}
+
+    def de_bodega(self, bodega_id: int) -> dict:
+        if bodega_id not in self._por_bodega:
+            with connection.cursor() as cur:
+                cur.execute(
+                    "SELECT producto_id, cantidad FROM existencia WHERE bodega_id = %s",
+                    [bodega_id],
+                )
+                self._por_bodega[bodega_id] = {
+                    int(pid): Decimal(str(cant)) for pid, cant in cur.fetchall()
+                }
+        return self._por_bodega[bodega_id]
+
+
+def _ids_existentes(tabla: str, ids) -> set:
+    ids = sorted(set(ids))
+    if not ids:
+        return set()
+    marcas = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cur:
+        cur.execute(f"SELECT id FROM {tabla} WHERE id IN ({marcas})", ids)
+        return {int(r[0]) for r in cur.fetchall()}
+
+
+def _preparar(pedido: dict):
+    """
+    Valida un pedido leído del archivo.
+    Devuelve (cliente_id, bodega_id, filas, total) o lanza PedidoError.
+    """
+    if pedido.get("error"):
+        raise PedidoError(pedido["error"])
+    try:
+        cliente_id = int(pedido["cliente_id"])
+        bodega_id = int(pedido["bodega_id"])
+        filas = _normalizar_items(pedido["items"])
+    except (KeyError, TypeError, ValueError, InvalidOperation) as e:
+        raise PedidoError(f"Datos inválidos: {e!r}") from e
+
+    if not filas:
+        raise PedidoError("El pedido requiere al menos un ítem.")
+    if any(qty <= 0 for _pid, qty, _pu, _sub in filas):
+        raise PedidoError("Las cantidades deben ser mayores que cero.")
+
+    total = sum((sub for _pid, _qty, _pu, sub in filas), Decimal("0.00"))
+    return cliente_id, bodega_id, filas, total
+
+
+def _error(pedido: dict, e: Exception) -> dict:
+    res = {"ref": pedido.get("ref"), "linea": pedido.get("linea"), "ok": False}
+    res["detail"] = str(e)
+    if isinstance(e, StockError):
+        res["faltantes"] = e.faltantes
+    return res
+
+
+def _insertar_pedidos(cur, cabeceras: list, detalles: list, marca: str) -> list:
+    """
+    Inserta las cabeceras con un INSERT multi-fila y luego todos los
+    detalles (`detalles[k]` son las filas de la cabecera k). Devuelve los
+    ids de los pedidos en el orden de `cabeceras`.
+    """
+    cur.executemany(
+        """
+        INSERT INTO pedido (fecha, total, cliente_id, usuario_id, bodega_id, estado, observaciones, creado_por)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        cabeceras,
+    )
+    # Un INSERT multi-fila asigna ids crecientes en el orden de las filas,
+    # pero no necesariamente consecutivos: se releen por la marca del import.
+    cur.execute("SELECT LAST_INSERT_ID()")
+    primer_id = int(cur.fetchone()[0])
+    cur.execute(
+        """
+        SELECT id FROM pedido
+        WHERE id >= %s AND creado_por = %s
+        ORDER BY id
+        LIMIT %s
+        """,
+        [primer_id, marca, len(cabeceras)],
+    )
+    ids = [int(r[0]) for r in cur.fetchall()]
+
+    cur.executemany(
+        """
+        INSERT INTO pedidodetalle (pedido_id, producto_id, cantidad, precio_unitario, subtotal)
+        VALUES (%s, %s, %s, %s, %s)
+        """,
+        [
+            (pedido_id, pid, qty, pu, sub)
+            for pedido_id, filas in zip(ids, detalles)
+            for pid, qty, pu, sub in filas
+        ],
+    )
+    return ids
+
+
+def _procesar_lote(lote: list, usuario_id: int, snapshot, marca: str) -> list:
+    """
+    Valida e inserta un lote de pedidos:
+    - Clientes y bodegas se verifican con una consulta IN cada uno.
+    - El stock se valida contra el snapshot de la bodega.
+    - Cabeceras y detalles se insertan con un INSERT multi-fila cada uno.
+    Devuelve un resultado por pedido, en el mismo orden del lote.
+    """
+    resultados = [None] * len(lote)
+    preparados = {}
+    for i, pedido in enumerate(lote):
+        try:
+            preparados[i] = _preparar(pedido)
+        except PedidoError as e:
+            resultados[i] = _error(pedido, e)
+
+    clientes = _ids_existentes("cliente", (p[0] for p in preparados.values()))
+    bodegas = _ids_existentes("bodega", (p[1] for p in preparados.values()))
+
+    validos = []
+    for i, (cliente_id, bodega_id, filas, total) in preparados.items():
+        try:
+            if cliente_id not in clientes:
+                raise PedidoError(f"Cliente {cliente_id} no existe.")
+            if bodega_id not in bodegas:
+                raise PedidoError(f"Bodega {bodega_id} no existe.")
+            _validar_stock(
+                _cantidades_por_producto(filas),
+                snapshot.de_bodega(bodega_id),
+                bodega_id,
+            )
+        except (PedidoError, StockError) as e:
+            resultados[i] = _error(lote[i], e)
+        else:
+            validos.append(i)
+
+    if validos:
+        now = timezone.now()
+        try:
+            with transaction.atomic(), connection.cursor() as cur:
+                ids = _insertar_pedidos(
+                    cur,
+                    [
+                        (
+                            now,
+                            preparados[i][3],
+                            preparados[i][0],
+                            usuario_id,
+                            preparados[i][1],
+                            "ABIERTO",
+                            f"IMPORTACION REF {lote[i]['ref']}"[:255],
+                            marca,
+                        )
+                        for i in validos
+                    ],
+                    [preparados[i][2] for i in validos],
+                    marca,
+                )
+        except DatabaseError as e:
+            for i in validos:
+                resultados[i] = _error(lote[i], e)
+        else:
+            for i, pedido_id in zip(validos, ids):
+                resultados[i] = {
+                    "ref": lote[i]["ref"],
+                    "linea": lote[i]["linea"],
+                    "ok": True,
+                    "pedido_id": pedido_id,
+                }
+
+    return resultados
+
+
+def importar_pedidos(archivo, formato: str, username: str, lote=IMPORT_LOTE_PEDIDOS):
+    """
+    Importa pedidos desde un archivo de texto abierto (`csv` o `jsonl`).
+    Devuelve un generador con un resultado por pedido:
+    {ref, linea, ok, pedido_id} o {ref, linea, ok: False, detail[, faltantes]}.
+    Cada lote se confirma en su propia transacción; un pedido inválido no
+    detiene el resto.
+    """
+    lector = LECTORES.get(formato)
+    if lector is None:
+        raise PedidoError(f"Formato no soportado: {formato!r} (use csv o jsonl).")
+    usuario_id = _get_usuario_id(username)
+    return _importar(lector(archivo), usuario_id, lote)
+
+
+def _importar(registros, usuario_id: int, tam_lote: int):
+    snapshot = _SnapshotExistencias()
+    marca = f"IMPORT {uuid.uuid4().hex[:12]}"
+    pendientes = []
+    try:
+        for pedido in registros:
+            pendientes.append(pedido)
+            if len(pendientes) >= tam_lote:
+                yield from _procesar_lote(pendientes, usuario_id, snapshot, marca)
+                pendientes = []
+    except PedidoError as e:
+        # Error de formato del archivo completo (ej. columnas del CSV)
+        yield {"ref": None, "linea": None, "ok": False, "detail": str(e)}
+    if pendientes:
+        yield from _procesar_lote(pendientes, usuario_id, snapshot, marca)
@@ -1,13 +1,30 @@
 # core/services/order_service.py
+import base64
+import json
+import logging
+import time
+from datetime import datetime, timedelta
 from decimal import Decimal
 from django.db import connection, transaction
 from django.utils import timezone
 
+from core.services.date_range import inicio_del_dia
+from core.services.reservation_service import liberar_reservas_pedido
+from core.services.usuario_service import buscar_usuario_id
+
+logger = logging.getLogger(__name__)
+
 
 class StockError(Exception):
-    """Errores relacionados con existencias / stock."""
+    """Errores relacionados con existencias / stock.
 
-    ...
+    `faltantes` lista todos los productos sin stock suficiente
+    (producto_id, existencia, solicitado) cuando la validación es por lote.
+    """
+
+    def __init__(self, mensaje, faltantes=None):
+        super().__init__(mensaje)
+        self.faltantes = faltantes or []
 
 
 class PedidoError(Exception):
@@ -25,63 +42,193 @@ def _get_usuario_id(username: str) -> int:
     """
     Obtiene el id de la tabla `usuario` a partir del username.
     """
-    with connection.cursor() as cur:
-        cur.execute(
-            "SELECT id FROM usuario WHERE username=%s LIMIT 1",
-            [username],
-        )
-        row = cur.fetchone()
-    if not row:
+    usuario_id = buscar_usuario_id(username)
+    if usuario_id is None:
         raise PedidoError(
             f"Usuario de negocio no encontrado para username={username!r}"
         )
-    return int(row[0])
+    return usuario_id
+
 
+_CAMPOS_CABECERA = [
+    "id",
+    "fecha",
+    "total",
+    "cliente_id",
+    "usuario_id",
+    "bodega_id",
+    "estado",
+]
+_CAMPOS_ITEM = ["producto_id", "cantidad", "precio_unitario", "subtotal"]
+_CAMPOS_PRODUCTO = ["producto_sku", "producto_nombre", "impuesto_id", "impuesto_tasa"]
 
-def obtener_pedido(pedido_id: int):
+# Tope de ids por consulta IN (...) al hidratar varios pedidos
+OBTENER_PEDIDOS_LOTE = 500
+
+
+def obtener_pedidos(pedido_ids, con_productos: bool = False) -> list:
     """
-    Devuelve un dict con cabecera + detalle del pedido.
+    Devuelve cabecera + detalle de varios pedidos con una consulta JOIN por
+    lote de OBTENER_PEDIDOS_LOTE ids (pedido LEFT JOIN pedidodetalle).
+    - con_productos=True agrega a cada ítem sku, nombre e impuesto del producto
+      (evita una llamada a catálogos por línea).
+    Respeta el orden de `pedido_ids`; los ids inexistentes se omiten.
     """
+    ids = list(dict.fromkeys(int(i) for i in pedido_ids))
+    if not ids:
+        return []
+
+    columnas = (
+        "p.id, p.fecha, p.total, p.cliente_id, p.usuario_id, p.bodega_id, p.estado, "
+        "d.producto_id, d.cantidad, d.precio_unitario, d.subtotal"
+    )
+    joins = "LEFT JOIN pedidodetalle d ON d.pedido_id = p.id"
+    campos_item = list(_CAMPOS_ITEM)
+    if con_productos:
+        columnas += ", pr.sku, pr.nombre, pr.impuesto_id, i.tasa"
+        joins += """
+            LEFT JOIN producto pr ON pr.id = d.producto_id
+            LEFT JOIN impuesto i ON i.id = pr.impuesto_id
+        """
+        campos_item += _CAMPOS_PRODUCTO
+
+    n_cab = len(_CAMPOS_CABECERA)
+    pedidos = {}
     with connection.cursor() as cur:
-        cur.execute(
-            """
-            SELECT id, fecha, total, cliente_id, usuario_id, bodega_id, estado
-            FROM pedido
-            WHERE id = %s
-            """,
-            [pedido_id],
-        )
-        row = cur.fetchone()
-        if not row:
-            return None
-
-        head = dict(
-            zip(
-                [
-                    "id",
-                    "fecha",
-                    "total",
-                    "cliente_id",
-                    "usuario_id",
-                    "bodega_id",
-                    "estado",
-                ],
-                row,
+        for inicio in range(0, len(ids), OBTENER_PEDIDOS_LOTE):
+            lote = ids[inicio : inicio + OBTENER_PEDIDOS_LOTE]
+            marcas = ", ".join(["%s"] * len(lote))
+            cur.execute(
+                f"""
+                SELECT {columnas}
+                FROM pedido p
+                {joins}
+                WHERE p.id IN ({marcas})
+                ORDER BY p.id, d.id
+                """,
+                lote,
             )
-        )
+            for row in cur.fetchall():
+                pid = row[0]
+                head = pedidos.get(pid)
+                if head is None:
+                    head = dict(zip(_CAMPOS_CABECERA, row[:n_cab]))
+                    head["items"] = []
+                    pedidos[pid] = head
+                # LEFT JOIN: un pedido sin detalle trae una fila con NULLs
+                if row[n_cab] is not None:
+                    head["items"].append(dict(zip(campos_item, row[n_cab:])))
 
-        cur.execute(
-            """
-            SELECT producto_id, cantidad, precio_unitario, subtotal
-            FROM pedidodetalle
-            WHERE pedido_id = %s
-            """,
-            [pedido_id],
-        )
-        items = _fetchall_dict(cur)
+    return [pedidos[i] for i in ids if i in pedidos]
+
+
+def obtener_pedido(pedido_id: int, con_productos: bool = False):
+    """
+    Devuelve un dict con cabecera + detalle del pedido (una sola consulta).
+    """
+    pedidos = obtener_pedidos([pedido_id], con_productos=con_productos)
+    return pedidos[0] if pedidos else None
+
+
+# ---------------------------------------------------------------------
+# Helpers de lote (stock + detalle)
+# ---------------------------------------------------------------------
+def _normalizar_items(items: list) -> list:
+    """
+    Convierte los ítems del request en tuplas
+    (producto_id, cantidad, precio_unitario, subtotal).
+    """
+    filas = []
+    for it in items:
+        pid = int(it["producto_id"])
+        qty = Decimal(it["cantidad"])
+        pu = Decimal(it["precio_unitario"])
+        sub = (qty * pu).quantize(Decimal("0.01"))
+        filas.append((pid, qty, pu, sub))
+    return filas
+
+
+def _cantidades_por_producto(filas: list) -> dict:
+    """
+    Suma las cantidades solicitadas por producto (un producto puede
+    venir en más de una línea).
+    """
+    solicitado = {}
+    for pid, qty, _pu, _sub in filas:
+        solicitado[pid] = solicitado.get(pid, Decimal("0")) + qty
+    return solicitado
+
+
+def _leer_existencias(cur, bodega_id: int, producto_ids, for_update=False) -> dict:
+    """
+    Lee `existencia.cantidad` de todos los productos en UNA sola consulta.
+    Con for_update=True bloquea las filas en orden de producto_id para que
+    dos transacciones con productos en común no se bloqueen en cruz.
+    Devuelve {producto_id: cantidad}; los productos sin registro no aparecen.
+    """
+    ids = sorted(set(producto_ids))
+    if not ids:
+        return {}
+
+    marcas = ", ".join(["%s"] * len(ids))
+    sql = f"""
+        SELECT producto_id, cantidad
+        FROM existencia
+        WHERE bodega_id = %s AND producto_id IN ({marcas})
+        ORDER BY producto_id
+    """
+    if for_update:
+        sql += " FOR UPDATE"
+
+    cur.execute(sql, [bodega_id, *ids])
+    return {int(pid): Decimal(str(cant)) for pid, cant in cur.fetchall()}
+
+
+def _validar_stock(solicitado: dict, existencias: dict, bodega_id: int):
+    """
+    Compara lo solicitado contra las existencias y reporta TODOS los
+    faltantes en un solo StockError (no se detiene en el primero).
+    """
+    faltantes = []
+    mensajes = []
+    for pid in sorted(solicitado):
+        qty = solicitado[pid]
+        if pid not in existencias:
+            faltantes.append(
+                {"producto_id": pid, "existencia": None, "solicitado": str(qty)}
+            )
+            mensajes.append(
+                f"Producto {pid}: no existe registro de stock en bodega {bodega_id}."
+            )
+            continue
+
+        cantidad = existencias[pid]
+        if qty > cantidad:
+            faltantes.append(
+                {
+                    "producto_id": pid,
+                    "existencia": str(cantidad),
+                    "solicitado": str(qty),
+                }
+            )
+            mensajes.append(f"Producto {pid}: existencia {cantidad}, solicitado {qty}.")
 
-    head["items"] = items
-    return head
+    if faltantes:
+        raise StockError(" ".join(mensajes), faltantes=faltantes)
+
+
+def _insertar_detalle(cur, pedido_id: int, filas: list):
+    """
+    Inserta todo el detalle con un solo executemany; el driver de MySQL lo
+    envía como un INSERT multi-fila (VALUES (...), (...), ...).
+    """
+    cur.executemany(
+        """
+        INSERT INTO pedidodetalle (pedido_id, producto_id, cantidad, precio_unitario, subtotal)
+        VALUES (%s, %s, %s, %s, %s)
+        """,
+        [(pedido_id, pid, qty, pu, sub) for pid, qty, pu, sub in filas],
+    )
 
 
 # ---------------------------------------------------------------------
@@ -91,157 +238,250 @@ def obtener_pedido(pedido_id: int):
 def crear_pedido(cliente_id: int, bodega_id: int, items: list, username: str) -> int:
     """
     Crea un pedido:
-    - Valida que haya existencia suficiente en `existencia` para cada item.
-    - Inserta cabecera en `pedido` (estado = 'PENDIENTE').
-    - Inserta detalle en `pedidodetalle`.
+    - Valida que haya existencia suficiente en `existencia` para todos los
+      ítems con una sola consulta IN (...); reporta todos los faltantes juntos.
+    - Inserta cabecera en `pedido` (estado = 'ABIERTO') con su total.
+    - Inserta el detalle en `pedidodetalle` con un INSERT multi-fila.
     NO modifica la tabla `existencia` (el consumo real se hará al facturar).
+
+    Round trips: usuario + existencias + cabecera + LAST_INSERT_ID + detalle,
+    sin importar la cantidad de líneas.
     """
     if not items:
         raise PedidoError("El pedido requiere al menos un ítem.")
 
     usuario_id = _get_usuario_id(username)
     now = timezone.now()
-    total = Decimal("0.00")
 
-    with connection.cursor() as cur:
-        # Validar stock actual para cada producto
-        for it in items:
-            pid = int(it["producto_id"])
-            qty = Decimal(it["cantidad"])
+    filas = _normalizar_items(items)
+    solicitado = _cantidades_por_producto(filas)
+    total = sum((sub for _pid, _qty, _pu, sub in filas), Decimal("0.00"))
 
-            cur.execute(
-                """
-                SELECT cantidad
-                FROM existencia
-                WHERE producto_id = %s AND bodega_id = %s
-                """,
-                [pid, bodega_id],
-            )
-            row = cur.fetchone()
-            if not row:
-                raise StockError(
-                    f"Producto {pid}: no existe registro de stock en bodega {bodega_id}."
-                )
-            cantidad = Decimal(str(row[0]))
-            if qty > cantidad:
-                raise StockError(
-                    f"Producto {pid}: existencia {cantidad}, solicitado {qty}."
-                )
+    with connection.cursor() as cur:
+        # Validar stock actual de todos los productos en una sola lectura
+        existencias = _leer_existencias(cur, bodega_id, solicitado.keys())
+        _validar_stock(solicitado, existencias, bodega_id)
 
-        # Insertar cabecera
+        # Insertar cabecera (el total ya se conoce, no hace falta un UPDATE)
         cur.execute(
             """
             INSERT INTO pedido (fecha, total, cliente_id, usuario_id, bodega_id, estado)
             VALUES (%s, %s, %s, %s, %s, %s)
             """,
-            [now, Decimal("0.00"), cliente_id, usuario_id, bodega_id, "ABIERTO"],
+            [now, total, cliente_id, usuario_id, bodega_id, "ABIERTO"],
         )
         cur.execute("SELECT LAST_INSERT_ID()")
         pedido_id = int(cur.fetchone()[0])
 
-        # Insertar detalle + acumular total
-        for it in items:
-            pid = int(it["producto_id"])
-            qty = Decimal(it["cantidad"])
-            pu = Decimal(it["precio_unitario"])
-            sub = (qty * pu).quantize(Decimal("0.01"))
-            total += sub
+        # Insertar detalle completo
+        _insertar_detalle(cur, pedido_id, filas)
 
-            cur.execute(
-                """
-                INSERT INTO pedidodetalle (pedido_id, producto_id, cantidad, precio_unitario, subtotal)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                [pedido_id, pid, qty, pu, sub],
-            )
+    return pedido_id
+
+
+# ---------------------------------------------------------------------
+# 2) Reemplazar / editar ítems del pedido (solo ABIERTO)
+# ---------------------------------------------------------------------
+def _bloquear_pedido_abierto(cur, pedido_id: int) -> int:
+    """
+    Bloquea la cabecera del pedido y valida que esté ABIERTO.
+    Devuelve el bodega_id del pedido.
+    """
+    cur.execute(
+        "SELECT estado, bodega_id FROM pedido WHERE id = %s FOR UPDATE",
+        [pedido_id],
+    )
+    row = cur.fetchone()
+    if not row:
+        raise PedidoError("Pedido no existe.")
+
+    estado, bodega_id = row
+    if estado != "ABIERTO":
+        raise PedidoError("Solo pedidos en estado ABIERTO pueden modificarse.")
+    return bodega_id
+
+
+def _leer_detalle(cur, pedido_id: int) -> list:
+    """
+    Detalle actual como tuplas (id, producto_id, cantidad, precio_unitario, subtotal).
+    """
+    cur.execute(
+        """
+        SELECT id, producto_id, cantidad, precio_unitario, subtotal
+        FROM pedidodetalle
+        WHERE pedido_id = %s
+        ORDER BY id
+        """,
+        [pedido_id],
+    )
+    return [
+        (int(did), int(pid), Decimal(str(qty)), Decimal(str(pu)), Decimal(str(sub)))
+        for did, pid, qty, pu, sub in cur.fetchall()
+    ]
+
+
+def _diff_detalle(actuales: list, nuevas: list):
+    """
+    Empareja las líneas actuales con las nuevas por producto_id (en orden
+    de aparición, por si un producto viene en más de una línea).
+    Devuelve (insertar, actualizar, eliminar):
+    - insertar: tuplas (producto_id, cantidad, precio_unitario, subtotal)
+    - actualizar: tuplas (detalle_id, cantidad, precio_unitario, subtotal)
+    - eliminar: ids de pedidodetalle
+    """
+    por_producto = {}
+    for linea in actuales:
+        por_producto.setdefault(linea[1], []).append(linea)
+
+    insertar, actualizar = [], []
+    for pid, qty, pu, sub in nuevas:
+        pendientes = por_producto.get(pid)
+        if not pendientes:
+            insertar.append((pid, qty, pu, sub))
+            continue
+
+        did, _pid, qty_act, pu_act, _sub_act = pendientes.pop(0)
+        if qty != qty_act or pu != pu_act:
+            actualizar.append((did, qty, pu, sub))
+
+    eliminar = [linea[0] for resto in por_producto.values() for linea in resto]
+    return insertar, actualizar, eliminar
+
+
+def _actualizar_lineas(cur, filas: list):
+    """
+    Actualiza varias líneas de pedidodetalle en un solo UPDATE con CASE.
+    filas: tuplas (detalle_id, cantidad, precio_unitario, subtotal).
+    """
+    casos = " ".join(["WHEN %s THEN %s"] * len(filas))
+    marcas = ", ".join(["%s"] * len(filas))
+    params = []
+    for col in (1, 2, 3):
+        for fila in filas:
+            params.extend([fila[0], fila[col]])
+    params.extend(fila[0] for fila in filas)
+
+    cur.execute(
+        f"""
+        UPDATE pedidodetalle
+        SET cantidad = CASE id {casos} END,
+            precio_unitario = CASE id {casos} END,
+            subtotal = CASE id {casos} END
+        WHERE id IN ({marcas})
+        """,
+        params,
+    )
+
+
+def _aplicar_cambios_detalle(cur, pedido_id: int, bodega_id: int, nuevas: list):
+    """
+    Lleva el detalle del pedido al estado `nuevas` tocando solo lo que cambió:
+    - Revalida stock únicamente de los productos cuya cantidad total subió.
+    - Un DELETE, un UPDATE (CASE) y un INSERT multi-fila como máximo.
+    - Recalcula el total de la cabecera.
+    """
+    actuales = _leer_detalle(cur, pedido_id)
 
-        # Actualizar total
+    antes = {}
+    for _did, pid, qty, _pu, _sub in actuales:
+        antes[pid] = antes.get(pid, Decimal("0")) + qty
+    despues = _cantidades_por_producto(nuevas)
+
+    subieron = {
+        pid: qty for pid, qty in despues.items() if qty > antes.get(pid, Decimal("0"))
+    }
+    if subieron:
+        existencias = _leer_existencias(cur, bodega_id, subieron.keys())
+        _validar_stock(subieron, existencias, bodega_id)
+
+    insertar, actualizar, eliminar = _diff_detalle(actuales, nuevas)
+
+    if eliminar:
+        marcas = ", ".join(["%s"] * len(eliminar))
         cur.execute(
-            "UPDATE pedido SET total = %s WHERE id = %s",
-            [total, pedido_id],
+            f"DELETE FROM pedidodetalle WHERE pedido_id = %s AND id IN ({marcas})",
+            [pedido_id, *eliminar],
         )
+    if actualizar:
+        _actualizar_lineas(cur, actualizar)
+    if insertar:
+        _insertar_detalle(cur, pedido_id, insertar)
 
-    return pedido_id
+    total = sum((sub for _pid, _qty, _pu, sub in nuevas), Decimal("0.00"))
+    cur.execute(
+        "UPDATE pedido SET total = %s WHERE id = %s",
+        [total, pedido_id],
+    )
 
 
-# ---------------------------------------------------------------------
-# 2) Reemplazar ítems del pedido (solo PENDIENTE)
-# ---------------------------------------------------------------------
 @transaction.atomic
 def reemplazar_items_pedido(pedido_id: int, items: list, username: str):
     """
-    Reemplaza COMPLETAMENTE los ítems de un pedido PENDIENTE.
-    - Vuelve a validar existencias.
-    - Borra el detalle anterior.
-    - Inserta el nuevo detalle y recalcula total.
+    Reemplaza COMPLETAMENTE los ítems de un pedido ABIERTO, pero aplicando
+    solo la diferencia contra el detalle actual:
+    - Las líneas iguales no se tocan (se conservan sus ids).
+    - Inserta, actualiza y elimina en sentencias por lote.
+    - Revalida existencias solo de los productos cuya cantidad subió.
     """
     if not items:
         raise PedidoError("Debes enviar al menos un ítem.")
 
     with connection.cursor() as cur:
-        # Bloquear cabecera
-        cur.execute(
-            "SELECT estado, bodega_id FROM pedido WHERE id = %s FOR UPDATE",
-            [pedido_id],
-        )
-        row = cur.fetchone()
-        if not row:
-            raise PedidoError("Pedido no existe.")
+        bodega_id = _bloquear_pedido_abierto(cur, pedido_id)
+        _aplicar_cambios_detalle(cur, pedido_id, bodega_id, _normalizar_items(items))
 
-        estado, bodega_id = row
-        if estado != "ABIERTO":
-            raise PedidoError("Solo pedidos en estado ABIERTO pueden confirmarse.")
+    return obtener_pedido(pedido_id)
 
-        # Validar stock con las nuevas cantidades
-        for it in items:
-            pid = int(it["producto_id"])
-            qty = Decimal(it["cantidad"])
-            cur.execute(
-                """
-                SELECT cantidad
-                FROM existencia
-                WHERE producto_id = %s AND bodega_id = %s
-                """,
-                [pid, bodega_id],
-            )
-            row = cur.fetchone()
-            if not row:
-                raise StockError(
-                    f"Producto {pid}: no existe registro de stock en bodega {bodega_id}."
-                )
-            cantidad = Decimal(str(row[0]))
-            if qty > cantidad:
-                raise StockError(
-                    f"Producto {pid}: existencia {cantidad}, solicitado {qty}."
-                )
 
-        # Limpiar detalle actual
-        cur.execute(
-            "DELETE FROM pedidodetalle WHERE pedido_id = %s",
-            [pedido_id],
-        )
+@transaction.atomic
+def editar_items_pedido(pedido_id: int, cambios: list, username: str):
+    """
+    Edición parcial (PATCH) del detalle de un pedido ABIERTO.
+    Cada cambio indica producto_id y la nueva cantidad total del producto:
+    - cantidad = 0 → se elimina el producto del pedido.
+    - producto ya en el pedido → se ajusta su línea (precio_unitario opcional).
+    - producto nuevo → se agrega (precio_unitario requerido).
+    Los productos no mencionados quedan igual.
+    """
+    if not cambios:
+        raise PedidoError("Debes enviar al menos un cambio.")
 
-        # Insertar nuevo detalle y recalcular total
-        total = Decimal("0.00")
-        for it in items:
-            pid = int(it["producto_id"])
-            qty = Decimal(it["cantidad"])
-            pu = Decimal(it["precio_unitario"])
-            sub = (qty * pu).quantize(Decimal("0.01"))
-            total += sub
+    with connection.cursor() as cur:
+        bodega_id = _bloquear_pedido_abierto(cur, pedido_id)
+        actuales = _leer_detalle(cur, pedido_id)
+
+        por_producto = {int(c["producto_id"]): c for c in cambios}
+        nuevas = []
+        vistos = set()
+        for _did, pid, qty, pu, sub in actuales:
+            cambio = por_producto.get(pid)
+            if cambio is None:
+                nuevas.append((pid, qty, pu, sub))
+                continue
+            if pid in vistos:
+                # El cambio define la cantidad total: las líneas extra se eliminan
+                continue
+            vistos.add(pid)
+            qty = Decimal(cambio["cantidad"])
+            if qty == 0:
+                continue
+            if cambio.get("precio_unitario") is not None:
+                pu = Decimal(cambio["precio_unitario"])
+            nuevas.append((pid, qty, pu, (qty * pu).quantize(Decimal("0.01"))))
+
+        for pid, cambio in por_producto.items():
+            if pid in vistos or Decimal(cambio["cantidad"]) == 0:
+                continue
+            if cambio.get("precio_unitario") is None:
+                raise PedidoError(
+                    f"Producto {pid}: precio_unitario es requerido para agregarlo."
+                )
+            nuevas.extend(_normalizar_items([cambio]))
 
-            cur.execute(
-                """
-                INSERT INTO pedidodetalle (pedido_id, producto_id, cantidad, precio_unitario, subtotal)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                [pedido_id, pid, qty, pu, sub],
-            )
+        if not nuevas:
+            raise PedidoError("El pedido requiere al menos un ítem.")
 
-        cur.execute(
-            "UPDATE pedido SET total = %s WHERE id = %s",
-            [total, pedido_id],
-        )
+        _aplicar_cambios_detalle(cur, pedido_id, bodega_id, nuevas)
 
     return obtener_pedido(pedido_id)
 
@@ -249,15 +489,33 @@ def reemplazar_items_pedido(pedido_id: int, items: list, username: str):
 # ---------------------------------------------------------------------
 # 3) Confirmar pedido (FACTURAR): descuenta stock y cambia estado
 # ---------------------------------------------------------------------
+def _registrar_tiempo_lock(pedido_id: int, lineas: int, t_lock: float):
+    """
+    Se ejecuta en on_commit: el tiempo desde que se tomaron los locks de
+    `existencia` hasta el COMMIT es el tiempo que estuvieron retenidos.
+    """
+    ms = (time.perf_counter() - t_lock) * 1000
+    logger.info(
+        "confirmar_pedido pedido=%s lineas=%s lock_existencia_ms=%.1f",
+        pedido_id,
+        lineas,
+        ms,
+    )
+
+
 @transaction.atomic
 def confirmar_pedido(pedido_id: int, username: str):
     """
     Confirma (factura) un pedido:
     - Verifica que esté en estado ABIERTO.
-    - Verifica existencia nuevamente.
-    - Descuenta de `existencia.cantidad`.
-    - Registra movimiento en `movimientoinventario` (SALIDA/VENTA).
+    - Bloquea TODAS las filas de `existencia` del pedido en una sola
+      sentencia, en orden de producto_id (evita deadlocks entre pedidos
+      con productos en común) y verifica existencia de todas a la vez.
+    - Descuenta de `existencia.cantidad` con un solo UPDATE ... JOIN.
+    - Registra el kardex en `movimientoinventario` (VENTA) con un solo
+      INSERT ... SELECT sobre el detalle.
     - Cambia estado a 'FACTURADO'.
+    - Registra en el log cuánto tiempo se retuvieron los locks.
     (Por ahora NO crea registro en tabla venta; se puede agregar después.)
     """
     # NUEVO: obtener el usuario de negocio que confirma
@@ -282,93 +540,69 @@ def confirmar_pedido(pedido_id: int, username: str):
         if estado != "ABIERTO":
             raise PedidoError("Solo pedidos en estado ABIERTO pueden confirmarse.")
 
-        # Leer detalle (producto y cantidad)
+        # Cantidad requerida por producto (agregada en la BD)
         cur.execute(
             """
-            SELECT producto_id, cantidad
+            SELECT producto_id, SUM(cantidad)
             FROM pedidodetalle
             WHERE pedido_id = %s
+            GROUP BY producto_id
             """,
             [pedido_id],
         )
-        items = cur.fetchall()
-
-        # Validar existencia, descontar y registrar movimiento
-        for pid, qty in items:
-            qty = Decimal(str(qty))
+        requerido = {int(pid): Decimal(str(qty)) for pid, qty in cur.fetchall()}
 
-            # Bloqueo de la fila de existencia
-            cur.execute(
-                """
-                SELECT cantidad
-                FROM existencia
-                WHERE producto_id = %s AND bodega_id = %s
-                FOR UPDATE
-                """,
-                [pid, bodega_id],
-            )
-            row = cur.fetchone()
-            if not row:
-                raise StockError(
-                    f"Producto {pid}: no existe registro de stock en bodega {bodega_id}."
-                )
-            cantidad = Decimal(str(row[0]))
-            if qty > cantidad:
-                raise StockError(
-                    f"Producto {pid}: existencia {cantidad}, requerido {qty}."
-                )
+        # Bloqueo de todas las filas de existencia, ordenado por producto_id
+        existencias = _leer_existencias(
+            cur, bodega_id, requerido.keys(), for_update=True
+        )
+        t_lock = time.perf_counter()
+        _validar_stock(requerido, existencias, bodega_id)
 
-            # Actualizar existencia (restar)
-            cur.execute(
-                """
-                UPDATE existencia
-                SET cantidad = cantidad - %s
-                WHERE producto_id = %s AND bodega_id = %s
-                """,
-                [qty, pid, bodega_id],
-            )
+        # Descontar existencia de todos los productos en una sola sentencia
+        cur.execute(
+            """
+            UPDATE existencia e
+            JOIN (
+                SELECT producto_id, SUM(cantidad) AS cantidad
+                FROM pedidodetalle
+                WHERE pedido_id = %s
+                GROUP BY producto_id
+            ) d ON d.producto_id = e.producto_id
+            SET e.cantidad = e.cantidad - d.cantidad
+            WHERE e.bodega_id = %s
+            """,
+            [pedido_id, bodega_id],
+        )
 
-            # NUEVO: registrar movimiento de inventario tipo VENTA/SALIDA
-            # Nota: ajusta nombres de columnas si tu DDL tiene venta_id u otros campos.
-            cur.execute(
-                """
-                INSERT INTO movimientoinventario (
-                    fecha,
-                    tipo,
-                    bodega_origen_id,
-                    bodega_destino_id,
-                    producto_id,
-                    cantidad,
-                    costo_unit,
-                    referencia,
-                    usuario_id,
-                    compra_id
-                ) VALUES (
-                    %s,      -- fecha
-                    %s,      -- tipo
-                    %s,      -- bodega_origen_id
-                    %s,      -- bodega_destino_id
-                    %s,      -- producto_id
-                    %s,      -- cantidad
-                    %s,      -- costo_unit
-                    %s,      -- referencia
-                    %s,      -- usuario_id
-                    %s       -- compra_id (NULL en ventas)
-                )
-                """,
-                [
-                    timezone.now(),  # fecha
-                    "VENTA",  # tipo (ajusta si usas 'SALIDA')
-                    bodega_id,  # bodega_origen_id
-                    None,  # bodega_destino_id
-                    pid,  # producto_id
-                    qty,  # cantidad
-                    Decimal("0.00"),  # costo_unit (placeholder, se puede mejorar)
-                    f"VENTA PEDIDO #{pedido_id}",  # referencia
-                    usuario_id,  # usuario que confirmó
-                    None,  # compra_id = NULL en ventas
-                ],
+        # Kardex: un movimiento VENTA por línea, en un solo INSERT ... SELECT
+        cur.execute(
+            """
+            INSERT INTO movimientoinventario (
+                fecha,
+                tipo,
+                bodega_origen_id,
+                bodega_destino_id,
+                producto_id,
+                cantidad,
+                costo_unit,
+                referencia,
+                usuario_id,
+                compra_id
             )
+            SELECT %s, 'VENTA', %s, NULL, producto_id, cantidad, 0.00, %s, %s, NULL
+            FROM pedidodetalle
+            WHERE pedido_id = %s
+            ORDER BY id
+            """,
+            [
+                timezone.now(),
+                bodega_id,
+                f"VENTA PEDIDO #{pedido_id}",
+                usuario_id,
+                pedido_id,
+            ],
+        )
 
         # Cambiar estado del pedido
         cur.execute(
@@ -376,6 +610,9 @@ def confirmar_pedido(pedido_id: int, username: str):
             ["FACTURADO", pedido_id],
         )
 
+    transaction.on_commit(
+        lambda: _registrar_tiempo_lock(pedido_id, len(requerido), t_lock)
+    )
     return obtener_pedido(pedido_id)
 
 
@@ -385,8 +622,9 @@ def cancelar_pedido(pedido_id: int, username: str):
     Cancela un pedido:
     - Solo se permite cancelar si NO está FACTURADO.
     - Si ya está CANCELADO, devuelve el pedido tal cual (operación idempotente).
-    - Con el modelo actual, NO se modifica `existencia` porque el stock
-      solo se descuenta al confirmar (FACTURAR).
+    - NO se modifica `existencia.cantidad` porque el stock solo se
+      descuenta al confirmar (FACTURAR); si estaba RESERVADO se liberan
+      sus reservas.
     """
     with connection.cursor() as cur:
         cur.execute(
@@ -411,8 +649,12 @@ def cancelar_pedido(pedido_id: int, username: str):
             # Ya estaba cancelado; devolvemos su estado actual
             return obtener_pedido(pedido_id)
 
-        # Estados posibles aquí: ABIERTO o RESERVADO (si algún día lo usas)
-        # Como aún no hay reservas reales de stock, no tocamos `existencia`.
+        # Estados posibles aquí: ABIERTO o RESERVADO.
+        # Un pedido RESERVADO devuelve sus reservas (existencia.reservado
+        # y series); `existencia.cantidad` no se toca.
+        if estado == "RESERVADO":
+            liberar_reservas_pedido(cur, pedido_id, estado="LIBERADA")
+
         cur.execute(
             "UPDATE pedido SET estado = %s WHERE id = %s",
             ["CANCELADO", pedido_id],
@@ -421,13 +663,42 @@ def cancelar_pedido(pedido_id: int, username: str):
     return obtener_pedido(pedido_id)
 
 
-def listar_pedidos(cliente_id=None, estado=None, fecha_desde=None, fecha_hasta=None):
+# ---------------------------------------------------------------------
+# Listado paginado por cursor (keyset sobre fecha, id)
+# ---------------------------------------------------------------------
+# Índices esperados: ver core/sql/001_pedido_indices.sql
+LISTAR_PEDIDOS_LIMITE = 100
+LISTAR_PEDIDOS_LIMITE_MAX = 500
+
+
+def _codificar_cursor(fecha, pedido_id: int) -> str:
+    """Token opaco con la última (fecha, id) entregada."""
+    crudo = json.dumps({"f": fecha.isoformat(), "i": int(pedido_id)})
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(token: str):
+    try:
+        relleno = "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(token + relleno))
+        fecha = datetime.fromisoformat(data["f"])
+        return fecha, int(data["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise PedidoError("Cursor de paginación inválido.") from e
+
+
+def _sql_listar_pedidos(
+    cliente_id=None,
+    bodega_id=None,
+    estado=None,
+    fecha_desde=None,
+    fecha_hasta=None,
+    cursor=None,
+    limit=LISTAR_PEDIDOS_LIMITE,
+):
     """
-    Lista pedidos con filtros opcionales.
-    - cliente_id: filtra por cliente.
-    - estado: 'ABIERTO','RESERVADO','FACTURADO','CANCELADO'.
-    - fecha_desde / fecha_hasta: rango sobre pedido.fecha (date o datetime).
-    Devuelve solo cabeceras (sin items) para hacer el listado más ligero.
+    Arma el SELECT del listado. Separado para poder correr EXPLAIN sobre
+    exactamente la misma consulta (ver comando verificar_planes).
     """
     sql = """
         SELECT id, fecha, total, cliente_id, usuario_id, bodega_id, estado
@@ -440,23 +711,90 @@ def listar_pedidos(cliente_id=None, estado=None, fecha_desde=None, fecha_hasta=N
         condiciones.append("cliente_id = %s")
         params.append(cliente_id)
 
+    if bodega_id is not None:
+        condiciones.append("bodega_id = %s")
+        params.append(bodega_id)
+
     if estado:
         condiciones.append("estado = %s")
         params.append(estado)
 
+    # Rango semiabierto [desde, hasta + 1 día) para no perder el último día
     if fecha_desde:
         condiciones.append("fecha >= %s")
-        params.append(fecha_desde)
+        params.append(inicio_del_dia(fecha_desde))
 
     if fecha_hasta:
-        condiciones.append("fecha <= %s")
-        params.append(fecha_hasta)
+        if not isinstance(fecha_hasta, datetime):
+            fecha_hasta = fecha_hasta + timedelta(days=1)
+            condiciones.append("fecha < %s")
+        else:
+            condiciones.append("fecha <= %s")
+        params.append(inicio_del_dia(fecha_hasta))
+
+    if cursor:
+        ultima_fecha, ultimo_id = _decodificar_cursor(cursor)
+        condiciones.append("(fecha < %s OR (fecha = %s AND id < %s))")
+        params.extend([ultima_fecha, ultima_fecha, ultimo_id])
 
     if condiciones:
         sql += " WHERE " + " AND ".join(condiciones)
 
-    sql += " ORDER BY fecha DESC, id DESC LIMIT 100"
+    # Se pide una fila extra para saber si hay página siguiente
+    sql += " ORDER BY fecha DESC, id DESC LIMIT %s"
+    params.append(int(limit) + 1)
+    return sql, params
+
+
+def listar_pedidos(
+    cliente_id=None,
+    bodega_id=None,
+    estado=None,
+    fecha_desde=None,
+    fecha_hasta=None,
+    cursor=None,
+    limit=LISTAR_PEDIDOS_LIMITE,
+):
+    """
+    Lista pedidos con filtros opcionales, paginado por cursor.
+    - cliente_id / bodega_id: filtran por cliente o bodega.
+    - estado: 'ABIERTO','RESERVADO','FACTURADO','CANCELADO'.
+    - fecha_desde / fecha_hasta: rango sobre pedido.fecha (date o datetime).
+    - cursor: token `next_cursor` de la página anterior.
+    - limit: tamaño de página (máx. LISTAR_PEDIDOS_LIMITE_MAX).
+    Devuelve {"results": [...], "next_cursor": str | None}; solo cabeceras
+    (sin items) para hacer el listado más ligero.
+    """
+    limit = max(1, min(int(limit), LISTAR_PEDIDOS_LIMITE_MAX))
+    sql, params = _sql_listar_pedidos(
+        cliente_id=cliente_id,
+        bodega_id=bodega_id,
+        estado=estado,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        cursor=cursor,
+        limit=limit,
+    )
 
     with connection.cursor() as cur:
         cur.execute(sql, params)
+        filas = _fetchall_dict(cur)
+
+    next_cursor = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultima = filas[-1]
+        next_cursor = _codificar_cursor(ultima["fecha"], ultima["id"])
+
+    return {"results": filas, "next_cursor": next_cursor}
+
+
+def explain_listar_pedidos(**filtros) -> list:
+    """
+    Devuelve las filas de EXPLAIN para la consulta de listar_pedidos con
+    los filtros dados.
+    """
+    sql, params = _sql_listar_pedidos(**filtros)
+    with connection.cursor() as cur:
+        cur.execute("EXPLAIN " + sql, params)
         return _fetchall_dict(cur)
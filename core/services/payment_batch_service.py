@@ -0,0 +1,397 @@
+# core/services/payment_batch_service.py
+"""
+Registro masivo de pagos (estados de cuenta del banco, cierres de POS).
+
+Los pagos se procesan por lotes de LOTE_PAGOS, cada lote en su propia
+transacción y con un número fijo de sentencias:
+- clientes y ventas referenciados: una consulta IN cada uno;
+- cuotas objetivo: un solo SELECT ... FOR UPDATE ordenado por id;
+- Pago, AplicacionPago y MovimientoCaja: bulk_create;
+- saldos de cuota: un UPDATE con CASE (bulk_update).
+Un pago inválido se reporta y no detiene el resto del lote. Si el lote
+falla en la BD (DatabaseError), se revierte y sus pagos se reintentan uno
+por uno, así que solo se reportan como error los que vuelven a fallar.
+
+Los registros llegan ya validados (forma del pago) por quien llama, con
+validar_registros_pago de core/serializers/payment_serializers.py, igual
+que POST /pagos/ valida antes de llamar a payment_service.
+"""
+
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from core.models import AplicacionPago, Cliente, Cuota, MovimientoCaja, Pago, Venta
+from core.services.cartera_service import refrescar_cuotas
+from core.services.payment_service import PaymentError
+
+LOTE_PAGOS = 1000
+
+# Caja a la que entran los pagos (igual que registrar_pago_con_aplicaciones)
+CAJA_ID = 1
+
+COLUMNAS_CSV = (
+    "ref",
+    "cliente_id",
+    "metodo",
+    "tipo_objetivo",
+    "tipo_aplicacion",
+    "monto",
+)
+
+
+# ---------------------------------------------------------------------
+# Lectores: cada uno produce dicts {ref, linea, data} con `data` en el
+# mismo formato que POST /pagos/
+# ---------------------------------------------------------------------
+def _opcional(valor):
+    valor = (valor or "").strip()
+    return valor or None
+
+
+def leer_csv(archivo):
+    """
+    Una fila por aplicación; las filas consecutivas con la misma `ref`
+    forman un pago (cliente, método y referencia se toman de la primera
+    fila). monto_total es la suma de las filas.
+    Columnas opcionales: referencia, venta_id, cuota_id, es_deposito_inicial.
+    """
+    lector = csv.DictReader(archivo)
+    faltan = [c for c in COLUMNAS_CSV if c not in (lector.fieldnames or [])]
+    if faltan:
+        raise PaymentError(f"Columnas faltantes en el CSV: {', '.join(faltan)}.")
+
+    actual = None
+    for n, fila in enumerate(lector, start=2):
+        ref = (fila["ref"] or "").strip()
+        if actual is None or actual["ref"] != ref:
+            if actual is not None:
+                yield actual
+            actual = {
+                "ref": ref,
+                "linea": n,
+                "data": {
+                    "cliente_id": fila["cliente_id"],
+                    "metodo": fila["metodo"],
+                    "referencia": _opcional(fila.get("referencia")),
+                    "es_deposito_inicial": _opcional(fila.get("es_deposito_inicial"))
+                    or False,
+                    "monto_total": Decimal("0.00"),
+                    "aplicaciones": [],
+                },
+            }
+        try:
+            actual["data"]["monto_total"] += Decimal((fila["monto"] or "").strip())
+        except InvalidOperation:
+            actual["error"] = f"Monto inválido en la línea {n}: {fila['monto']!r}"
+        actual["data"]["aplicaciones"].append(
+            {
+                "tipo_objetivo": fila["tipo_objetivo"],
+                "venta_id": _opcional(fila.get("venta_id")),
+                "cuota_id": _opcional(fila.get("cuota_id")),
+                "tipo_aplicacion": fila["tipo_aplicacion"],
+                "monto": fila["monto"],
+            }
+        )
+    if actual is not None:
+        yield actual
+
+
+def leer_jsonl(archivo):
+    """
+    Un pago por línea, con el mismo cuerpo que POST /pagos/ más `ref`
+    (opcional) para identificarlo en el reporte.
+    """
+    for n, linea in enumerate(archivo, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            data = json.loads(linea, parse_float=Decimal)
+        except ValueError as e:
+            yield {"ref": None, "linea": n, "error": f"JSON inválido: {e}"}
+            continue
+        if not isinstance(data, dict):
+            yield {"ref": None, "linea": n, "error": "Se esperaba un objeto JSON."}
+            continue
+        yield {"ref": str(data.pop("ref", "") or ""), "linea": n, "data": data}
+
+
+def desde_lista(pagos):
+    """Pagos recibidos como arreglo JSON en el body del request."""
+    for n, data in enumerate(pagos, start=1):
+        if not isinstance(data, dict):
+            yield {"ref": None, "linea": n, "error": "Se esperaba un objeto JSON."}
+            continue
+        data = dict(data)
+        yield {"ref": str(data.pop("ref", "") or ""), "linea": n, "data": data}
+
+
+LECTORES = {"csv": leer_csv, "jsonl": leer_jsonl}
+
+
+# ---------------------------------------------------------------------
+# Procesamiento por lotes
+# ---------------------------------------------------------------------
+def _error(registro: dict, detalle) -> dict:
+    return {
+        "ref": registro.get("ref"),
+        "linea": registro.get("linea"),
+        "ok": False,
+        "detail": detalle,
+    }
+
+
+def _validar(registro: dict) -> dict:
+    """Datos del pago ya validados, o PaymentError con el error del registro."""
+    if registro.get("error"):
+        raise PaymentError(registro["error"])
+    if registro["data"].get("aplicar_automatico"):
+        raise PaymentError("aplicar_automatico no está soportado en lotes.")
+    return registro["data"]
+
+
+def _ids_existentes(modelo, ids) -> set:
+    ids = set(ids)
+    if not ids:
+        return set()
+    return set(modelo.objects.filter(id__in=ids).values_list("id", flat=True))
+
+
+def _aplicar_saldos(pagos: dict, orden: list, cuotas: dict, resultados: list, lote):
+    """
+    Aplica en memoria, en el orden del archivo, los montos sobre las cuotas
+    bloqueadas ({id: [saldo, estado]}). Mismas reglas que _aplicar_a_cuota.
+    Los pagos con una cuota inexistente se marcan como error y no tocan
+    ningún saldo.
+    """
+    aceptados = []
+    for i in orden:
+        faltan = [
+            a["cuota_id"]
+            for a in pagos[i]["aplicaciones"]
+            if a.get("cuota_id") and a["cuota_id"] not in cuotas
+        ]
+        if faltan:
+            resultados[i] = _error(
+                lote[i], f"Cuotas inexistentes: {sorted(set(faltan))}."
+            )
+            continue
+        for a in pagos[i]["aplicaciones"]:
+            if a.get("cuota_id"):
+                cuota = cuotas[a["cuota_id"]]
+                nuevo_saldo = cuota[0] - Decimal(str(a["monto"]))
+                if nuevo_saldo <= 0:
+                    cuota[0] = Decimal("0.00")
+                    cuota[1] = "PAGADA"
+                else:
+                    cuota[0] = nuevo_saldo
+        aceptados.append(i)
+    return aceptados
+
+
+def _insertar_pagos(filas: list) -> None:
+    """
+    Inserta los pagos en un solo INSERT multi-fila y les asigna su id.
+    MySQL no devuelve los ids de un INSERT multi-fila, pero un INSERT con
+    VALUES reserva todos sus autoincrementos de una vez (en cualquier
+    innodb_autoinc_lock_mode): LAST_INSERT_ID() es el del primer registro y
+    los demás siguen de a @@auto_increment_increment, sin depender de
+    releer la tabla (otro lote pudo insertar pagos con la misma fecha).
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        Pago.objects.bulk_create(filas)
+        return
+
+    params = []
+    for p in filas:
+        params += [
+            connection.ops.adapt_datetimefield_value(p.fecha),
+            p.cliente_id,
+            p.metodo,
+            p.referencia,
+            p.monto_total,
+            p.usuario_id,
+            p.es_deposito_inicial,
+        ]
+    with connection.cursor() as cur:
+        cur.execute(
+            f"""
+            INSERT INTO pago (fecha, cliente_id, metodo, referencia, monto_total,
+                              usuario_id, es_deposito_inicial)
+            VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(filas))}
+            """,
+            params,
+        )
+        if cur.rowcount != len(filas):
+            raise DatabaseError("No se insertaron todos los pagos del lote.")
+        cur.execute("SELECT LAST_INSERT_ID(), @@auto_increment_increment")
+        primer_id, paso = cur.fetchone()
+    for k, pago in enumerate(filas):
+        pago.pk = int(primer_id) + k * int(paso)
+
+
+def _procesar_lote(lote: list, usuario_id: int) -> list:
+    resultados = [None] * len(lote)
+    pagos = {}
+    for i, registro in enumerate(lote):
+        try:
+            pagos[i] = _validar(registro)
+        except PaymentError as e:
+            resultados[i] = _error(registro, e.args[0])
+
+    clientes = _ids_existentes(Cliente, (p["cliente_id"] for p in pagos.values()))
+    ventas = _ids_existentes(
+        Venta,
+        (
+            a["venta_id"]
+            for p in pagos.values()
+            for a in p["aplicaciones"]
+            if a.get("venta_id")
+        ),
+    )
+    orden = []
+    for i, pago in pagos.items():
+        sin_venta = sorted(
+            {
+                a["venta_id"]
+                for a in pago["aplicaciones"]
+                if a.get("venta_id") and a["venta_id"] not in ventas
+            }
+        )
+        if pago["cliente_id"] not in clientes:
+            resultados[i] = _error(lote[i], f"Cliente {pago['cliente_id']} no existe.")
+        elif sin_venta:
+            resultados[i] = _error(lote[i], f"Ventas inexistentes: {sin_venta}.")
+        else:
+            orden.append(i)
+
+    if not orden:
+        return resultados
+
+    cuota_ids = sorted(
+        {
+            a["cuota_id"]
+            for i in orden
+            for a in pagos[i]["aplicaciones"]
+            if a.get("cuota_id")
+        }
+    )
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            # Un solo bloqueo, en orden de id, para todas las cuotas del lote
+            cuotas = {
+                cid: [saldo, estado]
+                for cid, saldo, estado in Cuota.objects.select_for_update()
+                .filter(id__in=cuota_ids)
+                .order_by("id")
+                .values_list("id", "saldo_cuota", "estado")
+            }
+            aceptados = _aplicar_saldos(pagos, orden, cuotas, resultados, lote)
+            if not aceptados:
+                return resultados
+
+            filas = [
+                Pago(
+                    cliente_id=pagos[i]["cliente_id"],
+                    metodo=pagos[i]["metodo"],
+                    referencia=pagos[i].get("referencia"),
+                    monto_total=pagos[i]["monto_total"],
+                    usuario_id=usuario_id,
+                    es_deposito_inicial=pagos[i].get("es_deposito_inicial", False),
+                    fecha=now,
+                )
+                for i in aceptados
+            ]
+            _insertar_pagos(filas)
+
+            AplicacionPago.objects.bulk_create(
+                [
+                    AplicacionPago(
+                        pago=pago,
+                        venta_id=a.get("venta_id"),
+                        cuota_id=a.get("cuota_id"),
+                        monto=a["monto"],
+                        tipo=a["tipo_aplicacion"],
+                    )
+                    for i, pago in zip(aceptados, filas)
+                    for a in pagos[i]["aplicaciones"]
+                ]
+            )
+            MovimientoCaja.objects.bulk_create(
+                [
+                    MovimientoCaja(
+                        caja_id=CAJA_ID,
+                        tipo="INGRESO",
+                        monto=pago.monto_total,
+                        motivo="Pago de cliente",
+                        referencia=pago.referencia,
+                        pago=pago,
+                        fecha=now,
+                    )
+                    for pago in filas
+                ]
+            )
+
+            # Un UPDATE ... CASE id WHEN ... para todos los saldos del lote
+            tocadas = sorted(
+                {
+                    a["cuota_id"]
+                    for i in aceptados
+                    for a in pagos[i]["aplicaciones"]
+                    if a.get("cuota_id")
+                }
+            )
+            if tocadas:
+                Cuota.objects.bulk_update(
+                    [
+                        Cuota(id=cid, saldo_cuota=cuotas[cid][0], estado=cuotas[cid][1])
+                        for cid in tocadas
+                    ],
+                    ["saldo_cuota", "estado"],
+                    batch_size=len(tocadas),
+                )
+                refrescar_cuotas(tocadas)
+    except DatabaseError as e:
+        if len(orden) == 1:
+            resultados[orden[0]] = _error(lote[orden[0]], str(e))
+            return resultados
+        # El lote se revirtió completo: se reintenta pago por pago (cada uno
+        # en su transacción) para reportar solo los que fallan
+        for i in orden:
+            resultados[i] = _procesar_lote([lote[i]], usuario_id)[0]
+        return resultados
+
+    for i, pago in zip(aceptados, filas):
+        resultados[i] = {
+            "ref": lote[i]["ref"],
+            "linea": lote[i]["linea"],
+            "ok": True,
+            "pago_id": pago.pk,
+        }
+    return resultados
+
+
+def registrar_pagos_lote(registros, usuario_id: int, lote: int = LOTE_PAGOS):
+    """
+    Registra pagos a partir de `registros` (salida de leer_csv, leer_jsonl
+    o desde_lista, pasada por validar_registros_pago). Devuelve un generador con un resultado por pago:
+    {ref, linea, ok, pago_id} o {ref, linea, ok: False, detail}.
+    Cada lote se confirma en su propia transacción.
+    """
+    pendientes = []
+    try:
+        for registro in registros:
+            pendientes.append(registro)
+            if len(pendientes) >= lote:
+                yield from _procesar_lote(pendientes, usuario_id)
+                pendientes = []
+    except PaymentError as e:
+        # Error de formato del archivo completo (ej. columnas del CSV)
+        yield {"ref": None, "linea": None, "ok": False, "detail": str(e)}
+    if pendientes:
+        yield from _procesar_lote(pendientes, usuario_id)
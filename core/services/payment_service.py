@@ -1,5 +1,7 @@
 from decimal import Decimal
 from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from core.models import (
@@ -8,12 +10,24 @@ from core.models import (
     Cuota,
     MovimientoCaja,
 )
+from core.services.cartera_service import refrescar_cuotas
+from core.services.usuario_service import buscar_usuario_id
 
 
 class PaymentError(Exception):
     pass
 
 
+def obtener_usuario_id(username: str) -> int:
+    """id de la tabla `usuario` que registra los pagos de `username`."""
+    usuario_id = buscar_usuario_id(username)
+    if usuario_id is None:
+        raise PaymentError(
+            f"Usuario de negocio no encontrado para username={username!r}"
+        )
+    return usuario_id
+
+
 @transaction.atomic
 def registrar_pago_con_aplicaciones(
     *,
@@ -68,6 +82,11 @@ def registrar_pago_con_aplicaciones(
         if cuota_id:
             _aplicar_a_cuota(cuota_id=cuota_id, monto=monto)
 
+    # Reflejar los nuevos saldos en el snapshot de cartera
+    cuota_ids = [a["cuota_id"] for a in aplicaciones if a.get("cuota_id")]
+    if cuota_ids:
+        refrescar_cuotas(cuota_ids)
+
     # 3. Movimiento de caja
     MovimientoCaja.objects.create(
         caja_id=1,
@@ -90,3 +109,174 @@ def _aplicar_a_cuota(*, cuota_id: int, monto: Decimal) -> None:
     else:
         cuota.saldo_cuota = nuevo_saldo
     cuota.save(update_fields=["saldo_cuota", "estado"])
+
+
+## Aplicación automática (cascada: cuota más antigua primero)
+_CERO = Decimal("0.00")
+
+
+def _pagado_por_tipo(tipo: str):
+    """Subconsulta: total ya aplicado a la cuota con ese tipo de aplicación."""
+    pagado = (
+        AplicacionPago.objects.filter(cuota_id=OuterRef("pk"), tipo=tipo)
+        .order_by()
+        .values("cuota_id")
+        .annotate(total=Sum("monto"))
+        .values("total")
+    )
+    return Coalesce(
+        Subquery(pagado),
+        Value(_CERO),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def _bloquear_cuotas_abiertas(cliente_id: int) -> list:
+    """
+    Cuotas con saldo del cliente, por fecha de vencimiento, bloqueadas en
+    UNA consulta: (id, saldo_cuota, interes_prog, capital_prog,
+    interes_pagado, capital_pagado, estado).
+    """
+    return list(
+        Cuota.objects.select_for_update(of=("self",))
+        .filter(acuerdo__venta__cliente_id=cliente_id, saldo_cuota__gt=0)
+        .exclude(estado="PAGADA")
+        .annotate(
+            interes_pagado=_pagado_por_tipo("INTERES"),
+            capital_pagado=_pagado_por_tipo("CAPITAL"),
+        )
+        .order_by("fecha_venc", "id")
+        .values_list(
+            "id",
+            "saldo_cuota",
+            "interes_prog",
+            "capital_prog",
+            "interes_pagado",
+            "capital_pagado",
+            "estado",
+        )
+    )
+
+
+def distribuir_monto(monto: Decimal, cuotas) -> list[dict]:
+    """
+    Reparte `monto` sobre `cuotas` (filas de _bloquear_cuotas_abiertas, en
+    orden de vencimiento). En cada cuota se cubre primero la mora, luego el
+    interés y al final el capital:
+    - interés pendiente = interes_prog - aplicado como INTERES
+    - capital pendiente = capital_prog - aplicado como CAPITAL
+    - mora = lo que el saldo tenga por encima de interés + capital pendientes
+    El total aplicado a una cuota nunca supera su saldo.
+    Devuelve las aplicaciones en el formato de registrar_pago_con_aplicaciones.
+    """
+    restante = Decimal(str(monto))
+    aplicaciones = []
+    for cuota_id, saldo, interes_prog, capital_prog, int_pag, cap_pag, _e in cuotas:
+        if restante <= 0:
+            break
+        # Partes del saldo; suman exactamente saldo. Si el saldo no cuadra
+        # con lo programado (pagos tipo CUOTA u OTRO), el ajuste va a capital.
+        interes = max(interes_prog - int_pag, _CERO)
+        capital = max(capital_prog - cap_pag, _CERO)
+        mora = max(saldo - interes - capital, _CERO)
+        interes = min(interes, saldo - mora)
+        capital = saldo - mora - interes
+
+        for tipo, pendiente in (
+            ("MORA", mora),
+            ("INTERES", interes),
+            ("CAPITAL", capital),
+        ):
+            monto_tipo = min(restante, pendiente)
+            if monto_tipo <= 0:
+                continue
+            aplicaciones.append(
+                {
+                    "tipo_objetivo": "CUOTA",
+                    "cuota_id": cuota_id,
+                    "tipo_aplicacion": tipo,
+                    "monto": monto_tipo,
+                }
+            )
+            restante -= monto_tipo
+    return aplicaciones
+
+
+@transaction.atomic
+def registrar_pago_automatico(
+    *,
+    cliente_id: int,
+    metodo: str,
+    monto_total: Decimal,
+    referencia: str | None,
+    usuario_id: int,
+    es_deposito_inicial: bool = False,
+) -> Pago:
+    """
+    Registra un pago y lo aplica solo (aplicar_automatico=true): cuotas más
+    antiguas primero y, dentro de cada cuota, mora → interés → capital.
+    Número fijo de sentencias sin importar cuántas cuotas cubra.
+    """
+    monto_total = Decimal(str(monto_total))
+    if monto_total <= 0:
+        raise PaymentError("El monto_total debe ser mayor que cero.")
+
+    cuotas = _bloquear_cuotas_abiertas(cliente_id)
+    deuda = sum((c[1] for c in cuotas), _CERO)
+    if monto_total > deuda:
+        raise PaymentError(
+            f"El monto_total ({monto_total}) excede el saldo pendiente del cliente ({deuda})."
+        )
+    aplicaciones = distribuir_monto(monto_total, cuotas)
+
+    pago = Pago.objects.create(
+        cliente_id=cliente_id,
+        metodo=metodo,
+        referencia=referencia,
+        monto_total=monto_total,
+        usuario_id=usuario_id,
+        es_deposito_inicial=es_deposito_inicial,
+        fecha=timezone.now(),
+    )
+    AplicacionPago.objects.bulk_create(
+        [
+            AplicacionPago(
+                pago=pago,
+                cuota_id=a["cuota_id"],
+                monto=a["monto"],
+                tipo=a["tipo_aplicacion"],
+            )
+            for a in aplicaciones
+        ]
+    )
+
+    # Nuevos saldos: un solo UPDATE ... CASE para todas las cuotas tocadas
+    saldos = {c[0]: c[1] for c in cuotas}
+    estados = {c[0]: c[6] for c in cuotas}
+    for a in aplicaciones:
+        saldos[a["cuota_id"]] -= a["monto"]
+    tocadas = sorted({a["cuota_id"] for a in aplicaciones})
+    Cuota.objects.bulk_update(
+        [
+            Cuota(
+                id=cid,
+                saldo_cuota=max(saldos[cid], _CERO),
+                estado="PAGADA" if saldos[cid] <= 0 else estados[cid],
+            )
+            for cid in tocadas
+        ],
+        ["saldo_cuota", "estado"],
+        batch_size=len(tocadas),
+    )
+    refrescar_cuotas(tocadas)
+
+    MovimientoCaja.objects.create(
+        caja_id=1,
+        tipo="INGRESO",
+        monto=monto_total,
+        motivo="Pago de cliente",
+        referencia=referencia,
+        pago=pago,
+    )
+
+    return pago
@@ -1,123 +1,170 @@
 # core/services/purchase_export_service.py
 
+import tempfile
+
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font
-from django.db.models import Sum
-from django.utils.dateparse import parse_date
+from django.db.models import Q
+from django.utils import timezone
 
 from core.models import Compra, CompraDetalle
+from core.services.purchase_filter_service import FiltroCompras
 
 
 class PurchaseExportService:
 
     @staticmethod
     def filtrar_compras(params):
-        """Reutiliza filtros igual que el dashboard."""
-        qs = Compra.objects.all()
-
-        proveedor_id = params.get("proveedor_id")
-        bodega_id = params.get("bodega_id")
-        estado = params.get("estado")
-        fecha_desde = params.get("fecha_desde")
-        fecha_hasta = params.get("fecha_hasta")
-
-        if proveedor_id:
-            qs = qs.filter(proveedor_id=proveedor_id)
-
-        if bodega_id:
-            qs = qs.filter(bodega_id=bodega_id)
-
-        if estado:
-            qs = qs.filter(estado=estado.upper())
-
-        if fecha_desde:
-            d = parse_date(fecha_desde)
-            if d:
-                qs = qs.filter(fecha__date__gte=d)
-
-        if fecha_hasta:
-            h = parse_date(fecha_hasta)
-            if h:
-                qs = qs.filter(fecha__date__lte=h)
-
-        return qs.order_by("-fecha")
+        """Mismos filtros que el listado y el dashboard (FiltroCompras)."""
+        return FiltroCompras.desde_params(params).queryset()
+
+    # Compras por consulta al exportar; los detalles se leen por bloque
+    # de compras (compra_id IN ...), así que la memoria no depende del total
+    BLOQUE_COMPRAS = 1000
+
+    COLUMNAS_RESUMEN = (
+        ("ID Compra", 12),
+        ("Proveedor", 40),
+        ("Bodega", 25),
+        ("Fecha", 12),
+        ("Documento", 20),
+        ("Estado", 12),
+        ("Total", 14),
+    )
+    COLUMNAS_DETALLE = (
+        ("ID Compra", 12),
+        ("Producto", 45),
+        ("Cantidad", 12),
+        ("Costo Unit.", 14),
+        ("Subtotal", 14),
+    )
+
+    _CAMPOS_RESUMEN = (
+        "id",
+        "proveedor__nombre",
+        "bodega__nombre",
+        "fecha",
+        "no_documento",
+        "estado",
+        "total",
+    )
 
     @staticmethod
-    def generar_excel(qs):
-        """Genera archivo XLSX con resumen y detalles."""
-        wb = openpyxl.Workbook()
-
-        # ------------------ HOJA 1: RESUMEN ------------------
-        ws1 = wb.active
-        ws1.title = "Resumen de Compras"
-
-        headers = [
-            "ID Compra",
-            "Proveedor",
-            "Bodega",
-            "Fecha",
-            "Documento",
-            "Estado",
-            "Total",
-        ]
-        ws1.append(headers)
-
-        # Negritas
-        for col in range(1, len(headers) + 1):
-            ws1.cell(row=1, column=col).font = Font(bold=True)
-
-        for compra in qs:
-            ws1.append(
-                [
-                    compra.id,
-                    compra.proveedor.nombre,
-                    compra.bodega.nombre,
-                    compra.fecha.strftime("%Y-%m-%d"),
-                    compra.no_documento,
-                    compra.estado,
-                    float(compra.total),
-                ]
-            )
+    def _bloques_por_ids(ids, tam):
+        """Bloques de `tam` compras por pk, en el orden de `ids`."""
+        for inicio in range(0, len(ids), tam):
+            tramo = ids[inicio : inicio + tam]
+            filas = {
+                f[0]: f
+                for f in Compra.objects.filter(id__in=tramo).values_list(
+                    *PurchaseExportService._CAMPOS_RESUMEN
+                )
+            }
+            bloque = [filas[i] for i in tramo if i in filas]
+            if bloque:
+                yield bloque
 
-        # Ajuste de ancho automático
-        for column in ws1.columns:
-            length = max(len(str(cell.value)) for cell in column)
-            ws1.column_dimensions[get_column_letter(column[0].column)].width = (
-                length + 2
-            )
+    @staticmethod
+    def _bloques_compras(qs, tam):
+        """
+        Recorre qs (ordenado por -fecha, -id) en bloques de `tam` filas con
+        paginación por llave (fecha, id) y JOINs de proveedor y bodega.
+        mysqlclient carga el resultado completo en memoria aunque se use
+        .iterator(), por eso se pagina en lugar de usar un solo cursor.
+        """
+        qs = qs.order_by("-fecha", "-id").values_list(
+            *PurchaseExportService._CAMPOS_RESUMEN
+        )
+        ultimo = None
+        while True:
+            bloque = qs
+            if ultimo is not None:
+                fecha, compra_id = ultimo
+                bloque = bloque.filter(
+                    Q(fecha__lt=fecha) | Q(fecha=fecha, id__lt=compra_id)
+                )
+            filas = list(bloque[:tam])
+            if not filas:
+                return
+            yield filas
+            ultimo = (filas[-1][3], filas[-1][0])
 
-        # ------------------ HOJA 2: DETALLE ------------------
-        ws2 = wb.create_sheet("Detalle de Compras")
-
-        headers_det = [
-            "ID Compra",
-            "Producto",
-            "Cantidad",
-            "Costo Unit.",
-            "Subtotal",
-        ]
-        ws2.append(headers_det)
-        for col in range(1, len(headers_det) + 1):
-            ws2.cell(row=1, column=col).font = Font(bold=True)
-
-        detalles = CompraDetalle.objects.filter(compra__in=qs)
-
-        for det in detalles:
-            ws2.append(
-                [
-                    det.compra_id,
-                    det.producto.nombre,
-                    float(det.cantidad),
-                    float(det.costo_unit),
-                    float(det.subtotal),
-                ]
-            )
+    @staticmethod
+    def _hoja(wb, titulo, columnas):
+        ws = wb.create_sheet(titulo)
+        # Anchos fijos: en modo write-only no se puede recorrer la hoja
+        for i, (_nombre, ancho) in enumerate(columnas, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = ancho
+        encabezado = []
+        for nombre, _ancho in columnas:
+            celda = WriteOnlyCell(ws, value=nombre)
+            celda.font = Font(bold=True)
+            encabezado.append(celda)
+        ws.append(encabezado)
+        return ws
 
-        for column in ws2.columns:
-            length = max(len(str(cell.value)) for cell in column)
-            ws2.column_dimensions[get_column_letter(column[0].column)].width = (
-                length + 2
+    @staticmethod
+    def generar_excel(qs, destino=None, ids=None):
+        """
+        Genera el XLSX (resumen y detalles) con hojas write-only.
+        Escribe en `destino` o en un archivo temporal (en memoria hasta
+        8 MB, luego en disco) y lo devuelve posicionado al inicio.
+        Con `ids` (ya resueltos por la caché de FiltroCompras) lee las
+        compras por pk en ese orden en lugar de volver a filtrar qs.
+        """
+        destino = destino or tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        wb = openpyxl.Workbook(write_only=True)
+        ws1 = PurchaseExportService._hoja(
+            wb, "Resumen de Compras", PurchaseExportService.COLUMNAS_RESUMEN
+        )
+        ws2 = PurchaseExportService._hoja(
+            wb, "Detalle de Compras", PurchaseExportService.COLUMNAS_DETALLE
+        )
+
+        tam = PurchaseExportService.BLOQUE_COMPRAS
+        if ids is not None:
+            bloques = PurchaseExportService._bloques_por_ids(ids, tam)
+        else:
+            bloques = PurchaseExportService._bloques_compras(qs, tam)
+
+        for bloque in bloques:
+            for compra_id, proveedor, bodega, fecha, documento, estado, total in bloque:
+                ws1.append(
+                    [
+                        compra_id,
+                        proveedor,
+                        bodega,
+                        timezone.localtime(fecha).strftime("%Y-%m-%d"),
+                        documento,
+                        estado,
+                        float(total),
+                    ]
+                )
+
+            detalles = (
+                CompraDetalle.objects.filter(compra_id__in=[f[0] for f in bloque])
+                .order_by("compra_id", "id")
+                .values_list(
+                    "compra_id",
+                    "producto__nombre",
+                    "cantidad",
+                    "costo_unit",
+                    "subtotal",
+                )
             )
-
-        return wb
+            for compra_id, producto, cantidad, costo_unit, subtotal in detalles:
+                ws2.append(
+                    [
+                        compra_id,
+                        producto,
+                        float(cantidad),
+                        float(costo_unit),
+                        float(subtotal),
+                    ]
+                )
+
+        wb.save(destino)
+        destino.seek(0)
+        return destino
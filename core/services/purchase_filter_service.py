@@ -0,0 +1,188 @@
+# core/services/purchase_filter_service.py
+"""
+Filtro de compras compartido (proveedor, bodega, estado, rango de fechas)
+y caché corta de su resultado.
+
+FiltroCompras normaliza los parámetros de la API (ids enteros, estado en
+mayúsculas, fechas como date) y da una llave canónica: los mismos filtros
+escritos de otra forma ("registrada" / "REGISTRADA", "01" / "1") caen en la
+misma llave. Con ella se guardan, durante COMPRAS_CACHE_SEGUNDOS, los ids
+de las compras (en orden -fecha, -id) y el total / cantidad, así que el
+listado, el dashboard y la exportación con los mismos filtros comparten
+las mismas consultas.
+
+La invalidación sube una generación en la caché por defecto. Con la
+LocMemCache por defecto (una por proceso) solo la ve el worker que
+registró la compra y los demás sirven lo cacheado hasta
+COMPRAS_CACHE_SEGUNDOS; con varios workers se configura una caché
+compartida con CACHE_BACKEND (ver CACHES en erp/settings.py).
+"""
+
+import time
+from dataclasses import asdict, dataclass
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+
+from core.models import Compra
+from core.services.date_range import filtrar_rango
+
+CAMPOS = ("proveedor_id", "bodega_id", "estado", "fecha_desde", "fecha_hasta")
+
+# Generación de la caché: registrar/anular compras la incrementa y deja
+# huérfanas las entradas anteriores (que vencen solas por TTL)
+_LLAVE_GENERACION = "compras:generacion"
+
+
+def _entero(nombre: str, valor):
+    if valor in (None, ""):
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValidationError({nombre: ["Debe ser un número entero."]})
+
+
+def _fecha(nombre: str, valor):
+    if valor in (None, ""):
+        return None
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(str(valor).strip())
+    except ValueError:
+        raise ValidationError({nombre: ["Formato esperado: AAAA-MM-DD."]})
+
+
+@dataclass(frozen=True)
+class FiltroCompras:
+    proveedor_id: int | None = None
+    bodega_id: int | None = None
+    estado: str | None = None
+    fecha_desde: date | None = None
+    fecha_hasta: date | None = None
+
+    @classmethod
+    def desde_params(cls, params, **fijos) -> "FiltroCompras":
+        """
+        Construye el filtro desde query params (o un dict). `fijos` pisa
+        valores que vienen de la URL, p. ej. proveedor_id=<id de la ruta>.
+        """
+        valores = {k: params.get(k) for k in CAMPOS}
+        valores.update(fijos)
+        estado = (str(valores["estado"] or "")).strip().upper()
+        return cls(
+            proveedor_id=_entero("proveedor_id", valores["proveedor_id"]),
+            bodega_id=_entero("bodega_id", valores["bodega_id"]),
+            estado=estado or None,
+            fecha_desde=_fecha("fecha_desde", valores["fecha_desde"]),
+            fecha_hasta=_fecha("fecha_hasta", valores["fecha_hasta"]),
+        )
+
+    def como_params(self) -> dict:
+        """Solo los filtros presentes, como texto (llave de exportaciones)."""
+        return {
+            k: v.isoformat() if isinstance(v, date) else str(v)
+            for k, v in asdict(self).items()
+            if v is not None
+        }
+
+    def clave(self) -> str:
+        """Llave canónica: un valor por campo, en orden fijo."""
+        partes = (asdict(self)[k] for k in CAMPOS)
+        return "compras:" + ":".join(
+            "" if v is None else (v.isoformat() if isinstance(v, date) else str(v))
+            for v in partes
+        )
+
+    def aplicar(self, qs):
+        if self.proveedor_id is not None:
+            qs = qs.filter(proveedor_id=self.proveedor_id)
+        if self.bodega_id is not None:
+            qs = qs.filter(bodega_id=self.bodega_id)
+        if self.estado:
+            qs = qs.filter(estado=self.estado)
+        return filtrar_rango(qs, "fecha", self.fecha_desde, self.fecha_hasta)
+
+    def queryset(self):
+        return self.aplicar(Compra.objects.all()).order_by("-fecha", "-id")
+
+
+# ---------------------------------------------------------------------
+# Caché del resultado
+# ---------------------------------------------------------------------
+def _llave(filtro: FiltroCompras, sufijo: str) -> str:
+    generacion = cache.get_or_set(_LLAVE_GENERACION, int(time.time()), None)
+    return f"{filtro.clave()}:g{generacion}:{sufijo}"
+
+
+def _calcular(filtro: FiltroCompras) -> dict:
+    """
+    Cantidad y total con un agregado en SQL; los ids (ordenados) solo se
+    leen si no pasan de COMPRAS_CACHE_MAX_IDS; si pasan, los usuarios
+    paginan sobre el queryset.
+    """
+    agg = (
+        filtro.queryset()
+        .order_by()
+        .aggregate(
+            cantidad=Count("id"),
+            total=Coalesce(
+                Sum("total"),
+                Value(0),
+                output_field=DecimalField(max_digits=16, decimal_places=2),
+            ),
+        )
+    )
+    ids = None
+    if agg["cantidad"] <= settings.COMPRAS_CACHE_MAX_IDS:
+        ids = list(filtro.queryset().values_list("id", flat=True))
+    return {"ids": ids, **agg}
+
+
+def compras_filtradas(filtro: FiltroCompras) -> dict:
+    """
+    {ids (o None si son demasiados), cantidad, total} de las compras del
+    filtro, compartido por COMPRAS_CACHE_SEGUNDOS entre listado, dashboard y
+    exportación.
+    """
+    llave = _llave(filtro, "ids")
+    datos = cache.get(llave)
+    if datos is None:
+        datos = _calcular(filtro)
+        cache.set(llave, datos, settings.COMPRAS_CACHE_SEGUNDOS)
+    return datos
+
+
+def ids_compras(filtro: FiltroCompras) -> list | None:
+    return compras_filtradas(filtro)["ids"]
+
+
+def en_cache(filtro: FiltroCompras, sufijo: str, calcular):
+    """Resultado derivado del filtro (p. ej. secciones del dashboard)."""
+    llave = _llave(filtro, sufijo)
+    datos = cache.get(llave)
+    if datos is None:
+        datos = calcular()
+        cache.set(llave, datos, settings.COMPRAS_CACHE_SEGUNDOS)
+    return datos
+
+
+def invalidar() -> None:
+    """
+    Descarta lo cacheado al confirmar una compra nueva o anulada (en todos
+    los workers si la caché es compartida).
+    """
+
+    def _subir_generacion():
+        try:
+            cache.incr(_LLAVE_GENERACION)
+        except ValueError:
+            cache.set(_LLAVE_GENERACION, int(time.time()), None)
+
+    transaction.on_commit(_subir_generacion)
@@ -0,0 +1,149 @@
+# core/services/purchase_rollup_service.py
+"""
+Rollups diarios de compras (compra_resumen_dia y compra_producto_dia).
+
+Guardan, por día local, proveedor, bodega y estado (y producto), el total y
+la cantidad de compras y las cantidades/costos por producto, para que el
+dashboard de compras agregue unas cuantas filas por día en lugar de
+recorrer compra y compra_detalle. Ver core/sql/006_compra_resumen_dia.sql.
+"""
+
+import logging
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.services.date_range import inicio_del_dia
+
+logger = logging.getLogger(__name__)
+
+
+def _offset_local() -> str:
+    """
+    Desplazamiento de la zona del sistema respecto a UTC como '+HH:MM'
+    (para CONVERT_TZ sin depender de las tablas de zonas de MySQL).
+    America/Guatemala no tiene horario de verano desde 2006.
+    """
+    minutos = int(timezone.localtime().utcoffset().total_seconds() // 60)
+    signo = "+" if minutos >= 0 else "-"
+    minutos = abs(minutos)
+    return f"{signo}{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def aplicar_compra(compra, estado: str, signo: int) -> None:
+    """
+    Suma (signo=1) o resta (signo=-1) la compra y sus detalles a los
+    rollups de `estado`. Debe llamarse dentro de la transacción que crea o
+    cambia la compra, después de guardar sus detalles.
+    """
+    fecha = timezone.localdate(compra.fecha)
+    llave = [fecha, compra.proveedor_id, compra.bodega_id, estado]
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO compra_resumen_dia
+                (fecha, proveedor_id, bodega_id, estado, compras, total)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                compras = compras + VALUES(compras),
+                total = total + VALUES(total)
+            """,
+            llave + [signo, compra.total * signo],
+        )
+        cur.execute(
+            """
+            INSERT INTO compra_producto_dia
+                (fecha, proveedor_id, bodega_id, producto_id, estado, cantidad, costo)
+            SELECT %s, %s, %s, d.producto_id, %s,
+                   SUM(d.cantidad) * %s, SUM(d.subtotal) * %s
+            FROM compra_detalle d
+            WHERE d.compra_id = %s
+            GROUP BY d.producto_id
+            ON DUPLICATE KEY UPDATE
+                cantidad = cantidad + VALUES(cantidad),
+                costo = costo + VALUES(costo)
+            """,
+            llave + [signo, signo, compra.id],
+        )
+        if signo < 0:
+            # Sin filas en cero: el dashboard no debe listarlas
+            cur.execute(
+                """
+                DELETE FROM compra_resumen_dia
+                WHERE fecha = %s AND proveedor_id = %s AND bodega_id = %s
+                  AND estado = %s AND compras = 0
+                """,
+                llave,
+            )
+            cur.execute(
+                """
+                DELETE FROM compra_producto_dia
+                WHERE fecha = %s AND proveedor_id = %s AND bodega_id = %s
+                  AND estado = %s AND cantidad = 0 AND costo = 0
+                """,
+                llave,
+            )
+
+
+def cambiar_estado(compra, estado_anterior: str, estado_nuevo: str) -> None:
+    """Mueve la compra de los rollups de un estado a los de otro."""
+    aplicar_compra(compra, estado_anterior, -1)
+    aplicar_compra(compra, estado_nuevo, 1)
+
+
+@transaction.atomic
+def reconstruir_rollups(desde=None) -> dict:
+    """
+    Regenera los rollups desde compra / compra_detalle, completos o a partir
+    del día local `desde`. Para la carga inicial o para reparar diferencias.
+    """
+    offset = _offset_local()
+    filtro_rollup, filtro_compra = "", ""
+    params_rollup, params_compra = [], []
+    if desde is not None:
+        # Inicio del día local ya convertido a UTC (el driver no convierte
+        # datetimes con zona en SQL crudo): la condición sobre c.fecha usa
+        # el índice y no toma compras de la noche anterior, cuyo día no se
+        # borró arriba
+        filtro_rollup, params_rollup = "WHERE fecha >= %s", [desde]
+        filtro_compra, params_compra = "WHERE c.fecha >= %s", [inicio_del_dia(desde)]
+
+    dia_local = "DATE(CONVERT_TZ(c.fecha, '+00:00', %s))"
+    with connection.cursor() as cur:
+        cur.execute(f"DELETE FROM compra_resumen_dia {filtro_rollup}", params_rollup)
+        cur.execute(f"DELETE FROM compra_producto_dia {filtro_rollup}", params_rollup)
+        cur.execute(
+            f"""
+            INSERT INTO compra_resumen_dia
+                (fecha, proveedor_id, bodega_id, estado, compras, total)
+            SELECT {dia_local}, c.proveedor_id, c.bodega_id, c.estado,
+                   COUNT(*), SUM(c.total)
+            FROM compra c
+            {filtro_compra}
+            GROUP BY 1, c.proveedor_id, c.bodega_id, c.estado
+            """,
+            [offset] + params_compra,
+        )
+        filas_resumen = cur.rowcount
+        cur.execute(
+            f"""
+            INSERT INTO compra_producto_dia
+                (fecha, proveedor_id, bodega_id, producto_id, estado, cantidad, costo)
+            SELECT {dia_local}, c.proveedor_id, c.bodega_id, d.producto_id,
+                   c.estado, SUM(d.cantidad), SUM(d.subtotal)
+            FROM compra c
+            JOIN compra_detalle d ON d.compra_id = c.id
+            {filtro_compra}
+            GROUP BY 1, c.proveedor_id, c.bodega_id, d.producto_id, c.estado
+            """,
+            [offset] + params_compra,
+        )
+        filas_producto = cur.rowcount
+
+    logger.info(
+        "rollups de compras reconstruidos desde=%s resumen=%s producto=%s",
+        desde,
+        filas_resumen,
+        filas_producto,
+    )
+    return {"resumen": filas_resumen, "producto": filas_producto}
@@ -14,7 +14,8 @@ from core.models import (
     Producto,
     Usuario as UsuarioCore,
 )
-from core.services.inventory_service import InventoryService
+from core.services import purchase_filter_service, purchase_rollup_service
+from core.services.inventory_service import LOTE_INVENTARIO, InventoryService
 
 
 class PurchaseService:
@@ -27,6 +28,9 @@ class PurchaseService:
     def registrar_compra(data: dict, usuario) -> Compra:
         """
         Crea una compra nueva con detalles y movimientos de inventario.
+        Las sentencias no crecen con las líneas: productos con in_bulk,
+        detalles y movimientos con bulk_create y existencias con un upsert
+        por lote de LOTE_INVENTARIO filas.
         """
 
         # Resolver usuario core (tabla `usuario`)
@@ -55,14 +59,44 @@ class PurchaseService:
                 }
             )
 
-        # Crear cabecera de compra
+        # Productos de todas las líneas en una sola consulta
+        items = data["items"]
+        productos = Producto.objects.in_bulk({item["producto_id"] for item in items})
+        faltantes = sorted(
+            {
+                item["producto_id"]
+                for item in items
+                if item["producto_id"] not in productos
+            }
+        )
+        if faltantes:
+            raise ValidationError(
+                {
+                    "items": [
+                        f"El producto con id {producto_id} no existe."
+                        for producto_id in faltantes
+                    ]
+                }
+            )
+
+        # (producto_id, cantidad, costo_unit, subtotal) por línea
+        lineas = []
+        total_compra = Decimal("0.00")
+        for item in items:
+            cantidad = Decimal(item["cantidad"])
+            costo_unit = Decimal(item["costo_unit"])
+            subtotal = (cantidad * costo_unit).quantize(Decimal("0.01"))
+            lineas.append((item["producto_id"], cantidad, costo_unit, subtotal))
+            total_compra += subtotal
+
+        # Crear cabecera de compra (el total ya se conoce)
         try:
             compra = Compra.objects.create(
                 proveedor=proveedor,
                 bodega=bodega,
                 fecha=fecha,
                 no_documento=no_documento,
-                total=Decimal("0.00"),
+                total=total_compra,
                 usuario=usuario_core,
                 estado="REGISTRADA",
                 observaciones=observaciones,
@@ -77,55 +111,46 @@ class PurchaseService:
                 }
             ) from e
 
-        total_compra = Decimal("0.00")
-
-        # Crear detalles + movimientos de inventario
-        for item in data["items"]:
-            producto_id = item["producto_id"]
-            try:
-                producto = Producto.objects.get(pk=producto_id)
-            except Producto.DoesNotExist:
-                raise ValidationError(
-                    {"items": [f"El producto con id {producto_id} no existe."]}
+        # Detalles + movimientos de inventario + existencias, por lotes
+        CompraDetalle.objects.bulk_create(
+            [
+                CompraDetalle(
+                    compra=compra,
+                    producto_id=producto_id,
+                    cantidad=cantidad,
+                    costo_unit=costo_unit,
+                    subtotal=subtotal,
                 )
-
-            cantidad = Decimal(item["cantidad"])
-            costo_unit = Decimal(item["costo_unit"])
-            subtotal = (cantidad * costo_unit).quantize(Decimal("0.01"))
-
-            CompraDetalle.objects.create(
-                compra=compra,
-                producto=producto,
-                cantidad=cantidad,
-                costo_unit=costo_unit,
-                subtotal=subtotal,
-            )
-
-            total_compra += subtotal
-
-            InventoryService.registrar_entrada_compra(
-                compra=compra,
-                producto=producto,
-                bodega=bodega,
-                cantidad=cantidad,
-                costo_unit=costo_unit,
-                usuario=usuario_core,
-            )
-
-        # Actualizar total en la compra
-        compra.total = total_compra
-        compra.save(update_fields=["total"])
+                for producto_id, cantidad, costo_unit, subtotal in lineas
+            ],
+            batch_size=LOTE_INVENTARIO,
+        )
+        InventoryService.registrar_entradas_compra(
+            compra=compra,
+            lineas=[(pid, cant, costo) for pid, cant, costo, _sub in lineas],
+            usuario=usuario_core,
+        )
+
+        # Rollups diarios del dashboard
+        purchase_rollup_service.aplicar_compra(compra, compra.estado, 1)
+        purchase_filter_service.invalidar()
 
         return compra
 
     @staticmethod
     @transaction.atomic
-    def anular_compra(compra_id: int, usuario, motivo: str | None = None) -> Compra:
+    def anular_compra(
+        compra_id: int,
+        usuario,
+        motivo: str | None = None,
+        permitir_negativo: bool = False,
+    ) -> Compra:
         """
         Anula una compra:
         - Cambia estado a ANULADA
         - Genera movimientos inversos en inventario
-        - Actualiza existencias
+        - Actualiza existencias (falla si alguna quedaría negativa, salvo
+          permitir_negativo=True)
         - Opcional: agrega motivo en observaciones
         """
 
@@ -151,7 +176,9 @@ class PurchaseService:
         #     raise ValidationError({"detail": f"No se puede anular una compra en estado {compra.estado}."})
 
         # Revertir inventario
-        InventoryService.revertir_compra(compra=compra, usuario=usuario_core)
+        InventoryService.revertir_compra(
+            compra=compra, usuario=usuario_core, permitir_negativo=permitir_negativo
+        )
 
         # Marcar como ANULADA y registrar motivo en observaciones (sin tocar DDL)
         motivo = (motivo or "").strip()
@@ -164,7 +191,12 @@ class PurchaseService:
             )
             compra.observaciones = nuevo_texto
 
+        estado_anterior = compra.estado
         compra.estado = "ANULADA"
         compra.save(update_fields=["estado", "observaciones"])
 
+        # Rollups diarios del dashboard
+        purchase_rollup_service.cambiar_estado(compra, estado_anterior, "ANULADA")
+        purchase_filter_service.invalidar()
+
         return compra
@@ -1,6 +1,14 @@
 # core/services/reservation_service.py
+import logging
 from datetime import datetime, timedelta
-from django.db import connection
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Reservas vencidas procesadas por transacción en el barrido
+LOTE_VENCIDAS = 500
 
 
 class ReservationError(Exception):
@@ -9,9 +17,155 @@ class ReservationError(Exception):
     pass
 
 
+def _reservar_cantidad(cur, producto_id, bodega_id, cantidad) -> bool:
+    """
+    Reserva `cantidad` incrementando existencia.reservado en una sola
+    sentencia condicional. Devuelve False si no hay disponible suficiente
+    (cantidad - reservado) o no existe la fila de existencia.
+    """
+    cur.execute(
+        """
+        UPDATE Existencia
+        SET reservado = reservado + %s
+        WHERE producto_id = %s AND bodega_id = %s AND cantidad - reservado >= %s
+    """,
+        [cantidad, producto_id, bodega_id, cantidad],
+    )
+    return cur.rowcount == 1
+
+
+def liberar_reservas_pedido(cur, pedido_id, estado="LIBERADA"):
+    """
+    Libera las reservas ACTIVAS del pedido y las pasa a `estado`:
+    - Stock: descuenta sus cantidades de existencia.reservado.
+    - Series: devuelve las ProductoSerie a EN_BODEGA.
+    Sentencias fijas, sin importar cuántas líneas tenga el pedido.
+    """
+    cur.execute(
+        """
+        UPDATE Existencia e
+        JOIN (
+            SELECT producto_id, bodega_id, SUM(cantidad) AS cantidad
+            FROM ReservaStock
+            WHERE pedido_id = %s AND estado = 'ACTIVA'
+            GROUP BY producto_id, bodega_id
+        ) r ON r.producto_id = e.producto_id AND r.bodega_id = e.bodega_id
+        SET e.reservado = e.reservado - r.cantidad
+    """,
+        [pedido_id],
+    )
+    cur.execute(
+        "UPDATE ReservaStock SET estado = %s WHERE pedido_id = %s AND estado = 'ACTIVA'",
+        [estado, pedido_id],
+    )
+
+    cur.execute(
+        """
+        UPDATE ProductoSerie ps
+        JOIN ReservaSerie rs ON rs.producto_serie_id = ps.id
+        SET ps.estado = 'EN_BODEGA', ps.pedido_id = NULL
+        WHERE rs.pedido_id = %s AND rs.estado = 'ACTIVA' AND ps.estado = 'RESERVADA'
+    """,
+        [pedido_id],
+    )
+    cur.execute(
+        "UPDATE ReservaSerie SET estado = %s WHERE pedido_id = %s AND estado = 'ACTIVA'",
+        [estado, pedido_id],
+    )
+
+
+def _marcas(ids) -> str:
+    return ", ".join(["%s"] * len(ids))
+
+
+def _bloquear_series(cur, solicitadas: dict, bodega_id) -> list:
+    """
+    Bloquea todas las series pedidas en una sola consulta (orden por id,
+    para que dos pedidos no se crucen) y valida en Python que estén
+    EN_BODEGA, en la bodega y sean del producto de su línea.
+    Reporta todas las series no disponibles juntas.
+    """
+    ids = sorted(solicitadas)
+    cur.execute(
+        f"""
+        SELECT id, producto_id, estado, bodega_id FROM ProductoSerie
+        WHERE id IN ({_marcas(ids)})
+        ORDER BY id
+        FOR UPDATE
+    """,
+        ids,
+    )
+    encontradas = {r[0]: r[1:] for r in cur.fetchall()}
+
+    no_disponibles = [
+        serie_id
+        for serie_id in ids
+        if serie_id not in encontradas
+        or encontradas[serie_id][0] != solicitadas[serie_id]
+        or encontradas[serie_id][1] != "EN_BODEGA"
+        or encontradas[serie_id][2] != bodega_id
+    ]
+    if no_disponibles:
+        raise ReservationError(
+            "Series no disponibles en esta bodega: "
+            + ", ".join(str(i) for i in no_disponibles)
+        )
+    return ids
+
+
+def _cantidad_series(cantidad) -> int:
+    n = int(Decimal(str(cantidad)))
+    if n <= 0 or n != Decimal(str(cantidad)):
+        raise ReservationError("La cantidad de series debe ser un entero positivo")
+    return n
+
+
+def _tomar_series_disponibles(cur, producto_id, bodega_id, n, excluir=()) -> list:
+    """
+    Bloquea `n` series EN_BODEGA del producto en la bodega.
+    SKIP LOCKED salta las que otro pedido está tomando en este momento,
+    pero no las que ya bloqueó esta misma transacción: esas (las series
+    elegidas del pedido) se excluyen con `excluir`, y cada producto se
+    toma una sola vez por pedido.
+    """
+    excluir = sorted(excluir)
+    filtro = f"AND id NOT IN ({_marcas(excluir)})" if excluir else ""
+    cur.execute(
+        f"""
+        SELECT id FROM ProductoSerie
+        WHERE producto_id = %s AND bodega_id = %s AND estado = 'EN_BODEGA'
+        {filtro}
+        ORDER BY id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """,
+        [producto_id, bodega_id, *excluir, n],
+    )
+    ids = [r[0] for r in cur.fetchall()]
+    if len(ids) < n:
+        raise ReservationError(
+            f"Series insuficientes del producto {producto_id}: "
+            f"disponibles {len(ids)}, solicitadas {n}"
+        )
+    return ids
+
+
+@transaction.atomic
 def crear_pedido_con_reserva(cliente_id, usuario_id, bodega_id, items, vence_horas=24):
     """
     Crea un pedido con sus detalles y realiza las reservas de stock o series.
+    Las reservas de stock se hacen con un UPDATE condicional sobre
+    existencia.reservado por línea (sin bloquear ni sumar ReservaStock).
+
+    Ítems con usar_series:
+    - con `series`: se bloquean todas las series pedidas en una sola
+      consulta ordenada y se validan estado, bodega y producto.
+    - sin `series`: se suman las cantidades por producto y se toman esas
+      series EN_BODEGA cualesquiera con un SELECT por producto y SKIP
+      LOCKED (los pickers concurrentes no se esperan), sin repetir las
+      series elegidas en otras líneas.
+    Todas las series se marcan con un UPDATE y se insertan en ReservaSerie
+    con un INSERT multi-fila.
     """
     with connection.cursor() as cur:
         # 1) Crear pedido
@@ -28,6 +182,10 @@ def crear_pedido_con_reserva(cliente_id, usuario_id, bodega_id, items, vence_hor
 
         # 2) Insert detalle + reservas
         vence_el = datetime.now() + timedelta(hours=vence_horas)
+        reservas_stock = []
+        solicitadas = {}  # serie_id -> producto_id
+        automaticas = {}  # producto_id -> cantidad de series a tomar
+        series_reservadas = []
 
         for it in items:
             cur.execute(
@@ -39,79 +197,287 @@ def crear_pedido_con_reserva(cliente_id, usuario_id, bodega_id, items, vence_hor
             )
 
             if it.get("usar_series"):
-                # Bloquear series disponibles en esa bodega
                 series = it.get("series") or []
-                if not series:
-                    raise ReservationError("Debe seleccionar series disponibles")
-
-                for serie_id in series:
-                    # SELECT ... FOR UPDATE de la serie
-                    cur.execute(
-                        """
-                        SELECT id, estado, bodega_id FROM ProductoSerie
-                        WHERE id = %s FOR UPDATE
-                    """,
-                        [serie_id],
+                if series:
+                    # Series elegidas: se bloquean todas juntas más abajo
+                    for serie_id in series:
+                        if int(serie_id) in solicitadas:
+                            raise ReservationError(
+                                f"Serie {serie_id} repetida en el pedido"
+                            )
+                        solicitadas[int(serie_id)] = int(it["producto_id"])
+                else:
+                    # Sin series elegidas: se toman más abajo, por producto
+                    producto_id = int(it["producto_id"])
+                    automaticas[producto_id] = automaticas.get(
+                        producto_id, 0
+                    ) + _cantidad_series(it["cantidad"])
+            else:
+                # No serie: reservar cantidad con el contador atómico
+                # existencia.reservado (sin SUM sobre ReservaStock)
+                cantidad = Decimal(str(it["cantidad"]))
+                if cantidad <= 0:
+                    raise ReservationError(
+                        "La cantidad a reservar debe ser mayor que cero"
                     )
-                    row = cur.fetchone()
-
-                    if not row or row[1] != "EN_BODEGA" or row[2] != bodega_id:
-                        raise ReservationError("Serie no disponible en esta bodega")
-
-                    # Marcar RESERVADA
-                    cur.execute(
-                        """
-                        UPDATE ProductoSerie
-                        SET estado = 'RESERVADA', pedido_id = %s
-                        WHERE id = %s
-                    """,
-                        [pedido_id, serie_id],
+                if not _reservar_cantidad(cur, it["producto_id"], bodega_id, cantidad):
+                    raise ReservationError(
+                        f"Stock insuficiente para reservar producto {it['producto_id']}"
                     )
-
-                    # Insertar ReservaSerie
-                    cur.execute(
-                        """
-                        INSERT INTO ReservaSerie (pedido_id, producto_serie_id, vence_el, estado)
-                        VALUES (%s, %s, %s, 'ACTIVA')
-                    """,
-                        [pedido_id, serie_id, vence_el],
-                    )
-            else:
-                # No serie: reservar cantidad (chequeo de disponible)
-                # Bloquear existencia con SELECT ... FOR UPDATE
-                cur.execute(
-                    """
-                    SELECT cantidad FROM Existencia
-                    WHERE producto_id = %s AND bodega_id = %s FOR UPDATE
-                """,
-                    [it["producto_id"], bodega_id],
+                reservas_stock.append(
+                    (pedido_id, it["producto_id"], bodega_id, cantidad, vence_el)
                 )
-                row = cur.fetchone()
-                fisico = row[0] if row else 0
-
-                # Calcular reservado actual
-                cur.execute(
-                    """
-                    SELECT COALESCE(SUM(cantidad), 0) FROM ReservaStock
-                    WHERE producto_id = %s AND bodega_id = %s AND estado = 'ACTIVA'
-                """,
-                    [it["producto_id"], bodega_id],
-                )
-                reservado = cur.fetchone()[0]
-                disponible = fisico - reservado
-
-                if it["cantidad"] > disponible:
-                    raise ReservationError("Stock insuficiente para reservar")
-
-                # Insertar reserva
-                cur.execute(
-                    """
-                    INSERT INTO ReservaStock (pedido_id, producto_id, bodega_id, cantidad, vence_el, estado)
-                    VALUES (%s, %s, %s, %s, %s, 'ACTIVA')
-                """,
-                    [pedido_id, it["producto_id"], bodega_id, it["cantidad"], vence_el],
+
+        # Series elegidas: un solo SELECT ... FOR UPDATE ordenado por id
+        if solicitadas:
+            series_reservadas.extend(_bloquear_series(cur, solicitadas, bodega_id))
+
+        # Series automáticas: N disponibles por producto, sin las elegidas
+        for producto_id in sorted(automaticas):
+            series_reservadas.extend(
+                _tomar_series_disponibles(
+                    cur,
+                    producto_id,
+                    bodega_id,
+                    automaticas[producto_id],
+                    excluir=[s for s, p in solicitadas.items() if p == producto_id],
                 )
+            )
+
+        # Marcar todas las series RESERVADA y registrar sus reservas por lote
+        if series_reservadas:
+            cur.execute(
+                f"""
+                UPDATE ProductoSerie
+                SET estado = 'RESERVADA', pedido_id = %s
+                WHERE id IN ({_marcas(series_reservadas)})
+            """,
+                [pedido_id, *series_reservadas],
+            )
+            cur.executemany(
+                """
+                INSERT INTO ReservaSerie (pedido_id, producto_serie_id, vence_el, estado)
+                VALUES (%s, %s, %s, 'ACTIVA')
+            """,
+                [(pedido_id, serie_id, vence_el) for serie_id in series_reservadas],
+            )
+
+        # Insertar todas las reservas de stock en un solo INSERT multi-fila
+        if reservas_stock:
+            cur.executemany(
+                """
+                INSERT INTO ReservaStock (pedido_id, producto_id, bodega_id, cantidad, vence_el, estado)
+                VALUES (%s, %s, %s, %s, %s, 'ACTIVA')
+            """,
+                reservas_stock,
+            )
 
         # 3) Cambiar estado a RESERVADO
         cur.execute("UPDATE Pedido SET estado = 'RESERVADO' WHERE id = %s", [pedido_id])
         return pedido_id
+
+
+def reconciliar_reservado(corregir=False, bodega_id=None) -> list:
+    """
+    Compara existencia.reservado contra la suma de ReservaStock ACTIVA por
+    (producto, bodega). Devuelve las diferencias encontradas y, con
+    corregir=True, ajusta el contador al valor esperado.
+    """
+    filtro = ""
+    params = []
+    if bodega_id is not None:
+        filtro = "AND e.bodega_id = %s"
+        params.append(bodega_id)
+
+    activas = """
+        SELECT producto_id, bodega_id, SUM(cantidad) AS cantidad
+        FROM ReservaStock
+        WHERE estado = 'ACTIVA'
+        GROUP BY producto_id, bodega_id
+    """
+
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT e.producto_id, e.bodega_id, e.reservado, COALESCE(r.cantidad, 0)
+            FROM Existencia e
+            LEFT JOIN ({activas}) r
+                ON r.producto_id = e.producto_id AND r.bodega_id = e.bodega_id
+            WHERE e.reservado <> COALESCE(r.cantidad, 0) {filtro}
+            ORDER BY e.bodega_id, e.producto_id
+            FOR UPDATE OF e
+        """,
+            params,
+        )
+        diferencias = [
+            {
+                "producto_id": pid,
+                "bodega_id": bid,
+                "reservado": reservado,
+                "esperado": esperado,
+            }
+            for pid, bid, reservado, esperado in cur.fetchall()
+        ]
+
+        if corregir and diferencias:
+            cur.execute(
+                f"""
+                UPDATE Existencia e
+                LEFT JOIN ({activas}) r
+                    ON r.producto_id = e.producto_id AND r.bodega_id = e.bodega_id
+                SET e.reservado = COALESCE(r.cantidad, 0)
+                WHERE e.reservado <> COALESCE(r.cantidad, 0) {filtro}
+            """,
+                params,
+            )
+
+    return diferencias
+
+
+# ---------------------------------------------------------------------
+# Barrido de reservas vencidas
+# ---------------------------------------------------------------------
+def _vencer_lote_stock(cur, ahora, lote):
+    """
+    Toma hasta `lote` ReservaStock ACTIVAS vencidas (rango sobre
+    (estado, vence_el), SKIP LOCKED para no chocar con otro barrido),
+    descuenta existencia.reservado y las marca VENCIDA.
+    Devuelve (cantidad, pedido_ids, vence_el más antiguo).
+    """
+    cur.execute(
+        """
+        SELECT id, pedido_id, vence_el
+        FROM ReservaStock
+        WHERE estado = 'ACTIVA' AND vence_el < %s
+        ORDER BY vence_el, id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """,
+        [ahora, lote],
+    )
+    filas = cur.fetchall()
+    if not filas:
+        return 0, set(), None
+
+    ids = [r[0] for r in filas]
+    cur.execute(
+        f"""
+        UPDATE Existencia e
+        JOIN (
+            SELECT producto_id, bodega_id, SUM(cantidad) AS cantidad
+            FROM ReservaStock
+            WHERE id IN ({_marcas(ids)})
+            GROUP BY producto_id, bodega_id
+        ) r ON r.producto_id = e.producto_id AND r.bodega_id = e.bodega_id
+        SET e.reservado = e.reservado - r.cantidad
+    """,
+        ids,
+    )
+    cur.execute(
+        f"UPDATE ReservaStock SET estado = 'VENCIDA' WHERE id IN ({_marcas(ids)})",
+        ids,
+    )
+    return len(ids), {r[1] for r in filas}, filas[0][2]
+
+
+def _vencer_lote_series(cur, ahora, lote):
+    """
+    Igual que _vencer_lote_stock para ReservaSerie: devuelve las series a
+    EN_BODEGA y marca las reservas VENCIDA.
+    """
+    cur.execute(
+        """
+        SELECT id, pedido_id, producto_serie_id, vence_el
+        FROM ReservaSerie
+        WHERE estado = 'ACTIVA' AND vence_el < %s
+        ORDER BY vence_el, id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """,
+        [ahora, lote],
+    )
+    filas = cur.fetchall()
+    if not filas:
+        return 0, set(), None
+
+    ids = [r[0] for r in filas]
+    series = [r[2] for r in filas]
+    cur.execute(
+        f"""
+        UPDATE ProductoSerie
+        SET estado = 'EN_BODEGA', pedido_id = NULL
+        WHERE id IN ({_marcas(series)}) AND estado = 'RESERVADA'
+    """,
+        series,
+    )
+    cur.execute(
+        f"UPDATE ReservaSerie SET estado = 'VENCIDA' WHERE id IN ({_marcas(ids)})",
+        ids,
+    )
+    return len(ids), {r[1] for r in filas}, filas[0][3]
+
+
+def _reabrir_pedidos(cur, pedido_ids):
+    """
+    Devuelve a ABIERTO los pedidos RESERVADO que ya no tienen reservas
+    ACTIVAS de ningún tipo.
+    """
+    ids = sorted(pedido_ids)
+    cur.execute(
+        f"""
+        UPDATE Pedido p
+        SET p.estado = 'ABIERTO'
+        WHERE p.id IN ({_marcas(ids)})
+          AND p.estado = 'RESERVADO'
+          AND NOT EXISTS (
+              SELECT 1 FROM ReservaStock rs
+              WHERE rs.pedido_id = p.id AND rs.estado = 'ACTIVA'
+          )
+          AND NOT EXISTS (
+              SELECT 1 FROM ReservaSerie rr
+              WHERE rr.pedido_id = p.id AND rr.estado = 'ACTIVA'
+          )
+    """,
+        ids,
+    )
+    return cur.rowcount
+
+
+def liberar_reservas_vencidas(lote=LOTE_VENCIDAS, ahora=None) -> dict:
+    """
+    Libera todas las reservas (stock y series) con vence_el < ahora, en
+    lotes de `lote` filas; cada lote es una transacción corta.
+    Por lote registra en el log su tamaño y el lag (segundos desde el
+    vencimiento más antiguo del lote).
+    Devuelve totales: {"stock", "series", "pedidos", "lotes", "lag_max_s"}.
+    """
+    ahora = ahora or datetime.now()
+    totales = {"stock": 0, "series": 0, "pedidos": 0, "lotes": 0, "lag_max_s": 0.0}
+
+    for tipo, vencer in (
+        ("stock", _vencer_lote_stock),
+        ("series", _vencer_lote_series),
+    ):
+        while True:
+            with transaction.atomic(), connection.cursor() as cur:
+                n, pedido_ids, mas_antiguo = vencer(cur, ahora, lote)
+                reabiertos = _reabrir_pedidos(cur, pedido_ids) if pedido_ids else 0
+            if not n:
+                break
+
+            lag = (ahora - mas_antiguo).total_seconds()
+            totales[tipo] += n
+            totales["pedidos"] += reabiertos
+            totales["lotes"] += 1
+            totales["lag_max_s"] = max(totales["lag_max_s"], lag)
+            logger.info(
+                "reservas_vencidas tipo=%s lote=%s pedidos_reabiertos=%s lag_s=%.0f",
+                tipo,
+                n,
+                reabiertos,
+                lag,
+            )
+            if n < lote:
+                break
+
+    return totales
@@ -15,6 +15,11 @@ def confirm_order_to_invoice(
     """
     Convierte un pedido en una venta (factura) consumiendo las reservas
     de productos o series y generando movimientos de inventario.
+
+    Usa una cantidad fija de sentencias sin importar cuántas líneas tenga
+    el pedido: INSERT ... SELECT del detalle, UPDATE ... JOIN de
+    existencias y series, un INSERT ... SELECT para el kardex y un UPDATE
+    por tabla de reservas.
     """
     with connection.cursor() as cur:
         # Datos base del pedido
@@ -38,84 +43,90 @@ def confirm_order_to_invoice(
         cur.execute("SELECT LAST_INSERT_ID()")
         venta_id = cur.fetchone()[0]
 
-        # Copiar detalle
+        # Copiar detalle completo en una sola sentencia
+        cur.execute(
+            """
+            INSERT INTO VentaDetalle (venta_id, producto_id, cantidad, precio_unit)
+            SELECT %s, producto_id, cantidad, precio_unit
+            FROM PedidoDetalle
+            WHERE pedido_id=%s
+            ORDER BY id
+        """,
+            [venta_id, pedido_id],
+        )
+
+        # Bloquear las reservas activas del pedido (una consulta por tabla)
         cur.execute(
-            "SELECT producto_id, cantidad, precio_unit FROM PedidoDetalle WHERE pedido_id=%s",
+            "SELECT id FROM ReservaSerie WHERE pedido_id=%s AND estado='ACTIVA' FOR UPDATE",
+            [pedido_id],
+        )
+        cur.execute(
+            "SELECT id FROM ReservaStock WHERE pedido_id=%s AND estado='ACTIVA' FOR UPDATE",
             [pedido_id],
         )
-        for producto_id, cantidad, precio_unit in cur.fetchall():
-            cur.execute(
-                """
-                INSERT INTO VentaDetalle (venta_id, producto_id, cantidad, precio_unit)
-                VALUES (%s, %s, %s, %s)
-            """,
-                [venta_id, producto_id, cantidad, precio_unit],
-            )
 
-        # Consumir reservas: series
+        # Consumir reservas no serie: descontar Existencia y liberar reservado
         cur.execute(
-            "SELECT producto_serie_id FROM ReservaSerie WHERE pedido_id=%s AND estado='ACTIVA' FOR UPDATE",
+            """
+            UPDATE Existencia e
+            JOIN (
+                SELECT producto_id, bodega_id, SUM(cantidad) AS cantidad
+                FROM ReservaStock
+                WHERE pedido_id=%s AND estado='ACTIVA'
+                GROUP BY producto_id, bodega_id
+            ) r ON r.producto_id = e.producto_id AND r.bodega_id = e.bodega_id
+            SET e.cantidad = e.cantidad - r.cantidad,
+                e.reservado = e.reservado - r.cantidad
+        """,
             [pedido_id],
         )
-        for (serie_id,) in cur.fetchall():
-            # Marcar DESPACHADA + asignar venta
-            cur.execute(
-                """
-                UPDATE ProductoSerie
-                SET estado='DESPACHADA', venta_id=%s
-                WHERE id=%s
-            """,
-                [venta_id, serie_id],
-            )
 
-            # MovimientoInventario -1 por serie
-            cur.execute(
-                """
-                INSERT INTO MovimientoInventario (tipo, bodega_origen_id, producto_id, cantidad, costo_unit, referencia, usuario_id)
-                SELECT 'VENTA', %s, ps.producto_id, 1, p.costo_ref, CONCAT('VENTA ', %s), %s
-                FROM ProductoSerie ps JOIN Producto p ON p.id=ps.producto_id
-                WHERE ps.id=%s
-            """,
-                [bodega_id, venta_id, usuario_id, serie_id],
-            )
+        # Consumir reservas de series: DESPACHADA + asignar venta
+        cur.execute(
+            """
+            UPDATE ProductoSerie ps
+            JOIN ReservaSerie rs ON rs.producto_serie_id = ps.id
+            SET ps.estado='DESPACHADA', ps.venta_id=%s
+            WHERE rs.pedido_id=%s AND rs.estado='ACTIVA'
+        """,
+            [venta_id, pedido_id],
+        )
 
-            # Marcar reserva como CONSUMIDA
-            cur.execute(
-                "UPDATE ReservaSerie SET estado='CONSUMIDA' WHERE pedido_id=%s AND producto_serie_id=%s",
-                [pedido_id, serie_id],
-            )
+        # Kardex: un movimiento por serie (cantidad 1) y uno por reserva de stock
+        cur.execute(
+            """
+            INSERT INTO MovimientoInventario (tipo, bodega_origen_id, producto_id, cantidad, costo_unit, referencia, usuario_id)
+            SELECT 'VENTA', %s, ps.producto_id, 1, p.costo_ref, CONCAT('VENTA ', %s), %s
+            FROM ReservaSerie rs
+            JOIN ProductoSerie ps ON ps.id = rs.producto_serie_id
+            JOIN Producto p ON p.id = ps.producto_id
+            WHERE rs.pedido_id=%s AND rs.estado='ACTIVA'
+            UNION ALL
+            SELECT 'VENTA', rk.bodega_id, p.id, rk.cantidad, p.costo_ref, CONCAT('VENTA ', %s), %s
+            FROM ReservaStock rk
+            JOIN Producto p ON p.id = rk.producto_id
+            WHERE rk.pedido_id=%s AND rk.estado='ACTIVA'
+        """,
+            [
+                bodega_id,
+                venta_id,
+                usuario_id,
+                pedido_id,
+                venta_id,
+                usuario_id,
+                pedido_id,
+            ],
+        )
 
-        # Consumir reservas: no serie
+        # Marcar reservas como CONSUMIDA
         cur.execute(
-            "SELECT producto_id, bodega_id, cantidad FROM ReservaStock WHERE pedido_id=%s AND estado='ACTIVA' FOR UPDATE",
+            "UPDATE ReservaSerie SET estado='CONSUMIDA' WHERE pedido_id=%s AND estado='ACTIVA'",
+            [pedido_id],
+        )
+        cur.execute(
+            "UPDATE ReservaStock SET estado='CONSUMIDA' WHERE pedido_id=%s AND estado='ACTIVA'",
             [pedido_id],
         )
-        for producto_id, bodega_id, cantidad in cur.fetchall():
-            # Descontar Existencia
-            cur.execute(
-                """
-                UPDATE Existencia
-                SET cantidad = cantidad - %s
-                WHERE producto_id=%s AND bodega_id=%s
-            """,
-                [cantidad, producto_id, bodega_id],
-            )
-
-            # MovimientoInventario negativo
-            cur.execute(
-                """
-                INSERT INTO MovimientoInventario (tipo, bodega_origen_id, producto_id, cantidad, costo_unit, referencia, usuario_id)
-                SELECT 'VENTA', %s, p.id, %s, p.costo_ref, CONCAT('VENTA ', %s), %s
-                FROM Producto p WHERE p.id=%s
-            """,
-                [bodega_id, cantidad, venta_id, usuario_id, producto_id],
-            )
-
-            # Marcar reserva consumida
-            cur.execute(
-                "UPDATE ReservaStock SET estado='CONSUMIDA' WHERE pedido_id=%s AND producto_id=%s",
-                [pedido_id, producto_id],
-            )
 
         # Cerrar pedido
         cur.execute("UPDATE Pedido SET estado='FACTURADO' WHERE id=%s", [pedido_id])
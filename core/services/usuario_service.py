@@ -0,0 +1,17 @@
+# core/services/usuario_service.py
+"""
+Usuario de negocio (tabla `usuario`) del usuario autenticado de Django.
+
+Los servicios guardan usuario_id de la tabla `usuario`; el request trae el
+User de Django, que se relaciona por username. Cada dominio envuelve la
+búsqueda con su propia excepción (PedidoError, PaymentError).
+"""
+
+from core.models import Usuario
+
+
+def buscar_usuario_id(username: str) -> int | None:
+    """id de la tabla `usuario` para `username`, o None si no existe."""
+    return (
+        Usuario.objects.filter(username=username).values_list("id", flat=True).first()
+    )
@@ -0,0 +1,25 @@
+-- core/sql/001_pedido_indices.sql
+-- Plan de índices para order_service.listar_pedidos (paginación por cursor).
+--
+-- La consulta siempre ordena por (fecha DESC, id DESC) y pagina con
+--   (fecha < :f OR (fecha = :f AND id < :id)) ... LIMIT n + 1
+-- Para que MySQL lea el índice hacia atrás sin filesort, cada filtro de
+-- igualdad necesita un índice que termine en (fecha, id):
+--
+--   sin filtros / solo fechas -> idx_pedido_fecha_id
+--   cliente_id = ?            -> idx_pedido_cliente_fecha
+--   bodega_id = ?             -> idx_pedido_bodega_fecha
+--   estado = ?                -> idx_pedido_estado_fecha
+--
+-- Con varios filtros de igualdad a la vez MySQL usa uno de estos índices
+-- y aplica el resto como condición; el orden sigue viniendo del índice.
+-- Los índices simples sobre cliente_id / bodega_id que crean las FKs
+-- quedan cubiertos por los compuestos (prefijo izquierdo).
+--
+-- Verificación: python manage.py verificar_planes (y core/tests/test_planes.py
+-- con MySQL).
+
+CREATE INDEX idx_pedido_fecha_id ON pedido (fecha, id);
+CREATE INDEX idx_pedido_cliente_fecha ON pedido (cliente_id, fecha, id);
+CREATE INDEX idx_pedido_bodega_fecha ON pedido (bodega_id, fecha, id);
+CREATE INDEX idx_pedido_estado_fecha ON pedido (estado, fecha, id);
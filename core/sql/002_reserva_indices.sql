@@ -0,0 +1,13 @@
+-- core/sql/002_reserva_indices.sql
+-- Índices para el barrido de reservas vencidas
+-- (reservation_service.liberar_reservas_vencidas).
+--
+-- El barrido lee con
+--   WHERE estado = 'ACTIVA' AND vence_el < :ahora
+--   ORDER BY vence_el, id LIMIT :lote FOR UPDATE SKIP LOCKED
+-- Con (estado, vence_el, id) es un range scan que termina en el LIMIT y
+-- solo bloquea las filas del lote; sin él, el FOR UPDATE recorre (y
+-- bloquea) toda la tabla.
+
+CREATE INDEX idx_reservastock_estado_vence ON ReservaStock (estado, vence_el, id);
+CREATE INDEX idx_reservaserie_estado_vence ON ReservaSerie (estado, vence_el, id);
@@ -0,0 +1,10 @@
+-- core/sql/003_productoserie_indices.sql
+-- Índice para tomar "N series disponibles del producto X en la bodega Y"
+-- (reservation_service._tomar_series_disponibles):
+--   WHERE producto_id = ? AND bodega_id = ? AND estado = 'EN_BODEGA'
+--   ORDER BY id LIMIT n FOR UPDATE SKIP LOCKED
+-- Con este índice el SELECT lee (y bloquea) solo las n series que
+-- devuelve, sin filesort.
+
+CREATE INDEX idx_productoserie_disponible
+    ON ProductoSerie (producto_id, bodega_id, estado, id);
@@ -0,0 +1,36 @@
+-- core/sql/004_cartera_aging_snapshot.sql
+-- Snapshot materializado de v_cartera_aging + totales pre-agregados.
+-- Mantenido por core/services/cartera_service.py:
+--   - refrescar_cuotas(ids): al aplicar pagos (y al generar cuotas), aplica
+--     la diferencia de cada cuota a los totales por bucket y por cliente.
+--   - rollover_aging(): job diario; solo revisa las cuotas cuyo
+--     vencimiento cae en una frontera de bucket (índice por fecha_venc).
+--   - reconstruir_snapshot(): copia completa desde la vista (carga inicial
+--     o reparación).
+-- Comando: python manage.py actualizar_cartera_aging [--reconstruir]
+
+CREATE TABLE cartera_aging_snapshot (
+    cuota_id    BIGINT        NOT NULL PRIMARY KEY,
+    cliente_id  INT           NOT NULL,
+    cliente     VARCHAR(150)  NOT NULL,
+    fecha_venc  DATE          NOT NULL,
+    saldo       DECIMAL(12,2) NOT NULL,
+    bucket      VARCHAR(10)   NOT NULL,
+    KEY idx_cas_cliente_venc (cliente_id, fecha_venc),
+    KEY idx_cas_fecha_venc (fecha_venc)
+);
+
+CREATE TABLE cartera_aging_bucket (
+    bucket  VARCHAR(10)   NOT NULL PRIMARY KEY,
+    saldo   DECIMAL(14,2) NOT NULL DEFAULT 0,
+    cuotas  INT           NOT NULL DEFAULT 0
+);
+
+CREATE TABLE cartera_aging_cliente (
+    cliente_id     INT           NOT NULL PRIMARY KEY,
+    cliente        VARCHAR(150)  NOT NULL,
+    total_deuda    DECIMAL(14,2) NOT NULL DEFAULT 0,
+    total_vencido  DECIMAL(14,2) NOT NULL DEFAULT 0,
+    cuotas         INT           NOT NULL DEFAULT 0,
+    KEY idx_cac_vencido (total_vencido)
+);
@@ -0,0 +1,31 @@
+-- core/sql/005_mora_devengo.sql
+-- Devengo diario de mora (core/services/mora_service.py).
+--   - mora_devengo: una fila por cuota y fecha devengada; la PK hace que
+--     una fecha no se pueda devengar dos veces sobre la misma cuota.
+--     `aplicado` marca si el monto ya se sumó a cuota.saldo_cuota; se
+--     marca en la misma sentencia que lo suma, así que volver a correr una
+--     fecha (reiniciando su mora_corrida) no suma la mora otra vez.
+--   - mora_corrida: una fila por fecha con la marca de avance (ultimo_id);
+--     se actualiza en la misma transacción de cada lote, así que una
+--     corrida interrumpida continúa desde el último lote confirmado.
+-- Comando: python manage.py devengar_mora [--fecha AAAA-MM-DD]
+
+CREATE TABLE mora_devengo (
+    cuota_id  BIGINT        NOT NULL,
+    fecha     DATE          NOT NULL,
+    base      DECIMAL(12,2) NOT NULL,
+    monto     DECIMAL(12,2) NOT NULL,
+    aplicado  TINYINT(1)    NOT NULL DEFAULT 0,
+    PRIMARY KEY (cuota_id, fecha),
+    KEY idx_mora_devengo_fecha (fecha, cuota_id)
+);
+
+CREATE TABLE mora_corrida (
+    fecha      DATE          NOT NULL PRIMARY KEY,
+    ultimo_id  BIGINT        NOT NULL DEFAULT 0,
+    cuotas     INT           NOT NULL DEFAULT 0,
+    monto      DECIMAL(14,2) NOT NULL DEFAULT 0,
+    iniciada   DATETIME      NOT NULL,
+    terminada  DATETIME      NULL
+);
+
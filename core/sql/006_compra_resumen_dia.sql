@@ -0,0 +1,36 @@
+-- core/sql/006_compra_resumen_dia.sql
+-- Rollups diarios de compras para el dashboard (día local America/Guatemala).
+-- Mantenidos por core/services/purchase_rollup_service.py:
+--   - aplicar_compra(compra, estado, signo): lo llaman registrar_compra
+--     (+1 en REGISTRADA) y anular_compra (-1 en el estado anterior, +1 en
+--     ANULADA), en la misma transacción que la compra.
+--   - reconstruir_rollups(desde): regenera desde compra / compra_detalle.
+-- Comando: python manage.py reconstruir_resumen_compras [--desde AAAA-MM-DD]
+-- El id sustituto es solo para el ORM; la llave real es el UNIQUE.
+
+CREATE TABLE compra_resumen_dia (
+    id            BIGINT        NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    fecha         DATE          NOT NULL,
+    proveedor_id  INT           NOT NULL,
+    bodega_id     INT           NOT NULL,
+    estado        VARCHAR(10)   NOT NULL,
+    compras       INT           NOT NULL DEFAULT 0,
+    total         DECIMAL(16,2) NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_crd (fecha, proveedor_id, bodega_id, estado),
+    KEY idx_crd_proveedor (proveedor_id, fecha),
+    KEY idx_crd_bodega (bodega_id, fecha)
+);
+
+CREATE TABLE compra_producto_dia (
+    id            BIGINT        NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    fecha         DATE          NOT NULL,
+    proveedor_id  INT           NOT NULL,
+    bodega_id     INT           NOT NULL,
+    producto_id   INT           NOT NULL,
+    estado        VARCHAR(10)   NOT NULL,
+    cantidad      DECIMAL(18,4) NOT NULL DEFAULT 0,
+    costo         DECIMAL(16,2) NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_cpd (fecha, proveedor_id, bodega_id, producto_id, estado),
+    KEY idx_cpd_proveedor (proveedor_id, fecha),
+    KEY idx_cpd_bodega (bodega_id, fecha)
+);
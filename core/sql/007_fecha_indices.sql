@@ -0,0 +1,20 @@
+-- core/sql/007_fecha_indices.sql
+-- Índices para los filtros fecha_desde / fecha_hasta de compras y kardex.
+--
+-- core/services/date_range.py traduce los días locales a
+--   fecha >= :inicio AND fecha < :fin
+-- sobre la columna sin funciones, así que MySQL puede hacer un range scan
+-- sobre estos índices (con fecha__date no podía: DATE(CONVERT_TZ(fecha))).
+--
+--   compras: solo fechas      -> idx_compra_fecha_id
+--   compras: proveedor_id = ? -> idx_compra_proveedor_fecha
+--   compras: bodega_id = ?    -> idx_compra_bodega_fecha
+--   kardex: producto_id = ?   -> idx_movinv_producto_fecha (orden fecha, id)
+--
+-- Verificación: python manage.py verificar_planes (y core/tests/test_planes.py
+-- con MySQL).
+
+CREATE INDEX idx_compra_fecha_id ON compra (fecha, id);
+CREATE INDEX idx_compra_proveedor_fecha ON compra (proveedor_id, fecha, id);
+CREATE INDEX idx_compra_bodega_fecha ON compra (bodega_id, fecha, id);
+CREATE INDEX idx_movinv_producto_fecha ON movimientoinventario (producto_id, fecha, id);
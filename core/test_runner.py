@@ -0,0 +1,26 @@
+# core/test_runner.py
+"""
+Runner de pruebas para los modelos managed=False.
+
+Las tablas de la app existen en la BD (core/sql/*.sql) y Django no las
+crea. En la BD de pruebas el runner marca esos modelos como managed=True
+antes de crearla, así que se generan desde los modelos (también en SQLite,
+ver erp/settings_test.py). Las vistas de BD (v_cartera_aging) quedan como
+tablas comunes que cada prueba llena.
+"""
+
+from django.apps import apps
+from django.test.runner import DiscoverRunner
+
+
+class UnmanagedModelsTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        self.no_administrados = [m for m in apps.get_models() if not m._meta.managed]
+        for modelo in self.no_administrados:
+            modelo._meta.managed = True
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        for modelo in self.no_administrados:
+            modelo._meta.managed = False
@@ -0,0 +1,116 @@
+# core/tests/datos.py
+"""Datos mínimos compartidos por las pruebas (tablas creadas por el runner)."""
+
+import re
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+from django.db import connection
+from django.utils import timezone
+
+from core.models import (
+    Acuerdopago,
+    Bodega,
+    Cliente,
+    Cuota,
+    Producto,
+    Usuario,
+    Venta,
+)
+
+SQL_DIR = Path(__file__).resolve().parent.parent / "sql"
+
+
+def usuario(username="pruebas") -> Usuario:
+    return Usuario.objects.create(
+        username=username, nombre=username, password_hash="x", activo=1
+    )
+
+
+def bodega(nombre="Central") -> Bodega:
+    return Bodega.objects.create(nombre=nombre, activo=1)
+
+
+def cliente(nombre="Cliente") -> Cliente:
+    return Cliente.objects.create(nombre=nombre, estado="ACTIVO")
+
+
+def producto(sku="SKU-1", requiere_serie=False) -> Producto:
+    return Producto.objects.create(
+        sku=sku,
+        nombre=f"Producto {sku}",
+        requiere_serie=int(requiere_serie),
+        costo_ref=Decimal("1.00"),
+        precio_base=Decimal("1.00"),
+        activo=1,
+    )
+
+
+def venta(cliente_id, usuario_id, bodega_id, total=Decimal("1000.00")) -> Venta:
+    return Venta.objects.create(
+        fecha=timezone.now(),
+        cliente_id=cliente_id,
+        usuario_id=usuario_id,
+        bodega_id=bodega_id,
+        tipo_pago="CREDITO",
+        total=total,
+        estado="EMITIDA",
+    )
+
+
+def acuerdo(venta_id, **campos) -> Acuerdopago:
+    valores = {
+        "tipo": "FRANCES",
+        "capital": Decimal("1000.00"),
+        "interes_anual": Decimal("12.000"),
+        "cuotas": 3,
+        "periodicidad": "MENSUAL",
+        "fecha_inicio": date(2025, 1, 1),
+        "mora_diaria": Decimal("0.0010"),
+        "estado": "ACTIVO",
+    }
+    valores.update(campos)
+    return Acuerdopago.objects.create(venta_id=venta_id, **valores)
+
+
+def cuota(acuerdo_id, no_cuota, saldo, interes="0.00", capital=None, **campos):
+    """Cuota con `saldo`; por defecto todo el saldo es capital programado."""
+    saldo = Decimal(saldo)
+    capital = saldo - Decimal(interes) if capital is None else Decimal(capital)
+    valores = {
+        "fecha_venc": date(2025, 1, 1),
+        "capital_prog": capital,
+        "interes_prog": Decimal(interes),
+        "total_prog": capital + Decimal(interes),
+        "saldo_cuota": saldo,
+        "estado": "PENDIENTE",
+    }
+    valores.update(campos)
+    return Cuota.objects.create(acuerdo_id=acuerdo_id, no_cuota=no_cuota, **valores)
+
+
+def ejecutar_sql(nombre):
+    """Ejecuta las sentencias de core/sql/`nombre` (tablas sin modelo)."""
+    texto = (SQL_DIR / nombre).read_text(encoding="utf-8")
+    lineas = [
+        linea for linea in texto.splitlines() if not linea.lstrip().startswith("--")
+    ]
+    with connection.cursor() as cur:
+        for sentencia in "\n".join(lineas).split(";"):
+            if sentencia.strip():
+                cur.execute(sentencia)
+
+
+def borrar_tablas(*tablas):
+    with connection.cursor() as cur:
+        for tabla in tablas:
+            cur.execute(f"DROP TABLE IF EXISTS {tabla}")
+
+
+def borrar_indices(nombre):
+    """Deshace los CREATE INDEX de core/sql/`nombre`."""
+    texto = (SQL_DIR / nombre).read_text(encoding="utf-8")
+    with connection.cursor() as cur:
+        for indice, tabla in re.findall(r"CREATE INDEX (\w+)\s+ON (\w+)", texto):
+            cur.execute(f"DROP INDEX {indice} ON {tabla}")
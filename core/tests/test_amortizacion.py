@@ -0,0 +1,167 @@
+# core/tests/test_amortizacion.py
+from datetime import date
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Acuerdopago, AplicacionPago, Cuota, Pago
+from core.services.amortization_service import (
+    AmortizacionError,
+    calcular_plan,
+    generar_planes,
+)
+from core.tests import datos
+
+D = Decimal
+
+
+def _plan(tipo, capital, interes_anual, cuotas, periodicidad="MENSUAL"):
+    return calcular_plan(
+        tipo=tipo,
+        capital=D(capital),
+        interes_anual=D(interes_anual),
+        cuotas=cuotas,
+        periodicidad=periodicidad,
+        fecha_inicio=date(2025, 1, 31),
+    )
+
+
+class CalcularPlanTests(SimpleTestCase):
+    def test_frances_cuota_fija_y_ultima_absorbe_redondeo(self):
+        plan = _plan("FRANCES", "1000.00", "12", 3)
+
+        self.assertEqual(
+            [fila[2:] for fila in plan],
+            [
+                (D("330.02"), D("10.00"), D("340.02")),
+                (D("333.32"), D("6.70"), D("340.02")),
+                (D("336.66"), D("3.37"), D("340.03")),
+            ],
+        )
+        self.assertEqual(sum(fila[2] for fila in plan), D("1000.00"))
+
+    def test_frances_suma_el_capital(self):
+        plan = _plan("FRANCES", "1000.00", "18", 12)
+
+        self.assertEqual(sum(fila[2] for fila in plan), D("1000.00"))
+        self.assertEqual({fila[4] for fila in plan[:-1]}, {D("91.68")})
+        self.assertEqual(plan[-1][4], D("91.66"))
+        for _no, _fecha, capital, interes, total in plan:
+            self.assertEqual(capital + interes, total)
+
+    def test_frances_sin_interes(self):
+        plan = _plan("FRANCES", "100.00", "0", 3, "SEMANAL")
+
+        self.assertEqual(
+            [fila[2] for fila in plan], [D("33.33"), D("33.33"), D("33.34")]
+        )
+        self.assertEqual({fila[3] for fila in plan}, {D("0.00")})
+
+    def test_flat_reparte_capital_e_interes_y_ultima_absorbe(self):
+        # interés total = 1000 * 10% / 12 * 3 = 25.00
+        plan = _plan("FLAT", "1000.00", "10", 3)
+
+        self.assertEqual(
+            [fila[2:] for fila in plan],
+            [
+                (D("333.33"), D("8.33"), D("341.66")),
+                (D("333.33"), D("8.33"), D("341.66")),
+                (D("333.34"), D("8.34"), D("341.68")),
+            ],
+        )
+        self.assertEqual(sum(fila[2] for fila in plan), D("1000.00"))
+        self.assertEqual(sum(fila[3] for fila in plan), D("25.00"))
+
+    def test_fechas_mensuales_ajustadas_a_fin_de_mes(self):
+        plan = _plan("FLAT", "300.00", "12", 3)
+
+        self.assertEqual(
+            [fila[:2] for fila in plan],
+            [
+                (1, date(2025, 2, 28)),
+                (2, date(2025, 3, 31)),
+                (3, date(2025, 4, 30)),
+            ],
+        )
+
+    def test_parametros_invalidos(self):
+        for tipo, capital, cuotas, periodicidad in (
+            ("ALEMAN", "100.00", 3, "MENSUAL"),
+            ("FLAT", "0.00", 3, "MENSUAL"),
+            ("FLAT", "100.00", 0, "MENSUAL"),
+            ("FLAT", "100.00", 3, "ANUAL"),
+        ):
+            with self.subTest(tipo=tipo, capital=capital, cuotas=cuotas):
+                with self.assertRaises(AmortizacionError):
+                    _plan(tipo, capital, "12", cuotas, periodicidad)
+
+
+@skipUnless(connection.vendor == "mysql", "SELECT ... FOR UPDATE de MySQL")
+@mock.patch("core.services.amortization_service.refrescar_cuotas")
+class GenerarPlanesTests(TestCase):
+    """La regeneración no borra cuotas con pagos aplicados o mora devengada."""
+
+    @classmethod
+    def setUpClass(cls):
+        # DDL fuera de la transacción de la clase (MySQL hace commit implícito)
+        datos.ejecutar_sql("005_mora_devengo.sql")
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        datos.borrar_tablas("mora_devengo", "mora_corrida")
+
+    @classmethod
+    def setUpTestData(cls):
+        usuario = datos.usuario()
+        cliente = datos.cliente()
+        venta = datos.venta(cliente.id, usuario.id, datos.bodega().id)
+        cls.libre, cls.pagado, cls.con_mora = (
+            datos.acuerdo(venta.id).id for _ in range(3)
+        )
+        cuotas = {
+            acuerdo_id: datos.cuota(acuerdo_id, 1, "1000.00").id
+            for acuerdo_id in (cls.libre, cls.pagado, cls.con_mora)
+        }
+        pago = Pago.objects.create(
+            cliente_id=cliente.id,
+            metodo="EFECTIVO",
+            monto_total=D("10.00"),
+            usuario_id=usuario.id,
+        )
+        AplicacionPago.objects.create(
+            pago=pago, cuota_id=cuotas[cls.pagado], monto=D("10.00"), tipo="CAPITAL"
+        )
+        with connection.cursor() as cur:
+            cur.execute(
+                "INSERT INTO mora_devengo (cuota_id, fecha, base, monto, aplicado) "
+                "VALUES (%s, %s, 1000.00, 1.00, 1)",
+                [cuotas[cls.con_mora], date(2025, 2, 1)],
+            )
+        cls.cuotas = cuotas
+
+    def test_omite_acuerdos_con_pagos_o_mora(self, _refrescar):
+        res = generar_planes(
+            acuerdo_ids=[self.libre, self.pagado, self.con_mora],
+            interes_anual=D("24"),
+        )
+
+        self.assertEqual(res["acuerdos"], 1)
+        self.assertEqual(res["cuotas"], 3)
+        self.assertEqual(res["con_movimientos"], sorted([self.pagado, self.con_mora]))
+        self.assertEqual(Cuota.objects.filter(acuerdo_id=self.libre).count(), 3)
+        for acuerdo_id in (self.pagado, self.con_mora):
+            self.assertEqual(
+                list(
+                    Cuota.objects.filter(acuerdo_id=acuerdo_id).values_list(
+                        "id", flat=True
+                    )
+                ),
+                [self.cuotas[acuerdo_id]],
+            )
+        self.assertEqual(
+            Acuerdopago.objects.get(pk=self.pagado).interes_anual, D("12.000")
+        )
@@ -0,0 +1,199 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core.models import (
+    Bodega,
+    CarteraAgingBucket,
+    CarteraAgingCliente,
+    Compra,
+    CompraDetalle,
+    Producto,
+    Proveedor,
+    Usuario,
+    VCarteraAging,
+)
+from core.services.cartera_service import BUCKETS
+
+
+class ComprasConsultasTests(APITestCase):
+    """
+    Cantidad fija de consultas en el listado y detalle de compras, sin
+    importar cuántas compras, detalles o productos tenga la página.
+    """
+
+    COMPRAS = 12
+    DETALLES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("consultas", password="x")
+        usuario = Usuario.objects.create(
+            username="consultas", nombre="Consultas", password_hash="x", activo=1
+        )
+        cls.proveedor = Proveedor.objects.create(nombre="Proveedor", estado="ACTIVO")
+        otro = Proveedor.objects.create(nombre="Otro", estado="ACTIVO")
+        bodega = Bodega.objects.create(nombre="Central", activo=1)
+        productos = Producto.objects.bulk_create(
+            [
+                Producto(
+                    sku=f"SKU-{i}",
+                    nombre=f"Producto {i}",
+                    requiere_serie=0,
+                    costo_ref=1,
+                    precio_base=1,
+                    activo=1,
+                )
+                for i in range(cls.DETALLES * 2)
+            ]
+        )
+        ahora = timezone.now()
+        for i in range(cls.COMPRAS):
+            compra = Compra.objects.create(
+                proveedor=cls.proveedor if i % 2 else otro,
+                bodega=bodega,
+                fecha=ahora - timedelta(hours=i),
+                no_documento=f"F-{i}",
+                total=Decimal("30.00"),
+                usuario=usuario,
+                estado="REGISTRADA",
+            )
+            CompraDetalle.objects.bulk_create(
+                [
+                    CompraDetalle(
+                        compra=compra,
+                        producto=productos[(i + j) % len(productos)],
+                        cantidad=1,
+                        costo_unit=10,
+                        subtotal=10,
+                    )
+                    for j in range(cls.DETALLES)
+                ]
+            )
+        cls.compra = compra
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def _get(self, url, consultas, **params):
+        with self.assertNumQueries(consultas):
+            resp = self.client.get(url, params)
+        self.assertEqual(resp.status_code, 200)
+        return resp.data
+
+    def test_listado(self):
+        # cantidad/total + ids del filtro + página con proveedor/bodega/usuario
+        # + detalles
+        data = self._get("/api/v1/compras/", 4)
+        self.assertEqual(data["count"], self.COMPRAS)
+        self.assertEqual(len(data["results"][0]["detalles"]), self.DETALLES)
+        # Con los ids en caché solo se leen la página y sus detalles
+        self._get("/api/v1/compras/", 2)
+
+    def test_listado_sin_detalles(self):
+        data = self._get("/api/v1/compras/", 3, detalles="false")
+        self.assertNotIn("detalles", data["results"][0])
+        self._get("/api/v1/compras/", 1, detalles="false")
+
+    def test_detalle(self):
+        data = self._get(f"/api/v1/compras/{self.compra.pk}/", 2)
+        self.assertEqual(len(data["detalles"]), self.DETALLES)
+
+    def test_sin_modificacion_directa(self):
+        # Solo registrar y anular mantienen inventario y rollups
+        url = f"/api/v1/compras/{self.compra.pk}/"
+        for metodo in (self.client.put, self.client.patch, self.client.delete):
+            self.assertEqual(metodo(url, {"estado": "ANULADA"}).status_code, 405)
+
+    def test_compras_por_proveedor(self):
+        url = f"/api/v1/proveedores/{self.proveedor.pk}/compras/"
+        data = self._get(url, 4)
+        self.assertEqual(data["count"], self.COMPRAS // 2)
+        self._get(url, 2)
+
+    @override_settings(COMPRAS_CACHE_MAX_IDS=5)
+    def test_listado_sin_ids_en_cache(self):
+        # Más compras que el límite: solo el agregado, sin leer los ids, y
+        # paginación normal (COUNT + página + detalles)
+        data = self._get("/api/v1/compras/", 4)
+        self.assertEqual(data["count"], self.COMPRAS)
+
+
+class CarteraConsultasTests(APITestCase):
+    """
+    Estado de cuenta y dashboard de cartera con consultas fijas, sin
+    importar cuántas cuotas o clientes haya.
+    """
+
+    CLIENTES = 8
+    CUOTAS = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("cartera", password="x")
+        hoy = timezone.localdate()
+        VCarteraAging.objects.bulk_create(
+            [
+                VCarteraAging(
+                    cuota_id=cliente * 100 + n,
+                    cliente_id=cliente,
+                    cliente=f"Cliente {cliente}",
+                    fecha_venc=hoy - timedelta(days=n * 20),
+                    dias_vencidos=n * 20,
+                    saldo=Decimal("100.00"),
+                    bucket=BUCKETS[min(n, len(BUCKETS) - 1)],
+                )
+                for cliente in range(1, cls.CLIENTES + 1)
+                for n in range(cls.CUOTAS)
+            ]
+        )
+        CarteraAgingBucket.objects.bulk_create(
+            [CarteraAgingBucket(bucket=b, saldo=100, cuotas=1) for b in BUCKETS]
+        )
+        CarteraAgingCliente.objects.bulk_create(
+            [
+                CarteraAgingCliente(
+                    cliente_id=c,
+                    cliente=f"Cliente {c}",
+                    total_deuda=c * 10,
+                    total_vencido=c * 5,
+                    cuotas=cls.CUOTAS,
+                )
+                for c in range(1, cls.CLIENTES + 1)
+            ]
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def _get(self, url, consultas, **params):
+        with self.assertNumQueries(consultas):
+            resp = self.client.get(url, params)
+        self.assertEqual(resp.status_code, 200)
+        return resp.data
+
+    def test_estado_cuenta(self):
+        # Totales por bucket + cuotas
+        data = self._get("/api/v1/clientes/1/estado-cuenta/", 2)
+        self.assertEqual(len(data["cuotas"]), self.CUOTAS)
+        self.assertEqual(data["resumen"]["total_deuda"], "1000.00")
+        data = self._get("/api/v1/clientes/1/estado-cuenta/", 2, solo_vencidas="1")
+        self.assertEqual(len(data["cuotas"]), self.CUOTAS - 1)
+
+    def test_estado_cuenta_sin_cuotas(self):
+        data = self._get("/api/v1/clientes/999/estado-cuenta/", 1)
+        self.assertEqual(data["cuotas"], [])
+
+    def test_dashboard(self):
+        # Totales por bucket + top morosos, desde el snapshot o la vista
+        data = self._get("/api/v1/cartera/dashboard/", 2)
+        self.assertEqual(len(data["top_morosos"]), 5)
+        self.assertEqual(data["top_morosos"][0]["cliente_id"], self.CLIENTES)
+        data = self._get("/api/v1/cartera/dashboard/", 2, fuente="vista")
+        self.assertEqual(len(data["top_morosos"]), 5)
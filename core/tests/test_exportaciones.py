@@ -0,0 +1,129 @@
+import gzip
+import json
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core.models import Venta, Ventadetalle
+from core.services.export_job_service import encolar
+from core.tests import datos
+
+
+class ExportacionFiltrosTests(APITestCase):
+    """
+    Los filtros se validan antes de empezar el streaming: un valor inválido
+    es 400, no un archivo cortado con status 200.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("export", password="x")
+        usuario, bodega, producto = datos.usuario(), datos.bodega(), datos.producto()
+        cls.clientes = [datos.cliente("A"), datos.cliente("B")]
+        for c in cls.clientes:
+            venta = Venta.objects.create(
+                fecha=timezone.now(),
+                cliente=c,
+                usuario=usuario,
+                bodega=bodega,
+                tipo_pago="CONTADO",
+                total=Decimal("10.00"),
+                estado="EMITIDA",
+            )
+            Ventadetalle.objects.create(
+                venta=venta,
+                producto=producto,
+                cantidad=1,
+                precio_unit=Decimal("10.00"),
+                impuesto=0,
+                descuento=0,
+            )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def _cuerpo(self, resp) -> bytes:
+        return b"".join(resp.streaming_content)
+
+    def test_filtros_invalidos(self):
+        casos = [
+            ("/api/v1/exportar/ventas/", {"cliente_id": "abc"}),
+            ("/api/v1/exportar/ventas/", {"fecha_desde": "2025-13-01"}),
+            ("/api/v1/exportar/pedidos/", {"bodega_id": "1x"}),
+            ("/api/v1/exportar/kardex/", {"fecha_hasta": "ayer"}),
+            ("/api/v1/exportar/compras/", {"proveedor_id": "abc"}),
+            ("/api/v1/compras/exportar/", {"proveedor_id": "abc"}),
+        ]
+        for url, params in casos:
+            for formato in ("csv", "jsonl"):
+                with self.subTest(url=url, params=params, formato=formato):
+                    resp = self.client.get(url, {"formato": formato, **params})
+                    self.assertEqual(resp.status_code, 400)
+                    nombre = next(iter(params))
+                    self.assertIn(nombre, resp.data["detail"])
+
+    def test_filtro_canonico(self):
+        cliente_id = self.clientes[0].pk
+        resp = self.client.get(
+            "/api/v1/exportar/ventas/",
+            {"formato": "jsonl", "cliente_id": f"0{cliente_id}", "otro": "x"},
+        )
+        self.assertEqual(resp.status_code, 200)
+        filas = [json.loads(l) for l in self._cuerpo(resp).splitlines()]
+        self.assertEqual([f["cliente_id"] for f in filas], [cliente_id])
+
+    def test_csv(self):
+        resp = self.client.get("/api/v1/exportar/ventas/", {"formato": "csv"})
+        self.assertEqual(resp.status_code, 200)
+        lineas = gzip.decompress(self._cuerpo(resp)).decode().splitlines()
+        self.assertEqual(len(lineas), 1 + len(self.clientes))
+        self.assertTrue(lineas[0].startswith("venta_id,fecha,cliente_id"))
+
+
+@override_settings(EXPORT_DIR=tempfile.mkdtemp(prefix="erp-export-test-"))
+@mock.patch("core.services.export_job_service._executor")
+class ExportacionTrabajosTests(APITestCase):
+    """Filtros de los trabajos en segundo plano: validados y canónicos al encolar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("trabajos", password="x")
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_filtro_invalido_no_se_encola(self, executor):
+        for recurso, params in (
+            ("ventas", {"cliente_id": "abc"}),
+            ("kardex", {"fecha_desde": "2025-02-30"}),
+            ("compras", {"bodega_id": "x"}),
+        ):
+            with self.subTest(recurso=recurso):
+                resp = self.client.post(
+                    f"/api/v1/exportar/{recurso}/", {"formato": "csv", **params}
+                )
+                self.assertEqual(resp.status_code, 400)
+        resp = self.client.post(
+            "/api/v1/compras/exportar/", {"formato": "xlsx", "proveedor_id": "abc"}
+        )
+        self.assertEqual(resp.status_code, 400)
+        executor.return_value.submit.assert_not_called()
+
+    def test_misma_llave_para_filtros_equivalentes(self, executor):
+        ids = set()
+        for params in (
+            {"cliente_id": "5", "estado": "emitida"},
+            {"cliente_id": "05", "estado": "EMITIDA ", "ignorado": "1"},
+        ):
+            estado = encolar("ventas", "jsonl", params)
+            self.assertEqual(
+                estado["filtros"], {"cliente_id": "5", "estado": "EMITIDA"}
+            )
+            ids.add(estado["id"])
+        self.assertEqual(len(ids), 1)
+        executor.return_value.submit.assert_called_once()
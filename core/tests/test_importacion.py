@@ -0,0 +1,190 @@
+# core/tests/test_importacion.py
+import io
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Existencia
+from core.services import order_import_service
+from core.services.order_import_service import (
+    IMPORT_LOTE_PEDIDOS,
+    PedidoError,
+    _importar,
+    importar_pedidos,
+    leer_csv,
+    leer_jsonl,
+)
+from core.tests import datos
+
+
+def _ids(cur, cabeceras, detalles, marca):
+    """Ids ficticios en lugar del INSERT (LAST_INSERT_ID es de MySQL)."""
+    _ids.siguiente += len(cabeceras)
+    return list(range(_ids.siguiente - len(cabeceras), _ids.siguiente))
+
+
+@mock.patch.object(order_import_service, "_insertar_pedidos", side_effect=_ids)
+class ImportarPedidosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario_id = datos.usuario().id
+        cls.cliente_id = datos.cliente().id
+        cls.bodega_id = datos.bodega().id
+        cls.producto_id = datos.producto().id
+        Existencia.objects.create(
+            producto_id=cls.producto_id,
+            bodega_id=cls.bodega_id,
+            cantidad=Decimal("100"),
+            reservado=Decimal("0"),
+        )
+
+    def setUp(self):
+        _ids.siguiente = 1
+
+    def _pedido(self, ref, cantidad=1, **campos):
+        pedido = {
+            "ref": ref,
+            "cliente_id": self.cliente_id,
+            "bodega_id": self.bodega_id,
+            "items": [
+                {
+                    "producto_id": self.producto_id,
+                    "cantidad": cantidad,
+                    "precio_unitario": "2.50",
+                }
+            ],
+        }
+        pedido.update(campos)
+        return pedido
+
+    def _jsonl(self, *lineas):
+        texto = "\n".join(
+            linea if isinstance(linea, str) else json.dumps(linea) for linea in lineas
+        )
+        return leer_jsonl(io.StringIO(texto))
+
+    def _importar(self, registros, lote=IMPORT_LOTE_PEDIDOS):
+        return list(_importar(registros, self.usuario_id, lote))
+
+    def test_lineas_jsonl_malformadas_se_reportan_por_linea(self, insertar):
+        resultados = self._importar(
+            self._jsonl(
+                self._pedido("A"),
+                '{"ref": "B", ',
+                "[1, 2]",
+                self._pedido("D", items=[]),
+                self._pedido("E", cantidad="x"),
+                self._pedido("F"),
+            )
+        )
+
+        self.assertEqual(
+            [(r["linea"], r["ok"]) for r in resultados],
+            [(1, True), (2, False), (3, False), (4, False), (5, False), (6, True)],
+        )
+        self.assertTrue(resultados[1]["detail"].startswith("JSON inválido"))
+        self.assertEqual(resultados[2]["detail"], "Se esperaba un objeto JSON.")
+        self.assertEqual(
+            resultados[3]["detail"], "El pedido requiere al menos un ítem."
+        )
+        self.assertTrue(resultados[4]["detail"].startswith("Datos inválidos"))
+        self.assertEqual(
+            [r.get("pedido_id") for r in resultados], [1] + [None] * 4 + [2]
+        )
+        insertar.assert_called_once()
+
+    def test_filas_csv_malformadas(self, insertar):
+        csv = (
+            "ref,cliente_id,bodega_id,producto_id,cantidad,precio_unitario\n"
+            f"A,{self.cliente_id},{self.bodega_id},{self.producto_id},1,2.50\n"
+            f"B,{self.cliente_id},{self.bodega_id},{self.producto_id},1,2.50\n"
+            f"B,{self.cliente_id},{self.bodega_id},{self.producto_id},uno,2.50\n"
+            f"C,abc,{self.bodega_id},{self.producto_id},1,2.50\n"
+        )
+
+        resultados = self._importar(leer_csv(io.StringIO(csv)))
+
+        self.assertEqual(
+            [(r["ref"], r["linea"], r["ok"]) for r in resultados],
+            [("A", 2, True), ("B", 3, False), ("C", 5, False)],
+        )
+
+    def test_csv_sin_columnas_es_un_solo_error(self, insertar):
+        resultados = self._importar(leer_csv(io.StringIO("ref,cliente_id\nA,1\n")))
+
+        self.assertEqual(len(resultados), 1)
+        self.assertIsNone(resultados[0]["linea"])
+        self.assertIn("producto_id", resultados[0]["detail"])
+        insertar.assert_not_called()
+
+    def test_lotes_de_500_pedidos(self, insertar):
+        registros = self._jsonl(
+            *(self._pedido(f"P{n}") for n in range(2 * IMPORT_LOTE_PEDIDOS + 1))
+        )
+
+        with CaptureQueriesContext(connection) as consultas:
+            resultados = self._importar(registros)
+
+        # Existencias una vez por importación; clientes y bodegas por lote
+        tablas = [
+            q["sql"].split(" FROM ")[1].split()[0]
+            for q in consultas.captured_queries
+            if q["sql"].startswith("SELECT")
+        ]
+        self.assertEqual(tablas.count("existencia"), 1)
+        self.assertEqual(tablas.count("cliente"), 3)
+
+        self.assertEqual(
+            [len(c.args[1]) for c in insertar.call_args_list],
+            [IMPORT_LOTE_PEDIDOS, IMPORT_LOTE_PEDIDOS, 1],
+        )
+        self.assertEqual(
+            [r["pedido_id"] for r in resultados],
+            list(range(1, 2 * IMPORT_LOTE_PEDIDOS + 2)),
+        )
+        self.assertEqual(resultados[-1]["linea"], 2 * IMPORT_LOTE_PEDIDOS + 1)
+
+    def test_lote_con_pedidos_invalidos_inserta_los_validos(self, insertar):
+        resultados = self._importar(
+            self._jsonl(
+                self._pedido("A"),
+                self._pedido("B", cantidad=101),
+                self._pedido("C", cliente_id=999999),
+                self._pedido("D", cantidad=100),
+            )
+        )
+
+        self.assertEqual([r["ok"] for r in resultados], [True, False, False, True])
+        (faltante,) = resultados[1]["faltantes"]
+        self.assertEqual(faltante["producto_id"], self.producto_id)
+        self.assertEqual(
+            (Decimal(faltante["existencia"]), Decimal(faltante["solicitado"])),
+            (Decimal("100"), Decimal("101")),
+        )
+        self.assertEqual(resultados[2]["detail"], "Cliente 999999 no existe.")
+        (llamada,) = insertar.call_args_list
+        self.assertEqual(
+            [cabecera[6] for cabecera in llamada.args[1]],
+            ["IMPORTACION REF A", "IMPORTACION REF D"],
+        )
+
+    def test_error_de_bd_solo_afecta_a_su_lote(self, insertar):
+        insertar.side_effect = [[1, 2], DatabaseError("sin conexión"), [5, 6]]
+
+        resultados = self._importar(
+            self._jsonl(*(self._pedido(f"P{n}") for n in range(6))), lote=2
+        )
+
+        self.assertEqual(
+            [(r["ok"], r.get("pedido_id")) for r in resultados],
+            [(True, 1), (True, 2), (False, None), (False, None), (True, 5), (True, 6)],
+        )
+        self.assertEqual(resultados[2]["detail"], "sin conexión")
+
+    def test_formato_no_soportado(self, insertar):
+        with self.assertRaises(PedidoError):
+            importar_pedidos(io.StringIO(""), "xml", "pruebas")
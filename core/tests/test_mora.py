@@ -0,0 +1,95 @@
+# core/tests/test_mora.py
+from datetime import date
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Cuota
+from core.services.mora_service import devengar_mora
+from core.tests import datos
+
+D = Decimal
+
+
+@skipUnless(connection.vendor == "mysql", "INSERT IGNORE / UPDATE ... JOIN de MySQL")
+@mock.patch("core.services.mora_service.refrescar_cuotas")
+class DevengarMoraTests(TestCase):
+    """Volver a correr una fecha no suma la mora otra vez."""
+
+    @classmethod
+    def setUpClass(cls):
+        # DDL fuera de la transacción de la clase (MySQL hace commit implícito)
+        datos.ejecutar_sql("005_mora_devengo.sql")
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        datos.borrar_tablas("mora_devengo", "mora_corrida")
+
+    @classmethod
+    def setUpTestData(cls):
+        usuario = datos.usuario()
+        venta = datos.venta(datos.cliente().id, usuario.id, datos.bodega().id)
+        acuerdo = datos.acuerdo(venta.id, mora_diaria=D("0.0100"))
+        cls.vencidas = [
+            datos.cuota(acuerdo.id, no, "100.00", fecha_venc=date(2025, 1, 1)).id
+            for no in (1, 2, 3)
+        ]
+        cls.al_dia = datos.cuota(
+            acuerdo.id, 4, "100.00", fecha_venc=date(2025, 12, 31)
+        ).id
+
+    def _saldos(self):
+        return dict(Cuota.objects.values_list("id", "saldo_cuota"))
+
+    def _devengos(self):
+        with connection.cursor() as cur:
+            cur.execute(
+                "SELECT cuota_id, fecha, monto, aplicado FROM mora_devengo "
+                "ORDER BY cuota_id, fecha"
+            )
+            return cur.fetchall()
+
+    def test_devenga_solo_cuotas_vencidas(self, _refrescar):
+        lotes = list(devengar_mora(date(2025, 2, 1), lote=2))
+
+        self.assertEqual(sum(m["cuotas"] for m in lotes), 3)
+        self.assertEqual(sum(m["monto"] for m in lotes), D("3.00"))
+        saldos = self._saldos()
+        self.assertEqual([saldos[i] for i in self.vencidas], [D("101.00")] * 3)
+        self.assertEqual(saldos[self.al_dia], D("100.00"))
+
+    def test_dos_corridas_el_mismo_dia(self, _refrescar):
+        list(devengar_mora(date(2025, 2, 1)))
+
+        self.assertEqual(list(devengar_mora(date(2025, 2, 1))), [])
+        self.assertEqual([self._saldos()[i] for i in self.vencidas], [D("101.00")] * 3)
+        self.assertEqual(len(self._devengos()), 3)
+
+    def test_reiniciar_la_corrida_no_vuelve_a_aplicar(self, _refrescar):
+        list(devengar_mora(date(2025, 2, 1)))
+        with connection.cursor() as cur:
+            cur.execute("DELETE FROM mora_corrida")
+
+        lotes = list(devengar_mora(date(2025, 2, 1)))
+
+        self.assertEqual(sum(m["monto"] for m in lotes), 0)
+        self.assertEqual([self._saldos()[i] for i in self.vencidas], [D("101.00")] * 3)
+        self.assertEqual({fila[3] for fila in self._devengos()}, {1})
+
+    def test_cada_dia_se_aplica_una_vez(self, _refrescar):
+        list(devengar_mora(date(2025, 2, 1)))
+        list(devengar_mora(date(2025, 2, 2)))
+
+        # La base excluye la mora ya devengada: 1.00 por día
+        self.assertEqual([self._saldos()[i] for i in self.vencidas], [D("102.00")] * 3)
+        self.assertEqual(
+            [(f[0], f[1], f[2]) for f in self._devengos()][:2],
+            [
+                (self.vencidas[0], date(2025, 2, 1), D("1.00")),
+                (self.vencidas[0], date(2025, 2, 2), D("1.00")),
+            ],
+        )
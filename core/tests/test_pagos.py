@@ -0,0 +1,236 @@
+# core/tests/test_pagos.py
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase
+
+from core.models import AplicacionPago, Caja, Cuota, MovimientoCaja, Pago
+from core.services.payment_batch_service import (
+    CAJA_ID,
+    _insertar_pagos,
+    registrar_pagos_lote,
+)
+from core.services.payment_service import (
+    PaymentError,
+    distribuir_monto,
+    registrar_pago_automatico,
+)
+from core.tests import datos
+
+D = Decimal
+
+
+def _fila(cuota_id, saldo, interes, capital, int_pag="0.00", cap_pag="0.00"):
+    """Fila como las de _bloquear_cuotas_abiertas."""
+    return (
+        cuota_id,
+        D(saldo),
+        D(interes),
+        D(capital),
+        D(int_pag),
+        D(cap_pag),
+        "PENDIENTE",
+    )
+
+
+def _partes(aplicaciones):
+    return [(a["cuota_id"], a["tipo_aplicacion"], a["monto"]) for a in aplicaciones]
+
+
+class DistribuirMontoTests(SimpleTestCase):
+    def test_mora_interes_capital_en_orden(self):
+        # saldo 115 = interés 10 + capital 100 + mora 5
+        cuotas = [_fila(1, "115.00", "10.00", "100.00")]
+
+        self.assertEqual(
+            _partes(distribuir_monto(D("12.00"), cuotas)),
+            [(1, "MORA", D("5.00")), (1, "INTERES", D("7.00"))],
+        )
+        self.assertEqual(
+            _partes(distribuir_monto(D("115.00"), cuotas)),
+            [
+                (1, "MORA", D("5.00")),
+                (1, "INTERES", D("10.00")),
+                (1, "CAPITAL", D("100.00")),
+            ],
+        )
+
+    def test_cuota_mas_antigua_primero(self):
+        cuotas = [
+            _fila(1, "60.00", "10.00", "50.00"),
+            _fila(2, "62.00", "10.00", "50.00"),
+        ]
+
+        self.assertEqual(
+            _partes(distribuir_monto(D("65.00"), cuotas)),
+            [
+                (1, "INTERES", D("10.00")),
+                (1, "CAPITAL", D("50.00")),
+                (2, "MORA", D("2.00")),
+                (2, "INTERES", D("3.00")),
+            ],
+        )
+
+    def test_descuenta_lo_ya_aplicado_por_tipo(self):
+        # Ya se pagaron 4 de interés y 20 de capital: quedan 6 y 30
+        cuotas = [_fila(1, "36.00", "10.00", "50.00", "4.00", "20.00")]
+
+        self.assertEqual(
+            _partes(distribuir_monto(D("36.00"), cuotas)),
+            [(1, "INTERES", D("6.00")), (1, "CAPITAL", D("30.00"))],
+        )
+
+    def test_sobrepago_no_supera_el_saldo(self):
+        cuotas = [
+            _fila(1, "40.00", "5.00", "30.00"),
+            _fila(2, "35.00", "5.00", "30.00"),
+        ]
+
+        aplicaciones = distribuir_monto(D("500.00"), cuotas)
+
+        por_cuota = {}
+        for a in aplicaciones:
+            por_cuota[a["cuota_id"]] = por_cuota.get(a["cuota_id"], 0) + a["monto"]
+        self.assertEqual(por_cuota, {1: D("40.00"), 2: D("35.00")})
+
+    def test_residuo_de_redondeo_va_a_capital(self):
+        # Pagos tipo CUOTA dejaron el saldo por debajo de lo programado:
+        # el interés se cubre completo y el capital toma el residuo.
+        cuotas = [_fila(1, "50.00", "33.33", "66.67")]
+
+        self.assertEqual(
+            _partes(distribuir_monto(D("50.00"), cuotas)),
+            [(1, "INTERES", D("33.33")), (1, "CAPITAL", D("16.67"))],
+        )
+
+    def test_suma_exacta_al_centavo(self):
+        cuotas = [_fila(i, "33.34", "3.33", "30.00") for i in range(1, 4)]
+
+        aplicaciones = distribuir_monto("100.01", cuotas)
+
+        self.assertEqual(sum(a["monto"] for a in aplicaciones), D("100.01"))
+        self.assertEqual(_partes(aplicaciones)[-1], (3, "CAPITAL", D("29.99")))
+
+
+class PagoAutomaticoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        usuario = datos.usuario()
+        cliente = datos.cliente()
+        venta = datos.venta(cliente.id, usuario.id, datos.bodega().id)
+        acuerdo = datos.acuerdo(venta.id)
+        datos.cuota(acuerdo.id, 1, "100.00")
+        cls.usuario_id = usuario.id
+        cls.cliente_id = cliente.id
+
+    def test_sobrepago_rechazado_sin_registrar_nada(self):
+        with self.assertRaises(PaymentError):
+            registrar_pago_automatico(
+                cliente_id=self.cliente_id,
+                metodo="EFECTIVO",
+                monto_total=D("100.01"),
+                referencia=None,
+                usuario_id=self.usuario_id,
+            )
+
+        self.assertFalse(Pago.objects.exists())
+        self.assertFalse(AplicacionPago.objects.exists())
+        self.assertEqual(Cuota.objects.get().saldo_cuota, D("100.00"))
+
+
+@mock.patch("core.services.payment_batch_service.refrescar_cuotas")
+class PagosLoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        usuario = datos.usuario()
+        cliente = datos.cliente()
+        venta = datos.venta(cliente.id, usuario.id, datos.bodega().id)
+        acuerdo = datos.acuerdo(venta.id)
+        cls.cuotas = [datos.cuota(acuerdo.id, no, "100.00").id for no in (1, 2, 3)]
+        Caja.objects.create(id=CAJA_ID, nombre="Principal", moneda="GTQ", activo=1)
+        cls.usuario_id = usuario.id
+        cls.cliente_id = cliente.id
+
+    def _registro(self, n, cuota_id, monto="40.00"):
+        return {
+            "ref": f"P{n}",
+            "linea": n,
+            "data": {
+                "cliente_id": self.cliente_id,
+                "metodo": "EFECTIVO",
+                "referencia": f"P{n}",
+                "monto_total": D(monto),
+                "aplicaciones": [
+                    {
+                        "tipo_objetivo": "CUOTA",
+                        "cuota_id": cuota_id,
+                        "tipo_aplicacion": "CAPITAL",
+                        "monto": D(monto),
+                    }
+                ],
+            },
+        }
+
+    def test_ids_de_los_pagos_insertados(self, _refrescar):
+        registros = [self._registro(n, c) for n, c in enumerate(self.cuotas, 1)]
+
+        resultados = list(registrar_pagos_lote(registros, self.usuario_id, lote=2))
+
+        self.assertTrue(all(r["ok"] for r in resultados))
+        self.assertEqual(
+            {r["ref"]: r["pago_id"] for r in resultados},
+            dict(Pago.objects.values_list("referencia", "id")),
+        )
+        self.assertEqual(
+            sorted(Cuota.objects.values_list("saldo_cuota", flat=True)),
+            [D("60.00")] * 3,
+        )
+
+    def test_error_de_bd_solo_reporta_el_pago_que_falla(self, _refrescar):
+        original = MovimientoCaja.objects.bulk_create
+
+        def bulk_create(objs, *args, **kwargs):
+            if any(m.referencia == "P2" for m in objs):
+                raise DatabaseError("fallo en P2")
+            return original(objs, *args, **kwargs)
+
+        registros = [self._registro(n, c) for n, c in enumerate(self.cuotas, 1)]
+        with mock.patch.object(
+            MovimientoCaja.objects, "bulk_create", side_effect=bulk_create
+        ):
+            resultados = list(registrar_pagos_lote(registros, self.usuario_id))
+
+        self.assertEqual([r["ok"] for r in resultados], [True, False, True])
+        self.assertEqual(resultados[1]["detail"], "fallo en P2")
+        self.assertEqual(
+            sorted(Pago.objects.values_list("referencia", flat=True)), ["P1", "P3"]
+        )
+        self.assertEqual(
+            list(Cuota.objects.order_by("id").values_list("saldo_cuota", flat=True)),
+            [D("60.00"), D("100.00"), D("60.00")],
+        )
+
+
+@skipUnless(connection.vendor == "mysql", "LAST_INSERT_ID() de MySQL")
+class InsertarPagosMySQLTests(TestCase):
+    def test_ids_desde_el_insert_multi_fila(self):
+        usuario = datos.usuario()
+        cliente = datos.cliente()
+        filas = [
+            Pago(
+                cliente_id=cliente.id,
+                metodo="EFECTIVO",
+                referencia=f"P{n}",
+                monto_total=D(n),
+                usuario_id=usuario.id,
+            )
+            for n in range(1, 6)
+        ]
+
+        _insertar_pagos(filas)
+
+        self.assertEqual(
+            [(p.pk, p.referencia) for p in filas],
+            list(Pago.objects.order_by("id").values_list("id", "referencia")),
+        )
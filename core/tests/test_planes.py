@@ -0,0 +1,166 @@
+# core/tests/test_planes.py
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from core.models import (
+    Bodega,
+    Cliente,
+    Compra,
+    MovimientoInventario,
+    Pedido,
+    Producto,
+    Proveedor,
+    Usuario,
+)
+from core.services.explain_service import PLANES, PLANES_RANGO, problemas_del_plan
+from core.tests import datos
+
+# Un registro por día durante dos años: un mes es ~4 % de la tabla
+DIAS = 730
+INICIO = datetime(2024, 1, 1, 15, tzinfo=timezone.utc)
+
+
+@skipUnless(connection.vendor == "mysql", "EXPLAIN de MySQL")
+class PlanesTestCase(TestCase):
+    """
+    Crea los índices de `sql` y datos con varios valores por columna, y
+    actualiza las estadísticas (ANALYZE) antes de correr EXPLAIN. Todo
+    fuera de la transacción de la clase: el DDL y ANALYZE hacen commit
+    implícito en MySQL. Los chequeos usan ids 1 (cliente, bodega, ...).
+    """
+
+    sql = None
+    tablas = ()
+
+    @classmethod
+    def crear_datos(cls):
+        Usuario.objects.create(
+            id=1, username="planes", nombre="planes", password_hash="x", activo=1
+        )
+        Cliente.objects.bulk_create(
+            Cliente(id=i, nombre=f"Cliente {i}", estado="ACTIVO") for i in range(1, 5)
+        )
+        Bodega.objects.bulk_create(
+            Bodega(id=i, nombre=f"Bodega {i}", activo=1) for i in (1, 2)
+        )
+
+    @classmethod
+    def borrar_datos(cls):
+        for modelo in (Bodega, Cliente, Usuario):
+            modelo.objects.all().delete()
+
+    @classmethod
+    def setUpClass(cls):
+        datos.ejecutar_sql(cls.sql)
+        cls.crear_datos()
+        with connection.cursor() as cur:
+            for tabla in cls.tablas:
+                cur.execute(f"ANALYZE TABLE {tabla}")
+                cur.fetchall()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.borrar_datos()
+        datos.borrar_indices(cls.sql)
+
+
+class PlanesPedidosTests(PlanesTestCase):
+    """listar_pedidos: cada filtro lee su índice (.., fecha, id) sin filesort."""
+
+    sql = "001_pedido_indices.sql"
+    tablas = ("pedido",)
+
+    @classmethod
+    def crear_datos(cls):
+        super().crear_datos()
+        Pedido.objects.bulk_create(
+            Pedido(
+                fecha=INICIO + timedelta(days=k),
+                total=Decimal("0"),
+                cliente_id=k % 4 + 1,
+                usuario_id=1,
+                bodega_id=k % 2 + 1,
+                estado=("ABIERTO", "RESERVADO", "FACTURADO")[k % 3],
+            )
+            for k in range(DIAS)
+        )
+
+    @classmethod
+    def borrar_datos(cls):
+        Pedido.objects.all().delete()
+        super().borrar_datos()
+
+    def test_listado_por_cursor_usa_su_indice(self):
+        for nombre, tabla, indice, explain in PLANES:
+            with self.subTest(nombre):
+                filas = explain()
+                self.assertEqual(problemas_del_plan(filas, tabla, indice), [])
+
+
+class PlanesRangoFechasTests(PlanesTestCase):
+    """Filtros fecha_desde / fecha_hasta: range scan sobre el índice por fecha."""
+
+    sql = "007_fecha_indices.sql"
+    tablas = ("compra", "movimientoinventario")
+
+    @classmethod
+    def crear_datos(cls):
+        super().crear_datos()
+        Proveedor.objects.bulk_create(
+            Proveedor(id=i, nombre=f"Proveedor {i}", estado="ACTIVO") for i in (1, 2, 3)
+        )
+        Producto.objects.bulk_create(
+            Producto(
+                id=i,
+                sku=f"SKU-{i}",
+                nombre=f"Producto {i}",
+                requiere_serie=0,
+                costo_ref=Decimal("1.00"),
+                precio_base=Decimal("1.00"),
+                activo=1,
+            )
+            for i in (1, 2, 3)
+        )
+        Compra.objects.bulk_create(
+            Compra(
+                proveedor_id=k % 3 + 1,
+                bodega_id=k % 2 + 1,
+                fecha=INICIO + timedelta(days=k),
+                no_documento=f"F-{k}",
+                total=Decimal("10.00"),
+                usuario_id=1,
+                estado="REGISTRADA",
+            )
+            for k in range(DIAS)
+        )
+        MovimientoInventario.objects.bulk_create(
+            MovimientoInventario(
+                fecha=INICIO + timedelta(days=k),
+                tipo="COMPRA",
+                bodega_destino_id=1,
+                producto_id=k % 3 + 1,
+                cantidad=Decimal("1"),
+                costo_unit=Decimal("1.00"),
+            )
+            for k in range(DIAS)
+        )
+
+    @classmethod
+    def borrar_datos(cls):
+        for modelo in (MovimientoInventario, Compra, Producto, Proveedor):
+            modelo.objects.all().delete()
+        super().borrar_datos()
+
+    def test_rango_semiabierto_usa_range_scan(self):
+        for nombre, tabla, indice, explain in PLANES_RANGO:
+            with self.subTest(nombre):
+                filas = explain()
+                self.assertEqual(
+                    problemas_del_plan(filas, tabla, indice, rango=True), []
+                )
@@ -0,0 +1,331 @@
+# core/tests/test_reservas.py
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Existencia, Pedido
+from core.services import reservation_service
+from core.services.reservation_service import (
+    ReservationError,
+    _reservar_cantidad,
+    crear_pedido_con_reserva,
+    liberar_reservas_vencidas,
+    reconciliar_reservado,
+)
+from core.tests import datos
+
+D = Decimal
+
+
+def _series(cur, producto_id, bodega_id, n, excluir=()):
+    """Primeras `n` series libres del producto (ids producto*100 + i)."""
+    libres = [producto_id * 100 + i for i in range(1, 50)]
+    return [s for s in libres if s not in excluir][:n]
+
+
+@mock.patch.object(reservation_service, "connection")
+class SeriesAutomaticasTests(TestCase):
+    """
+    SKIP LOCKED no salta las filas que bloqueó la misma transacción: dos
+    líneas del mismo producto no deben tomar las mismas series.
+    """
+
+    def _crear(self, items):
+        return crear_pedido_con_reserva(
+            cliente_id=1, usuario_id=1, bodega_id=1, items=items
+        )
+
+    def _cursor(self, conexion):
+        cur = conexion.cursor.return_value.__enter__.return_value
+        cur.fetchone.return_value = (10,)
+        return cur
+
+    def _reservadas(self, cur):
+        (filas,) = [
+            c.args[1]
+            for c in cur.executemany.call_args_list
+            if "ReservaSerie" in c.args[0]
+        ]
+        return [serie_id for _pedido, serie_id, _vence in filas]
+
+    def test_dos_lineas_mismo_producto_toman_series_distintas(self, conexion):
+        cur = self._cursor(conexion)
+        linea = {"producto_id": 7, "cantidad": 2, "precio_unit": "10.00"}
+        with mock.patch.object(
+            reservation_service, "_tomar_series_disponibles", side_effect=_series
+        ) as tomar:
+            self._crear(
+                [
+                    {**linea, "usar_series": True},
+                    {**linea, "cantidad": 1, "usar_series": True},
+                ]
+            )
+
+        tomar.assert_called_once_with(cur, 7, 1, 3, excluir=[])
+        reservadas = self._reservadas(cur)
+        self.assertEqual(reservadas, [701, 702, 703])
+
+    def test_automaticas_excluyen_las_elegidas(self, conexion):
+        cur = self._cursor(conexion)
+        linea = {"producto_id": 7, "precio_unit": "10.00", "usar_series": True}
+        with (
+            mock.patch.object(
+                reservation_service, "_bloquear_series", return_value=[701]
+            ),
+            mock.patch.object(
+                reservation_service, "_tomar_series_disponibles", side_effect=_series
+            ) as tomar,
+        ):
+            self._crear(
+                [
+                    {**linea, "cantidad": 1, "series": [701]},
+                    {**linea, "cantidad": 2},
+                ]
+            )
+
+        tomar.assert_called_once_with(cur, 7, 1, 2, excluir=[701])
+        self.assertEqual(self._reservadas(cur), [701, 702, 703])
+
+    def test_cantidad_de_series_fraccionaria(self, conexion):
+        self._cursor(conexion)
+        linea = {"producto_id": 7, "precio_unit": "10.00", "usar_series": True}
+        with self.assertRaises(ReservationError):
+            self._crear([{**linea, "cantidad": "0.5"}, {**linea, "cantidad": "0.5"}])
+
+
+class ReservaCantidadTests(TestCase):
+    """UPDATE condicional sobre existencia.reservado (sin sobreventa)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.bodega_id = datos.bodega().id
+        cls.producto_id = datos.producto().id
+        Existencia.objects.create(
+            producto_id=cls.producto_id,
+            bodega_id=cls.bodega_id,
+            cantidad=D("5"),
+            reservado=D("0"),
+        )
+
+    def _reservar(self, cantidad, producto_id=None):
+        # Enteros: SQLite recibe los Decimal como texto y la comparación
+        # `cantidad - reservado >= '3'` sería siempre falsa
+        with connection.cursor() as cur:
+            return _reservar_cantidad(
+                cur, producto_id or self.producto_id, self.bodega_id, cantidad
+            )
+
+    def test_no_reserva_mas_de_lo_disponible(self):
+        self.assertTrue(self._reservar(3))
+        self.assertFalse(self._reservar(3))
+        self.assertTrue(self._reservar(2))
+        self.assertFalse(self._reservar(1))
+
+        self.assertEqual(Existencia.objects.get().reservado, D("5"))
+
+    def test_sin_fila_de_existencia(self):
+        self.assertFalse(self._reservar(1, producto_id=datos.producto("SKU-2").id))
+
+    @mock.patch.object(reservation_service, "connection")
+    def test_pedido_sin_stock_se_rechaza(self, conexion):
+        cur = conexion.cursor.return_value.__enter__.return_value
+        cur.fetchone.return_value = (10,)
+        cur.rowcount = 0  # el UPDATE condicional no tocó ninguna fila
+
+        with self.assertRaisesMessage(ReservationError, "Stock insuficiente"):
+            crear_pedido_con_reserva(
+                cliente_id=1,
+                usuario_id=1,
+                bodega_id=self.bodega_id,
+                items=[
+                    {
+                        "producto_id": self.producto_id,
+                        "cantidad": 6,
+                        "precio_unit": "10.00",
+                    }
+                ],
+            )
+        self.assertFalse(
+            [c for c in cur.executemany.call_args_list if "ReservaStock" in c.args[0]]
+        )
+
+
+# Tablas de reservas sin modelo (en producción las crea el esquema base)
+_TABLAS_RESERVA = {
+    "ReservaStock": """
+        CREATE TABLE ReservaStock (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            pedido_id BIGINT NOT NULL,
+            producto_id BIGINT NOT NULL,
+            bodega_id BIGINT NOT NULL,
+            cantidad DECIMAL(12,2) NOT NULL,
+            vence_el DATETIME NOT NULL,
+            estado VARCHAR(10) NOT NULL
+        )
+    """,
+    "ReservaSerie": """
+        CREATE TABLE ReservaSerie (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            pedido_id BIGINT NOT NULL,
+            producto_serie_id BIGINT NOT NULL,
+            vence_el DATETIME NOT NULL,
+            estado VARCHAR(10) NOT NULL
+        )
+    """,
+    "ProductoSerie": """
+        CREATE TABLE ProductoSerie (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            producto_id BIGINT NOT NULL,
+            bodega_id BIGINT NOT NULL,
+            serie VARCHAR(60) NOT NULL,
+            estado VARCHAR(12) NOT NULL,
+            pedido_id BIGINT NULL
+        )
+    """,
+}
+
+
+@skipUnless(connection.vendor == "mysql", "UPDATE ... JOIN / SKIP LOCKED de MySQL")
+class ReservasMySQLTests(TestCase):
+    """
+    Barrido de vencidas y reconciliación del contador. Como el servicio,
+    supone nombres de tabla sin distinción de mayúsculas (Existencia,
+    Pedido).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # DDL fuera de la transacción de la clase (MySQL hace commit implícito)
+        with connection.cursor() as cur:
+            for ddl in _TABLAS_RESERVA.values():
+                cur.execute(ddl)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        datos.borrar_tablas(*_TABLAS_RESERVA)
+
+    @classmethod
+    def setUpTestData(cls):
+        usuario = datos.usuario()
+        cliente = datos.cliente()
+        cls.bodega_id = datos.bodega().id
+        cls.productos = [datos.producto(f"SKU-{n}").id for n in (1, 2)]
+        cls.pedidos = [
+            Pedido.objects.create(
+                fecha=timezone.now(),
+                total=D("0"),
+                cliente_id=cliente.id,
+                usuario_id=usuario.id,
+                bodega_id=cls.bodega_id,
+                estado="RESERVADO",
+            ).id
+            for _ in range(2)
+        ]
+        cls.ahora = datetime(2025, 6, 1, 12, 0)
+
+    def _existencia(self, producto_id, reservado):
+        Existencia.objects.create(
+            producto_id=producto_id,
+            bodega_id=self.bodega_id,
+            cantidad=D("10"),
+            reservado=D(reservado),
+        )
+
+    def _reserva_stock(self, pedido_id, producto_id, cantidad, horas, estado="ACTIVA"):
+        with connection.cursor() as cur:
+            cur.execute(
+                "INSERT INTO ReservaStock "
+                "(pedido_id, producto_id, bodega_id, cantidad, vence_el, estado) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [
+                    pedido_id,
+                    producto_id,
+                    self.bodega_id,
+                    cantidad,
+                    self.ahora + timedelta(hours=horas),
+                    estado,
+                ],
+            )
+
+    def _filas(self, sql):
+        with connection.cursor() as cur:
+            cur.execute(sql)
+            return cur.fetchall()
+
+    def test_vencidas_liberan_stock_y_reabren_pedido(self):
+        vencido, vigente = self.pedidos
+        self._existencia(self.productos[0], "5")
+        self._reserva_stock(vencido, self.productos[0], 3, horas=-2)
+        self._reserva_stock(vigente, self.productos[0], 2, horas=2)
+
+        totales = liberar_reservas_vencidas(lote=1, ahora=self.ahora)
+
+        self.assertEqual((totales["stock"], totales["pedidos"]), (1, 1))
+        self.assertEqual(totales["lag_max_s"], 7200)
+        self.assertEqual(Existencia.objects.get().reservado, D("2"))
+        self.assertEqual(
+            self._filas("SELECT pedido_id, estado FROM ReservaStock ORDER BY id"),
+            ((vencido, "VENCIDA"), (vigente, "ACTIVA")),
+        )
+        self.assertEqual(
+            dict(Pedido.objects.values_list("id", "estado")),
+            {vencido: "ABIERTO", vigente: "RESERVADO"},
+        )
+
+    def test_vencidas_devuelven_series(self):
+        pedido_id = self.pedidos[0]
+        with connection.cursor() as cur:
+            cur.execute(
+                "INSERT INTO ProductoSerie (producto_id, bodega_id, serie, estado, pedido_id) "
+                "VALUES (%s, %s, 'S-1', 'RESERVADA', %s)",
+                [self.productos[0], self.bodega_id, pedido_id],
+            )
+            serie_id = cur.lastrowid
+            cur.execute(
+                "INSERT INTO ReservaSerie (pedido_id, producto_serie_id, vence_el, estado) "
+                "VALUES (%s, %s, %s, 'ACTIVA')",
+                [pedido_id, serie_id, self.ahora - timedelta(minutes=5)],
+            )
+
+        totales = liberar_reservas_vencidas(ahora=self.ahora)
+
+        self.assertEqual(totales["series"], 1)
+        self.assertEqual(
+            self._filas("SELECT estado, pedido_id FROM ProductoSerie"),
+            (("EN_BODEGA", None),),
+        )
+        self.assertEqual(
+            self._filas("SELECT estado FROM ReservaSerie"), (("VENCIDA",),)
+        )
+        self.assertEqual(Pedido.objects.get(pk=pedido_id).estado, "ABIERTO")
+
+    def test_reconciliar_reservado(self):
+        con_reserva, sin_reserva = self.productos
+        self._existencia(con_reserva, "7")
+        self._existencia(sin_reserva, "2")
+        self._reserva_stock(self.pedidos[0], con_reserva, 5, horas=2)
+        self._reserva_stock(self.pedidos[1], con_reserva, 3, horas=2, estado="LIBERADA")
+
+        diferencias = reconciliar_reservado()
+
+        self.assertEqual(
+            [(d["producto_id"], d["reservado"], d["esperado"]) for d in diferencias],
+            [(con_reserva, D("7"), D("5")), (sin_reserva, D("2"), D("0"))],
+        )
+        self.assertEqual(
+            Existencia.objects.get(producto_id=con_reserva).reservado, D("7")
+        )
+
+        reconciliar_reservado(corregir=True)
+
+        self.assertEqual(
+            dict(Existencia.objects.values_list("producto_id", "reservado")),
+            {con_reserva: D("5"), sin_reserva: D("0")},
+        )
+        self.assertEqual(reconciliar_reservado(), [])
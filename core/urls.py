@@ -11,6 +11,7 @@ from core.views.order_views import (
     PedidoItemsReplaceView,
     PedidoConfirmarView,
     PedidoCancelarView,
+    PedidoImportView,
     SoloVentasDemo,  ## este de prueba
 )
 
@@ -30,7 +31,7 @@ from core.views.provider_views import (
 )
 
 ## pagos
-from core.views.payment_views import PagoCreateAPIView
+from core.views.payment_views import PagoCreateAPIView, PagoLoteAPIView
 from core.views.payment_query_views import (
     PagosPorClienteListAPIView,
     PagosPorVentaListAPIView,
@@ -51,6 +52,11 @@ from core.views.inventory_query_views import (
 from core.views.purchase_dashboard_views import PurchaseDashboardAPIView
 from core.views.purchase_views import PurchaseViewSet, PurchasesBySupplierListView
 from core.views.purchase_export_views import PurchaseExportExcelAPIView
+from core.views.export_views import (
+    ExportacionDescargaAPIView,
+    ExportacionEstadoAPIView,
+    ExportacionMasivaAPIView,
+)
 
 router = DefaultRouter()
 # ... otros registros
@@ -69,6 +75,23 @@ urlpatterns = [
         PurchaseExportExcelAPIView.as_view(),
         name="compras-exportar",
     ),
+    # Trabajos de exportación en segundo plano
+    path(
+        "exportaciones/<str:job_id>/",
+        ExportacionEstadoAPIView.as_view(),
+        name="exportacion-estado",
+    ),
+    path(
+        "exportaciones/<str:job_id>/descargar/",
+        ExportacionDescargaAPIView.as_view(),
+        name="exportacion-descarga",
+    ),
+    # CSV (gzip) / JSON lines / Parquet de compras, ventas, pedidos, kardex
+    path(
+        "exportar/<str:recurso>/",
+        ExportacionMasivaAPIView.as_view(),
+        name="exportar-recurso",
+    ),
     # 👇 2) Rutas del router (compras/, compras/<id>/, etc.)
     path("", include(router.urls)),
     # 👇 3) Resto de rutas que ya tenías
@@ -78,6 +101,7 @@ urlpatterns = [
     path("demo/solo-ventas", SoloVentasDemo.as_view()),
     # PEDIDOS
     path("pedidos/", PedidoCreateView.as_view()),
+    path("pedidos/importar/", PedidoImportView.as_view()),
     path("pedidos/<int:pedido_id>/", PedidoDetailView.as_view()),
     path("pedidos/<int:pedido_id>/items/", PedidoItemsReplaceView.as_view()),
     path("pedidos/<int:pedido_id>/confirmar/", PedidoConfirmarView.as_view()),
@@ -93,6 +117,7 @@ urlpatterns = [
     path("catalogos/productos/<int:pk>/", ProductoDetailView.as_view()),
     # PAGOS
     path("pagos/", PagoCreateAPIView.as_view(), name="pago-create"),
+    path("pagos/lote/", PagoLoteAPIView.as_view(), name="pago-lote"),
     path(
         "clientes/<int:cliente_id>/pagos/",
         PagosPorClienteListAPIView.as_view(),
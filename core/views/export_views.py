@@ -0,0 +1,179 @@
+# core/views/export_views.py
+
+import re
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.services import bulk_export_service
+from core.services.export_job_service import (
+    EXPORTADORES,
+    LISTO,
+    ExportJobError,
+    encolar,
+    obtener_estado,
+    ruta_archivo,
+)
+
+# Bytes por lectura al servir el archivo
+_BLOQUE_LECTURA = 64 * 1024
+
+_RANGO = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def estado_publico(estado: dict) -> dict:
+    """Estado del trabajo para la API (sin rutas internas)."""
+    data = {
+        k: estado.get(k)
+        for k in ("id", "estado", "recurso", "formato", "filtros", "bytes", "error")
+    }
+    data["url_estado"] = reverse("exportacion-estado", args=[estado["id"]])
+    if estado.get("estado") == LISTO:
+        data["url_descarga"] = reverse("exportacion-descarga", args=[estado["id"]])
+    return data
+
+
+def _leer(ruta, inicio: int, largo: int):
+    with open(ruta, "rb") as f:
+        f.seek(inicio)
+        while largo > 0:
+            bloque = f.read(min(_BLOQUE_LECTURA, largo))
+            if not bloque:
+                return
+            largo -= len(bloque)
+            yield bloque
+
+
+def _rango(cabecera: str, total: int):
+    """
+    Interpreta un único rango 'bytes=a-b' / 'bytes=a-' / 'bytes=-n'.
+    Devuelve (inicio, fin) inclusivos, None si no aplica (se sirve completo)
+    o False si el rango no se puede satisfacer.
+    """
+    m = _RANGO.fullmatch((cabecera or "").strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if not m.group(1):
+        sufijo = int(m.group(2))
+        if sufijo == 0:
+            return False
+        return max(total - sufijo, 0), total - 1
+    inicio = int(m.group(1))
+    fin = int(m.group(2)) if m.group(2) else total - 1
+    if inicio >= total or fin < inicio:
+        return False
+    return inicio, min(fin, total - 1)
+
+
+class ExportacionEstadoAPIView(APIView):
+    """
+    GET /api/v1/exportaciones/<job_id>/
+    Estado de un trabajo de exportación (PENDIENTE, PROCESANDO, LISTO, ERROR).
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id: str):
+        estado = obtener_estado(job_id)
+        if estado is None:
+            return Response(
+                {"detail": "Exportación no encontrada."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(estado_publico(estado))
+
+
+class ExportacionDescargaAPIView(APIView):
+    """
+    GET /api/v1/exportaciones/<job_id>/descargar/
+    Sirve el archivo terminado. Soporta Range (un solo rango) para reanudar
+    descargas grandes.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id: str):
+        estado = obtener_estado(job_id)
+        if estado is None:
+            return Response(
+                {"detail": "Exportación no encontrada."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if estado["estado"] != LISTO:
+            return Response(estado_publico(estado), status=status.HTTP_409_CONFLICT)
+
+        ruta = ruta_archivo(estado)
+        try:
+            total = ruta.stat().st_size
+        except FileNotFoundError:
+            return Response(
+                {"detail": "El archivo ya expiró; vuelva a solicitar la exportación."},
+                status=status.HTTP_410_GONE,
+            )
+
+        exportador = EXPORTADORES[(estado["recurso"], estado["formato"])]
+        rango = _rango(request.headers.get("Range"), total)
+        if rango is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{total}"
+            return response
+
+        inicio, fin = rango or (0, total - 1)
+        largo = fin - inicio + 1
+        response = StreamingHttpResponse(
+            _leer(ruta, inicio, largo),
+            status=206 if rango else 200,
+            content_type=exportador.content_type,
+        )
+        response["Content-Length"] = str(largo)
+        response["Accept-Ranges"] = "bytes"
+        if rango:
+            response["Content-Range"] = f"bytes {inicio}-{fin}/{total}"
+        response["Content-Disposition"] = (
+            f'attachment; filename="{estado["recurso"]}_export.{exportador.extension}"'
+        )
+        return response
+
+
+def respuesta_exportacion(recurso: str, formato: str, params):
+    """StreamingHttpResponse con el archivo generado por bloques desde la BD."""
+    partes = bulk_export_service.exportar(recurso, formato, params)
+    fmt = bulk_export_service.FORMATOS[formato]
+    response = StreamingHttpResponse(partes, content_type=fmt.content_type)
+    response["Content-Disposition"] = (
+        f'attachment; filename="{recurso}_export.{fmt.extension}"'
+    )
+    return response
+
+
+class ExportacionMasivaAPIView(APIView):
+    """
+    GET  /api/v1/exportar/<recurso>/?formato=csv|jsonl|parquet&<filtros>
+         Genera el archivo en streaming (recurso: compras, ventas, pedidos,
+         kardex). csv sale comprimido con gzip.
+    POST /api/v1/exportar/<recurso>/  → igual, pero como trabajo en segundo
+         plano: responde 202 con el estado (ver exportaciones/<id>/).
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, recurso: str):
+        formato = request.query_params.get("formato", "csv").lower()
+        try:
+            return respuesta_exportacion(recurso, formato, request.query_params)
+        except bulk_export_service.ExportFormatError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def post(self, request, recurso: str):
+        params = request.query_params.copy()
+        params.update(request.data)
+        formato = str(params.get("formato", "csv")).lower()
+        try:
+            estado = encolar(recurso, formato, params)
+        except ExportJobError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(estado_publico(estado), status=status.HTTP_202_ACCEPTED)
@@ -8,6 +8,7 @@ from core.serializers.inventory_serializers import (
     InventarioActualSerializer,
     KardexMovimientoSerializer,
 )
+from core.services.date_range import filtrar_rango
 
 
 class InventarioActualListAPIView(generics.ListAPIView):
@@ -83,10 +84,6 @@ class KardexProductoListAPIView(generics.ListAPIView):
             # El kardex suele asociarse a la bodega de origen (para salidas)
             qs = qs.filter(bodega_origen_id=bodega_id)
 
-        if fecha_desde:
-            qs = qs.filter(fecha__date__gte=fecha_desde)
-
-        if fecha_hasta:
-            qs = qs.filter(fecha__date__lte=fecha_hasta)
+        qs = filtrar_rango(qs, "fecha", fecha_desde, fecha_hasta)
 
         return qs.order_by("fecha", "id")
@@ -1,4 +1,8 @@
 # erp/core/views/order_views.py
+import io
+import json
+
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -8,19 +12,29 @@ from rest_framework.permissions import IsAuthenticated
 from core.serializers.order_serializers import (
     PedidoCreateSerializer,
     PedidoItemsReplaceSerializer,
+    PedidoItemsPatchSerializer,
     PedidoListFilterSerializer,
 )
 
 from core.services.order_service import (
     crear_pedido,
     obtener_pedido,
+    obtener_pedidos,
     reemplazar_items_pedido,
+    editar_items_pedido,
     confirmar_pedido,
     cancelar_pedido,
     listar_pedidos,
     StockError,
     PedidoError,
 )
+from core.services.order_import_service import importar_pedidos
+
+
+def _expand(request) -> set:
+    """Lee ?expand=items,productos como conjunto."""
+    valor = request.query_params.get("expand") or ""
+    return {v.strip() for v in valor.split(",") if v.strip()}
 
 
 class PedidoCreateView(APIView):
@@ -30,15 +44,31 @@ class PedidoCreateView(APIView):
         """
         Lista pedidos con filtros opcionales vía query params:
         - cliente_id
+        - bodega_id
         - estado
         - fecha_desde (YYYY-MM-DD)
         - fecha_hasta (YYYY-MM-DD)
+        - cursor (valor `next_cursor` de la respuesta anterior)
+        - limit (1..500, por defecto 100)
+        - expand=items → cada pedido trae su detalle (una consulta por página)
+        - expand=items,productos → además sku/nombre/impuesto de cada ítem
+        Respuesta: {"results": [...], "next_cursor": "..." | null}
         """
         ser = PedidoListFilterSerializer(data=request.query_params)
         if not ser.is_valid():
             return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        pedidos = listar_pedidos(**ser.validated_data)
+        try:
+            pedidos = listar_pedidos(**ser.validated_data)
+        except PedidoError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        expand = _expand(request)
+        if "items" in expand:
+            pedidos["results"] = obtener_pedidos(
+                [p["id"] for p in pedidos["results"]],
+                con_productos="productos" in expand,
+            )
         return Response(pedidos)
 
     def post(self, request):
@@ -57,7 +87,10 @@ class PedidoCreateView(APIView):
             pedido = obtener_pedido(pedido_id)
             return Response(pedido, status=status.HTTP_201_CREATED)
         except StockError as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                {"detail": str(e), "faltantes": e.faltantes},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         except PedidoError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -66,7 +99,12 @@ class PedidoDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pedido_id: int):
-        pedido = obtener_pedido(pedido_id)
+        """
+        ?expand=productos agrega sku, nombre e impuesto del producto a cada ítem.
+        """
+        pedido = obtener_pedido(
+            pedido_id, con_productos="productos" in _expand(request)
+        )
         if not pedido:
             return Response(
                 {"detail": "Pedido no encontrado."}, status=status.HTTP_404_NOT_FOUND
@@ -90,7 +128,35 @@ class PedidoItemsReplaceView(APIView):
             )
             return Response(pedido)
         except StockError as e:
+            return Response(
+                {"detail": str(e), "faltantes": e.faltantes},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except PedidoError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def patch(self, request, pedido_id: int):
+        """
+        Edición parcial: solo las líneas enviadas cambian.
+        - cantidad = 0 elimina el producto del pedido.
+        - precio_unitario es requerido solo para productos nuevos.
+        """
+        ser = PedidoItemsPatchSerializer(data=request.data)
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            pedido = editar_items_pedido(
+                pedido_id=pedido_id,
+                cambios=ser.validated_data["items"],
+                username=request.user.username,
+            )
+            return Response(pedido)
+        except StockError as e:
+            return Response(
+                {"detail": str(e), "faltantes": e.faltantes},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         except PedidoError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -103,7 +169,10 @@ class PedidoConfirmarView(APIView):
             pedido = confirmar_pedido(pedido_id, request.user.username)
             return Response(pedido)
         except StockError as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                {"detail": str(e), "faltantes": e.faltantes},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         except PedidoError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -126,3 +195,47 @@ class SoloVentasDemo(APIView):
 
     def get(self, request):
         return Response({"ok": True}, status=status.HTTP_200_OK)
+
+
+class PedidoImportView(APIView):
+    """
+    POST /api/v1/pedidos/importar/  (multipart)
+    - archivo: CSV (ref, cliente_id, bodega_id, producto_id, cantidad,
+      precio_unitario) o JSON lines (un pedido por línea).
+    - formato: csv | jsonl (opcional; por defecto según la extensión).
+
+    Responde en streaming (application/x-ndjson): un resultado por pedido y
+    al final una línea {"resumen": {...}}.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        archivo = request.FILES.get("archivo")
+        if archivo is None:
+            return Response(
+                {"detail": "Debe adjuntar el archivo en el campo 'archivo'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        formato = request.data.get("formato")
+        if not formato:
+            formato = "jsonl" if archivo.name.lower().endswith(".jsonl") else "csv"
+
+        texto = io.TextIOWrapper(archivo.file, encoding="utf-8-sig", newline="")
+        try:
+            resultados = importar_pedidos(texto, formato, request.user.username)
+        except PedidoError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        def ndjson():
+            ok = errores = 0
+            for res in resultados:
+                if res["ok"]:
+                    ok += 1
+                else:
+                    errores += 1
+                yield json.dumps(res, default=str) + "\n"
+            yield json.dumps({"resumen": {"ok": ok, "errores": errores}}) + "\n"
+
+        return StreamingHttpResponse(ndjson(), content_type="application/x-ndjson")
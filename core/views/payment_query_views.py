@@ -3,11 +3,15 @@
 from rest_framework import generics
 from core.models import Pago
 from core.serializers.payment_serializers import PagoSerializer
-from core.models import VCarteraAging
+from core.models import VCarteraAging, CarteraAgingBucket, CarteraAgingCliente
+from core.services.cartera_service import BUCKETS, BUCKETS_VENCIDOS
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.db.models import Max, Sum
 from decimal import Decimal
-from collections import defaultdict
+
+# Filas por viaje al leer las cuotas del estado de cuenta
+CUOTAS_CHUNK = 2000
 
 
 class PagosPorClienteListAPIView(generics.ListAPIView):
@@ -48,6 +52,9 @@ class EstadoCuentaClienteAPIView(APIView):
     """
     GET /api/v1/clientes/<cliente_id>/estado-cuenta/
     Opcional: ?solo_vencidas=1  → filtra solo cuotas vencidas (buckets != '0-AL-DIA')
+
+    Los totales se calculan en la BD (GROUP BY bucket) y las cuotas se leen
+    como tuplas: como máximo 2 consultas, sin importar cuántas cuotas tenga.
     """
 
     def get(self, request, cliente_id: int):
@@ -60,52 +67,42 @@ class EstadoCuentaClienteAPIView(APIView):
         if solo_vencidas == "1":
             qs = qs.exclude(bucket="0-AL-DIA")
 
-        # Caso: cliente sin cuotas que cumplan el filtro
-        if not qs.exists():
-            data = {
-                "cliente_id": cliente_id,
-                "cliente": None,
-                "resumen": {
-                    "total_deuda": "0.00",
-                    "total_vencido": "0.00",
-                },
-                "aging": {
-                    "0-AL-DIA": "0.00",
-                    "1-30": "0.00",
-                    "31-60": "0.00",
-                    "61-90": "0.00",
-                    ">90": "0.00",
-                },
-                "cuotas": [],
-                "filtros": {
-                    "solo_vencidas": solo_vencidas == "1",
-                },
-            }
-            return Response(data)
-
-        cliente_nombre = qs.first().cliente
+        # Consulta 1: saldo por bucket (y el nombre del cliente)
+        por_bucket = (
+            qs.order_by()
+            .values("bucket")
+            .annotate(total=Sum("saldo"), nombre=Max("cliente"))
+        )
+        buckets = {}
+        cliente_nombre = None
+        for fila in por_bucket:
+            buckets[fila["bucket"]] = fila["total"]
+            cliente_nombre = fila["nombre"]
+
+        total_deuda = sum(buckets.values(), Decimal("0.00"))
+        total_vencido = sum(
+            (buckets.get(b, Decimal("0.00")) for b in BUCKETS_VENCIDOS),
+            Decimal("0.00"),
+        )
 
-        total_deuda = Decimal("0.00")
-        total_vencido = Decimal("0.00")
-        buckets = defaultdict(lambda: Decimal("0.00"))
+        # Consulta 2: detalle de cuotas (se omite si el cliente no tiene)
         cuotas = []
-
-        for row in qs:
-            total_deuda += row.saldo
-            buckets[row.bucket] += row.saldo
-
-            if row.bucket in ("1-30", "31-60", "61-90", ">90"):
-                total_vencido += row.saldo
-
-            cuotas.append(
+        if buckets:
+            filas = qs.order_by("fecha_venc", "cuota_id").values_list(
+                "cuota_id", "fecha_venc", "dias_vencidos", "saldo", "bucket"
+            )
+            cuotas = [
                 {
-                    "cuota_id": row.cuota_id,
-                    "fecha_venc": row.fecha_venc,
-                    "dias_vencidos": row.dias_vencidos,
-                    "saldo": str(row.saldo),
-                    "bucket": row.bucket,
+                    "cuota_id": cuota_id,
+                    "fecha_venc": fecha_venc,
+                    "dias_vencidos": dias_vencidos,
+                    "saldo": str(saldo),
+                    "bucket": bucket,
                 }
-            )
+                for cuota_id, fecha_venc, dias_vencidos, saldo, bucket in filas.iterator(
+                    chunk_size=CUOTAS_CHUNK
+                )
+            ]
 
         data = {
             "cliente_id": cliente_id,
@@ -114,13 +111,7 @@ class EstadoCuentaClienteAPIView(APIView):
                 "total_deuda": str(total_deuda),
                 "total_vencido": str(total_vencido),
             },
-            "aging": {
-                "0-AL-DIA": str(buckets.get("0-AL-DIA", Decimal("0.00"))),
-                "1-30": str(buckets.get("1-30", Decimal("0.00"))),
-                "31-60": str(buckets.get("31-60", Decimal("0.00"))),
-                "61-90": str(buckets.get("61-90", Decimal("0.00"))),
-                ">90": str(buckets.get(">90", Decimal("0.00"))),
-            },
+            "aging": {b: str(buckets.get(b, Decimal("0.00"))) for b in BUCKETS},
             "cuotas": cuotas,
             "filtros": {
                 "solo_vencidas": solo_vencidas == "1",
@@ -130,64 +121,84 @@ class EstadoCuentaClienteAPIView(APIView):
         return Response(data)
 
 
+def _aging_desde_snapshot(top: int):
+    """Totales pre-agregados del snapshot (core/services/cartera_service.py)."""
+    buckets = dict(
+        CarteraAgingBucket.objects.filter(bucket__in=BUCKETS).values_list(
+            "bucket", "saldo"
+        )
+    )
+    morosos = (
+        CarteraAgingCliente.objects.filter(total_vencido__gt=0)
+        .order_by("-total_vencido")
+        .values_list("cliente_id", "cliente", "total_vencido")[:top]
+    )
+    return buckets, list(morosos)
+
+
+def _aging_desde_vista(top: int):
+    """Mismo resultado calculado sobre v_cartera_aging (GROUP BY en la BD)."""
+    buckets = dict(
+        VCarteraAging.objects.order_by()
+        .values("bucket")
+        .annotate(total=Sum("saldo"))
+        .values_list("bucket", "total")
+    )
+    morosos = (
+        VCarteraAging.objects.filter(bucket__in=BUCKETS_VENCIDOS)
+        .order_by()
+        .values("cliente_id")
+        .annotate(nombre=Max("cliente"), vencido=Sum("saldo"))
+        .order_by("-vencido", "cliente_id")
+        .values_list("cliente_id", "nombre", "vencido")[:top]
+    )
+    return buckets, list(morosos)
+
+
 class CarteraDashboardAPIView(APIView):
     """
     GET /api/v1/cartera/dashboard/
+    Opcional: ?fuente=vista → calcula sobre v_cartera_aging en lugar del
+    snapshot (útil para cuadrar el snapshot contra la vista)
 
     Resumen global de la cartera:
     - Total deuda
     - Total vencido
     - Totales por bucket (aging)
     - Top clientes con mayor deuda vencida
+
+    Siempre 2 consultas: totales por bucket y top morosos (ORDER BY ... LIMIT).
     """
 
-    def get(self, request):
-        qs = VCarteraAging.objects.all()
+    TOP_MOROSOS = 5
 
-        total_deuda_global = Decimal("0.00")
-        total_vencida_global = Decimal("0.00")
-        buckets = defaultdict(lambda: Decimal("0.00"))
-        deuda_vencida_por_cliente = defaultdict(
-            lambda: {"cliente": "", "monto": Decimal("0.00")}
+    def get(self, request):
+        if request.query_params.get("fuente") == "vista":
+            buckets, morosos = _aging_desde_vista(self.TOP_MOROSOS)
+        else:
+            buckets, morosos = _aging_desde_snapshot(self.TOP_MOROSOS)
+
+        total_deuda_global = sum(buckets.values(), Decimal("0.00"))
+        total_vencida_global = sum(
+            (buckets.get(b, Decimal("0.00")) for b in BUCKETS_VENCIDOS),
+            Decimal("0.00"),
         )
 
-        for row in qs:
-            total_deuda_global += row.saldo
-            buckets[row.bucket] += row.saldo
-
-            # Vencido = cualquier bucket distinto de 0-AL-DIA
-            if row.bucket in ("1-30", "31-60", "61-90", ">90"):
-                total_vencida_global += row.saldo
-                key = row.cliente_id
-                deuda_vencida_por_cliente[key]["cliente"] = row.cliente
-                deuda_vencida_por_cliente[key]["monto"] += row.saldo
-
-        # Calcular top morosos (ordenar por monto vencido desc, tomar top 5)
-        top_morosos = sorted(
-            [
-                {
-                    "cliente_id": cliente_id,
-                    "cliente": info["cliente"],
-                    "total_vencido": str(info["monto"]),
-                }
-                for cliente_id, info in deuda_vencida_por_cliente.items()
-            ],
-            key=lambda x: Decimal(x["total_vencido"]),
-            reverse=True,
-        )[:5]
+        top_morosos = [
+            {
+                "cliente_id": cliente_id,
+                "cliente": cliente,
+                "total_vencido": str(total_vencido),
+            }
+            for cliente_id, cliente, total_vencido in morosos
+        ]
 
         data = {
             "resumen_global": {
                 "total_deuda_global": str(total_deuda_global),
                 "total_vencida_global": str(total_vencida_global),
             },
-            "aging_global": {
-                "0-AL-DIA": str(buckets.get("0-AL-DIA", Decimal("0.00"))),
-                "1-30": str(buckets.get("1-30", Decimal("0.00"))),
-                "31-60": str(buckets.get("31-60", Decimal("0.00"))),
-                "61-90": str(buckets.get("61-90", Decimal("0.00"))),
-                ">90": str(buckets.get(">90", Decimal("0.00"))),
-            },
+            "aging_global": {b: str(buckets.get(b, Decimal("0.00"))) for b in BUCKETS},
             "top_morosos": top_morosos,
         }
 
@@ -1,12 +1,24 @@
 # core/views/payment_views.py
 
+import io
+import json
+
+from django.http import StreamingHttpResponse
 from rest_framework import generics, status
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from core.serializers.payment_serializers import (
     PagoCreateSerializer,
     PagoSerializer,
+    validar_registros_pago,
+)
+from core.services.payment_batch_service import (
+    LECTORES,
+    desde_lista,
+    registrar_pagos_lote,
 )
+from core.services.payment_service import PaymentError, obtener_usuario_id
 
 
 class PagoCreateAPIView(generics.CreateAPIView):
@@ -25,3 +37,64 @@ class PagoCreateAPIView(generics.CreateAPIView):
 
         output_serializer = PagoSerializer(pago)
         return Response(output_serializer.data, status=status.HTTP_201_CREATED)
+
+
+class PagoLoteAPIView(APIView):
+    """
+    Endpoint:
+        POST /api/v1/pagos/lote/
+
+    Registra muchos pagos de una vez (estado de cuenta del banco, cierre POS):
+    - JSON: {"pagos": [{...mismo cuerpo que POST /pagos/, ref opcional}, ...]}
+    - multipart: archivo CSV (una fila por aplicación, agrupadas por `ref`)
+      o JSON lines (un pago por línea); formato: csv | jsonl.
+    El usuario del pago es el usuario autenticado.
+
+    Responde en streaming (application/x-ndjson): un resultado por pago y al
+    final una línea {"resumen": {...}}. Un pago con error no detiene el resto.
+    """
+
+    def post(self, request):
+        try:
+            usuario_id = obtener_usuario_id(request.user.username)
+        except PaymentError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        archivo = request.FILES.get("archivo")
+        if archivo is not None:
+            formato = request.data.get("formato")
+            if not formato:
+                formato = "jsonl" if archivo.name.lower().endswith(".jsonl") else "csv"
+            lector = LECTORES.get(formato)
+            if lector is None:
+                return Response(
+                    {"detail": f"Formato no soportado: {formato!r} (use csv o jsonl)."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            registros = lector(
+                io.TextIOWrapper(archivo.file, encoding="utf-8-sig", newline="")
+            )
+        else:
+            pagos = request.data.get("pagos")
+            if not isinstance(pagos, list):
+                return Response(
+                    {"detail": "Envíe 'pagos' (arreglo) o un 'archivo'."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            registros = desde_lista(pagos)
+
+        resultados = registrar_pagos_lote(
+            validar_registros_pago(registros, usuario_id), usuario_id
+        )
+
+        def ndjson():
+            ok = errores = 0
+            for res in resultados:
+                if res["ok"]:
+                    ok += 1
+                else:
+                    errores += 1
+                yield json.dumps(res, default=str) + "\n"
+            yield json.dumps({"resumen": {"ok": ok, "errores": errores}}) + "\n"
+
+        return StreamingHttpResponse(ndjson(), content_type="application/x-ndjson")
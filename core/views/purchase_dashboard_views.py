@@ -1,8 +1,7 @@
 # core/views/purchase_dashboard_views.py
 
-from django.db.models import Sum, Value, DecimalField
+from django.db.models import Sum, Value, DecimalField, IntegerField
 
-from django.utils.dateparse import parse_date
 from django.db.models import Sum, F
 from django.db.models.functions import Coalesce
 
@@ -10,7 +9,12 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Compra, CompraDetalle
+from core.models import Compra, CompraDetalle, CompraProductoDia, CompraResumenDia
+from core.services.purchase_filter_service import (
+    FiltroCompras,
+    compras_filtradas,
+    en_cache,
+)
 
 
 class PurchaseDashboardAPIView(APIView):
@@ -23,6 +27,9 @@ class PurchaseDashboardAPIView(APIView):
     - proveedor_id: int
     - bodega_id: int
     - estado: str
+    - fuente: "resumen" (por defecto; rollups diarios de
+      core/sql/006_compra_resumen_dia.sql) o "compras" (agrega en vivo sobre
+      compra / compra_detalle)
     """
 
     permission_classes = [IsAuthenticated]
@@ -36,44 +43,129 @@ class PurchaseDashboardAPIView(APIView):
         bodega_id = params.get("bodega_id")
         estado = params.get("estado")
 
-        # Base: todas las compras
-        qs = Compra.objects.all()
-
-        # Aplicar filtros
-        if proveedor_id:
-            qs = qs.filter(proveedor_id=proveedor_id)
-
-        if bodega_id:
-            qs = qs.filter(bodega_id=bodega_id)
+        # Misma llave de caché que el listado y la exportación
+        filtro = FiltroCompras.desde_params(params)
+        if params.get("fuente") == "compras":
+            secciones = en_cache(
+                filtro, "dashboard:compras", lambda: self._desde_compras(filtro)
+            )
+        else:
+            secciones = en_cache(
+                filtro, "dashboard:resumen", lambda: self._desde_resumen(filtro)
+            )
 
-        if estado:
-            qs = qs.filter(estado=estado.upper())
+        data = {
+            "filtros": {
+                "fecha_desde": fecha_desde,
+                "fecha_hasta": fecha_hasta,
+                "proveedor_id": proveedor_id,
+                "bodega_id": bodega_id,
+                "estado": estado.upper() if estado else None,
+            },
+            **secciones,
+        }
 
-        if fecha_desde:
-            fecha_d = parse_date(fecha_desde)
-            if fecha_d:
-                qs = qs.filter(fecha__date__gte=fecha_d)
+        return Response(data)
 
-        if fecha_hasta:
-            fecha_h = parse_date(fecha_hasta)
-            if fecha_h:
-                qs = qs.filter(fecha__date__lte=fecha_h)
+    @staticmethod
+    def _desde_resumen(filtro):
+        """
+        Las cuatro secciones desde los rollups diarios: los filtros del
+        dashboard (día local, proveedor, bodega, estado) son columnas de la
+        llave, así que cada sección agrega pocas filas por día.
+        """
+        filtros = {}
+        if filtro.proveedor_id is not None:
+            filtros["proveedor_id"] = filtro.proveedor_id
+        if filtro.bodega_id is not None:
+            filtros["bodega_id"] = filtro.bodega_id
+        if filtro.estado:
+            filtros["estado"] = filtro.estado
+        if filtro.fecha_desde:
+            filtros["fecha__gte"] = filtro.fecha_desde
+        if filtro.fecha_hasta:
+            filtros["fecha__lte"] = filtro.fecha_hasta
+
+        dinero = DecimalField(max_digits=16, decimal_places=2)
+        resumen_qs = CompraResumenDia.objects.filter(**filtros)
 
         # --------- RESUMEN GENERAL ----------
-        agg_resumen = qs.aggregate(
-            total_compras=Coalesce(
-                Sum("total"),
-                Value(0),
-                output_field=DecimalField(max_digits=12, decimal_places=2),
+        agg_resumen = resumen_qs.aggregate(
+            total_compras=Coalesce(Sum("total"), Value(0), output_field=dinero),
+            cantidad_compras=Coalesce(
+                Sum("compras"), Value(0), output_field=IntegerField()
             ),
         )
+        resumen = {
+            "total_compras": str(agg_resumen["total_compras"]),
+            "cantidad_compras": agg_resumen["cantidad_compras"],
+        }
 
-        total_compras = agg_resumen["total_compras"]
-        cantidad_compras = qs.count()
+        # --------- AGRUPADO POR PROVEEDOR ----------
+        por_proveedor_qs = (
+            resumen_qs.values("proveedor_id", "proveedor__nombre")
+            .annotate(suma=Sum("total"))
+            .order_by("-suma")[:10]
+        )
+        por_proveedor = [
+            {
+                "proveedor_id": row["proveedor_id"],
+                "proveedor_nombre": row["proveedor__nombre"],
+                "total": str(row["suma"]),
+            }
+            for row in por_proveedor_qs
+        ]
 
+        # --------- AGRUPADO POR BODEGA ----------
+        por_bodega_qs = (
+            resumen_qs.values("bodega_id", "bodega__nombre")
+            .annotate(suma=Sum("total"))
+            .order_by("-suma")[:10]
+        )
+        por_bodega = [
+            {
+                "bodega_id": row["bodega_id"],
+                "bodega_nombre": row["bodega__nombre"],
+                "total": str(row["suma"]),
+            }
+            for row in por_bodega_qs
+        ]
+
+        # --------- TOP PRODUCTOS (por cantidad y costo) ----------
+        top_productos_qs = (
+            CompraProductoDia.objects.filter(**filtros)
+            .values("producto_id", "producto__nombre")
+            .annotate(cantidad_total=Sum("cantidad"), costo_total=Sum("costo"))
+            .order_by("-costo_total")[:10]
+        )
+        top_productos = [
+            {
+                "producto_id": row["producto_id"],
+                "producto_nombre": row["producto__nombre"],
+                "cantidad_total": str(row["cantidad_total"]),
+                "costo_total": str(row["costo_total"]),
+            }
+            for row in top_productos_qs
+        ]
+
+        return {
+            "resumen": resumen,
+            "por_proveedor": por_proveedor,
+            "por_bodega": por_bodega,
+            "top_productos": top_productos,
+        }
+
+    @staticmethod
+    def _desde_compras(filtro):
+        """Agregado en vivo sobre compra / compra_detalle."""
+        qs = filtro.aplicar(Compra.objects.all())
+
+        # --------- RESUMEN GENERAL ----------
+        # Total y cantidad compartidos con el listado (caché del filtro)
+        compartido = compras_filtradas(filtro)
         resumen = {
-            "total_compras": str(total_compras),
-            "cantidad_compras": cantidad_compras,
+            "total_compras": str(compartido["total"]),
+            "cantidad_compras": compartido["cantidad"],
         }
 
         # --------- AGRUPADO POR PROVEEDOR ----------
@@ -121,7 +213,7 @@ class PurchaseDashboardAPIView(APIView):
         ]
 
         # --------- TOP PRODUCTOS (por cantidad y costo) ----------
-        detalles_qs = CompraDetalle.objects.filter(compra__in=qs)
+        detalles_qs = CompraDetalle.objects.filter(compra_id__in=qs.values("id"))
 
         top_productos_qs = (
             detalles_qs.values("producto_id", "producto__nombre")
@@ -150,18 +242,9 @@ class PurchaseDashboardAPIView(APIView):
             for row in top_productos_qs
         ]
 
-        data = {
-            "filtros": {
-                "fecha_desde": fecha_desde,
-                "fecha_hasta": fecha_hasta,
-                "proveedor_id": proveedor_id,
-                "bodega_id": bodega_id,
-                "estado": estado.upper() if estado else None,
-            },
+        return {
             "resumen": resumen,
             "por_proveedor": por_proveedor,
             "por_bodega": por_bodega,
             "top_productos": top_productos,
         }
-
-        return Response(data)
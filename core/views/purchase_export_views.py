@@ -1,28 +1,60 @@
 # core/views/purchase_export_views.py
 
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.http import HttpResponse
+from django.http import FileResponse
 
+from core.services.bulk_export_service import ExportFormatError
+from core.services.export_job_service import ExportJobError, encolar
 from core.services.purchase_export_service import PurchaseExportService
+from core.services.purchase_filter_service import FiltroCompras, ids_compras
+from core.views.export_views import estado_publico, respuesta_exportacion
 
 
 class PurchaseExportExcelAPIView(APIView):
+    """
+    GET  /api/v1/compras/exportar/  → genera y descarga el XLSX en el request
+         (?formato=csv|jsonl|parquet: líneas de detalle en streaming)
+    POST /api/v1/compras/exportar/  → encola la exportación (mismos filtros,
+         en query string o body) y responde 202 con el id del trabajo; el
+         archivo se descarga en /api/v1/exportaciones/<id>/descargar/.
+         Filtros idénticos reutilizan el mismo trabajo/archivo.
+    """
+
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        # 1. Filtrar compras
-        qs = PurchaseExportService.filtrar_compras(request.query_params)
-
-        # 2. Crear Excel
-        wb = PurchaseExportService.generar_excel(qs)
+        formato = request.query_params.get("formato", "xlsx").lower()
+        if formato != "xlsx":
+            try:
+                return respuesta_exportacion("compras", formato, request.query_params)
+            except ExportFormatError as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 1. Filtrar compras (ids compartidos con listado y dashboard)
+        filtro = FiltroCompras.desde_params(request.query_params)
+
+        # 2. Crear Excel (hojas write-only sobre un archivo temporal)
+        archivo = PurchaseExportService.generar_excel(
+            filtro.queryset(), ids=ids_compras(filtro)
+        )
 
-        # 3. Responder archivo XLSX
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        # 3. Responder archivo XLSX en streaming
+        return FileResponse(
+            archivo,
+            as_attachment=True,
+            filename="compras_export.xlsx",
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
-        response["Content-Disposition"] = 'attachment; filename="compras_export.xlsx"'
 
-        wb.save(response)
-        return response
+    def post(self, request, *args, **kwargs):
+        params = request.query_params.copy()
+        params.update(request.data)
+        formato = str(params.get("formato", "xlsx")).lower()
+        try:
+            estado = encolar("compras", formato, params)
+        except ExportJobError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(estado_publico(estado), status=status.HTTP_202_ACCEPTED)
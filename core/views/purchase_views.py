@@ -1,21 +1,81 @@
 # core/views/purchase_views.py
 
-from django.utils.dateparse import parse_date
-
 from rest_framework import status, viewsets, generics
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 
-from core.models import Compra
+from django.db.models import Prefetch
+
+from core.models import Compra, CompraDetalle
+from core.permissions import user_has_role
 from core.serializers.purchase_serializers import (
     PurchaseCreateSerializer,
+    CompraListSerializer,
     CompraSerializer,
 )
+from core.services.purchase_filter_service import FiltroCompras, ids_compras
 from core.services.purchase_service import PurchaseService
 
 
-class PurchaseViewSet(viewsets.ModelViewSet):
+class ComprasFiltradasMixin:
+    """
+    Listado de compras con FiltroCompras. La lista pagina sobre los ids
+    cacheados del filtro (los mismos que usan dashboard y exportación): el
+    conteo sale de la caché y cada página es una lectura por pk.
+
+    Proveedor, bodega y usuario vienen en el mismo SELECT y los detalles
+    (con su producto) en una sola consulta adicional, sin importar cuántas
+    compras tenga la página. Con ?detalles=false la lista usa
+    CompraListSerializer y no lee los detalles.
+    """
+
+    def filtro_compras(self) -> FiltroCompras:
+        return FiltroCompras.desde_params(self.request.query_params)
+
+    def lista_sin_detalles(self) -> bool:
+        if getattr(self, "action", "list") != "list":
+            return False
+        valor = self.request.query_params.get("detalles", "")
+        return valor.lower() in ("0", "false", "no")
+
+    def con_relaciones(self, qs):
+        qs = qs.select_related("proveedor", "bodega", "usuario")
+        if self.lista_sin_detalles():
+            return qs
+        return qs.prefetch_related(
+            Prefetch(
+                "detalles",
+                queryset=CompraDetalle.objects.select_related("producto").order_by(
+                    "id"
+                ),
+            )
+        )
+
+    def get_serializer_class(self):
+        if self.lista_sin_detalles():
+            return CompraListSerializer
+        return CompraSerializer
+
+    def list(self, request, *args, **kwargs):
+        ids = ids_compras(self.filtro_compras())
+        if ids is None:
+            # Demasiadas compras para cachear sus ids: paginación normal
+            return super().list(request, *args, **kwargs)
+
+        pagina = self.paginate_queryset(ids)
+        seleccion = pagina if pagina is not None else ids
+        compras = self.get_queryset().in_bulk(seleccion)
+        serializer = self.get_serializer(
+            [compras[i] for i in seleccion if i in compras], many=True
+        )
+        if pagina is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
+class PurchaseViewSet(ComprasFiltradasMixin, viewsets.ModelViewSet):
     """
     /api/v1/compras/
 
@@ -26,53 +86,35 @@ class PurchaseViewSet(viewsets.ModelViewSet):
     - estado: str (REGISTRADA, ANULADA, CERRADA, etc.)
     - fecha_desde: YYYY-MM-DD
     - fecha_hasta: YYYY-MM-DD
+    - detalles: false → lista sin líneas de detalle (CompraListSerializer)
 
     Ejemplos:
 
     GET /api/v1/compras/?proveedor_id=1
     GET /api/v1/compras/?bodega_id=1&estado=REGISTRADA
     GET /api/v1/compras/?fecha_desde=2025-11-01&fecha_hasta=2025-11-30
+
+    Sin PUT / PATCH / DELETE: una compra solo cambia con POST (registrar)
+    y POST .../anular/, que mantienen inventario, rollups diarios y caché.
     """
 
-    queryset = Compra.objects.all().order_by("-fecha")
+    queryset = Compra.objects.all().order_by("-fecha", "-id")
     serializer_class = CompraSerializer
     permission_classes = [IsAuthenticated]
+    http_method_names = ["get", "post", "head", "options"]
 
     def get_queryset(self):
         qs = super().get_queryset()
-        params = self.request.query_params
-
-        proveedor_id = params.get("proveedor_id")
-        bodega_id = params.get("bodega_id")
-        estado = params.get("estado")
-        fecha_desde = params.get("fecha_desde")
-        fecha_hasta = params.get("fecha_hasta")
-
-        if proveedor_id:
-            qs = qs.filter(proveedor_id=proveedor_id)
-
-        if bodega_id:
-            qs = qs.filter(bodega_id=bodega_id)
-
-        if estado:
-            qs = qs.filter(estado=estado.upper())
-
-        if fecha_desde:
-            fecha_d = parse_date(fecha_desde)
-            if fecha_d:
-                qs = qs.filter(fecha__date__gte=fecha_d)
-
-        if fecha_hasta:
-            fecha_h = parse_date(fecha_hasta)
-            if fecha_h:
-                qs = qs.filter(fecha__date__lte=fecha_h)
-
-        return qs
+        return self.con_relaciones(self.filtro_compras().aplicar(qs))
 
     def get_serializer_class(self):
         if self.action == "create":
             return PurchaseCreateSerializer
-        return CompraSerializer
+        return super().get_serializer_class()
+
+    def _releer(self, compra):
+        """La compra con sus relaciones precargadas, para la respuesta."""
+        return self.con_relaciones(Compra.objects.all()).get(pk=compra.pk)
 
     def create(self, request, *args, **kwargs):
         serializer = PurchaseCreateSerializer(data=request.data)
@@ -83,7 +125,7 @@ class PurchaseViewSet(viewsets.ModelViewSet):
             usuario=request.user,
         )
 
-        out_serializer = CompraSerializer(compra)
+        out_serializer = CompraSerializer(self._releer(compra))
         return Response(out_serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["post"], url_path="anular")
@@ -93,20 +135,31 @@ class PurchaseViewSet(viewsets.ModelViewSet):
 
         Body opcional:
         {
-          "motivo": "El proveedor facturó mal la cantidad"
+          "motivo": "El proveedor facturó mal la cantidad",
+          "permitir_negativo": false
         }
+
+        Si la anulación dejaría existencias negativas o por debajo de lo
+        reservado responde 400 con todos los productos afectados en
+        "faltantes"; con permitir_negativo=true (solo rol ADMIN) se anula
+        igual.
         """
         motivo = request.data.get("motivo")
+        permitir_negativo = str(request.data.get("permitir_negativo", "")).lower()
+        permitir_negativo = permitir_negativo in ("1", "true", "si", "sí")
+        if permitir_negativo and not user_has_role(request.user, "ADMIN"):
+            raise PermissionDenied("permitir_negativo requiere el rol ADMIN.")
         compra = PurchaseService.anular_compra(
             compra_id=pk,
             usuario=request.user,
             motivo=motivo,
+            permitir_negativo=permitir_negativo,
         )
-        serializer = CompraSerializer(compra)
+        serializer = CompraSerializer(self._releer(compra))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class PurchasesBySupplierListView(generics.ListAPIView):
+class PurchasesBySupplierListView(ComprasFiltradasMixin, generics.ListAPIView):
     """
     GET /api/v1/proveedores/<id>/compras/
 
@@ -115,35 +168,17 @@ class PurchasesBySupplierListView(generics.ListAPIView):
     - fecha_hasta: YYYY-MM-DD
     - bodega_id: int
     - estado: str
+    - detalles: false → lista sin líneas de detalle
     """
 
     serializer_class = CompraSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        proveedor_id = self.kwargs["proveedor_id"]
-        qs = Compra.objects.filter(proveedor_id=proveedor_id).order_by("-fecha")
-
-        params = self.request.query_params
-        bodega_id = params.get("bodega_id")
-        estado = params.get("estado")
-        fecha_desde = params.get("fecha_desde")
-        fecha_hasta = params.get("fecha_hasta")
-
-        if bodega_id:
-            qs = qs.filter(bodega_id=bodega_id)
-
-        if estado:
-            qs = qs.filter(estado=estado.upper())
-
-        if fecha_desde:
-            fecha_d = parse_date(fecha_desde)
-            if fecha_d:
-                qs = qs.filter(fecha__date__gte=fecha_d)
-
-        if fecha_hasta:
-            fecha_h = parse_date(fecha_hasta)
-            if fecha_h:
-                qs = qs.filter(fecha__date__lte=fecha_h)
+    def filtro_compras(self) -> FiltroCompras:
+        # El proveedor viene de la ruta, no de los query params
+        return FiltroCompras.desde_params(
+            self.request.query_params, proveedor_id=self.kwargs["proveedor_id"]
+        )
 
-        return qs
+    def get_queryset(self):
+        return self.con_relaciones(self.filtro_compras().queryset())
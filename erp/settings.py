@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 from dotenv import load_dotenv
@@ -99,6 +100,9 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Crea las tablas de los modelos managed=False en la BD de pruebas
+TEST_RUNNER = "core.test_runner.UnmanagedModelsTestRunner"
+
 # ---- DRF / JWT ----
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
@@ -119,6 +123,40 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# ---- exportaciones en segundo plano (core/services/export_job_service.py) ----
+EXPORT_DIR = os.getenv(
+    "EXPORT_DIR", os.path.join(tempfile.gettempdir(), "erp-exportaciones")
+)
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+# Un archivo terminado se reutiliza (mismos filtros) durante este tiempo
+EXPORT_TTL_SEGUNDOS = int(os.getenv("EXPORT_TTL_SEGUNDOS", "900"))
+# Un trabajo sin terminar pasado este tiempo se considera caído y se relanza
+EXPORT_TIMEOUT_SEGUNDOS = int(os.getenv("EXPORT_TIMEOUT_SEGUNDOS", "3600"))
+
+# ---- caché ----
+# Por defecto LocMemCache: no agrega consultas a la BD, pero es una por
+# proceso, así que la invalidación de la caché de compras filtradas (sube una
+# generación) solo la ve el worker que registró la compra; los demás sirven
+# lo cacheado hasta COMPRAS_CACHE_SEGUNDOS. Con varios workers de gunicorn,
+# configurar una caché compartida:
+#   Redis: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache y
+#          CACHE_LOCATION=redis://host:6379/1
+#   BD:    CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache
+#          (CACHE_LOCATION es la tabla; crearla con manage.py createcachetable)
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "erp_cache"),
+    }
+}
+
+# ---- caché de compras filtradas (core/services/purchase_filter_service.py) ----
+COMPRAS_CACHE_SEGUNDOS = int(os.getenv("COMPRAS_CACHE_SEGUNDOS", "60"))
+# Por encima de esto no se guardan los ids (solo total y cantidad)
+COMPRAS_CACHE_MAX_IDS = int(os.getenv("COMPRAS_CACHE_MAX_IDS", "50000"))
+
 # ---- logging mínimo (útil para depurar SQL) ----
 LOGGING = {
     "version": 1,
@@ -131,6 +169,11 @@ LOGGING = {
             "handlers": ["console"],
             "level": "ERROR" if not DEBUG else "INFO",
         },
+        # métricas de servicios (tiempos de lock, lotes, etc.)
+        "core": {
+            "handlers": ["console"],
+            "level": os.getenv("CORE_LOG_LEVEL", "INFO"),
+        },
     },
 }
 # ... configuración REST_FRAMEWORK y SIMPLE_JWT ...
@@ -0,0 +1,24 @@
+# erp/settings_test.py
+"""
+Pruebas sin MySQL:
+
+    python manage.py test core --settings=erp.settings_test
+
+Las pruebas de conteo de consultas solo usan el ORM; las que dependen de
+SQL propio de MySQL (EXPLAIN, ON DUPLICATE KEY) van contra la BD real con
+los settings normales.
+"""
+
+from erp.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+}
+
+# Un solo proceso: la caché en memoria no suma consultas a los conteos
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]